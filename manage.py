@@ -17,10 +17,17 @@ from click.decorators import _make_command
 from elasticsearch import helpers as es_helpers
 from elasticsearch.exceptions import RequestError
 
+from ocd_backend import celery_app
 from ocd_backend.es import elasticsearch as es
 from ocd_backend.pipeline import setup_pipeline
-from ocd_backend.settings import SOURCES_CONFIG_FILE, DEFAULT_INDEX_PREFIX
+from ocd_backend.settings import (SOURCES_CONFIG_FILE, DEFAULT_INDEX_PREFIX,
+                                  WORKER_PROFILES)
+from ocd_backend.tasks import HELD_RUNS_KEY, finish_held_run
 from ocd_backend.utils.misc import load_sources_config
+from ocd_backend.utils.resolver import resolver_doc_cache
+from ocd_backend.utils.spool import bulk_spool
+from ocd_backend.utils.tally import recompute_voting_rounds
+from ocd_backend.utils.text_cache import text_cache
 from ocd_frontend.settings import DUMPS_DIR, API_URL, LOCAL_DUMPS_DIR
 
 
@@ -185,6 +192,11 @@ def dumps():
     """Create and load dumps of indices"""
 
 
+@cli.group()
+def cache():
+    """Manage caches"""
+
+
 @command('put_template')
 @click.option('--template_file', default='ocd_frontend/es_mappings/ori_template.json',
               type=click.File('rb'), help='Path to JSON file containing the template.')
@@ -256,6 +268,9 @@ def create_indexes(mapping_dir):
                                     fg='red')
             click.echo(error_msg)
 
+    # Resolver documents of a previous resolver index aren't known anymore
+    resolver_doc_cache.clear(resolver_doc_cache.get_index_uuid())
+
 
 @command('delete_indexes')
 @click.option('--delete-template', is_flag=True, expose_value=True)
@@ -276,6 +291,7 @@ def delete_indexes(delete_template):
                                            stats['index']['size']))
     if click.confirm('Are you sure you want to delete the above indices?'):
         es.indices.delete(index=index_glob)
+        resolver_doc_cache.clear(resolver_doc_cache.get_index_uuid())
 
     if delete_template or click.confirm('Do you want to delete the template too?'):
         es.indices.delete_template('ocd_template')
@@ -303,6 +319,151 @@ def available_indices():
     return available
 
 
+@command('recompute_vote_counts')
+@click.argument('index_name')
+@click.option('--doc-type', default='vote_events',
+              help='Type of the documents containing the votes.')
+@click.option('--chunk-size', default=500, type=int,
+              help='Number of documents per bulk request.')
+def recompute_vote_counts(index_name, doc_type, chunk_size):
+    """
+    Recompute the ``counts`` and ``group_results`` of all voting rounds in an
+    index from their ``votes``, and show the cohesion of each party.
+
+    :param index_name: Name (or alias) of the index of a municipality.
+    :param doc-type: Type of the documents containing the votes. Defaults to ``vote_events``.
+    :param chunk-size: Number of documents per bulk request. Defaults to 500.
+    """
+    hits = list(es_helpers.scan(
+        es, index=index_name, doc_type=doc_type,
+        query={'query': {'exists': {'field': 'doc.votes'}}},
+        _source_include=['doc.votes', 'doc.group_results']))
+
+    if not hits:
+        click.secho('No voting rounds found in %s' % index_name, fg='red')
+        return
+
+    tally, group_names, actions = recompute_voting_rounds(hits)
+
+    updated, errors = es_helpers.bulk(es, actions, chunk_size=chunk_size,
+                                      stats_only=True)
+    click.secho('Recomputed counts of %d voting rounds (%d errors)'
+                % (updated, errors), fg='green' if not errors else 'red')
+
+    for party, (cohesion, rounds) in tally.get_party_cohesion().iteritems():
+        click.echo('- %s: cohesion %.2f over %d rounds' % (
+            group_names.get(party) or party, cohesion, rounds))
+
+
+@command('replay_spool')
+def replay_spool():
+    """
+    Sends the documents that were spooled while Elasticsearch was
+    unavailable, and removes the segments that were sent. Segments that are
+    still written to by a worker are skipped, and documents that are
+    rejected because Elasticsearch is unavailable or overloaded are kept
+    for the next replay.
+    """
+    segments = bulk_spool.segments()
+    if not segments:
+        click.secho('Nothing to replay', fg='green')
+        return
+
+    replayed, failed, kept = bulk_spool.replay(es)
+    left = len(bulk_spool.segments())
+    click.secho('Replayed %d actions (%d failed, %d kept), %d of %d segments '
+                'left' % (replayed, failed, kept, left, len(segments)),
+                fg='green' if not failed and not left else 'red')
+
+
+@command('finish_held_runs')
+@click.option('--force', is_flag=True,
+              help='Finish the runs even if this host has spooled documents.')
+def finish_held_runs(force):
+    """
+    Moves the aliases of the runs that were held because some of their
+    documents were spooled, and removes their old indexes. Run this after
+    the spool of each worker host is replayed. Runs of which the source was
+    loaded again in the meantime are discarded, and their index removed.
+
+    :param force: Finish the runs even if the spool of this host isn't empty.
+    """
+    if bulk_spool.segments() and not force:
+        click.secho('The spool is not empty, run replay_spool first',
+                    fg='red')
+        return
+
+    held_runs = celery_app.backend.client.hgetall(HELD_RUNS_KEY)
+    if not held_runs:
+        click.secho('No held runs', fg='green')
+        return
+
+    # The indexes are named by the time they were created, so runs that
+    # are superseded by a later run are skipped
+    held_runs = sorted(
+        ((run_identifier, json.loads(held_run))
+         for run_identifier, held_run in held_runs.items()),
+        key=lambda (_, held_run): held_run['new_index_name'], reverse=True)
+    for run_identifier, held_run in held_runs:
+        if finish_held_run(**held_run):
+            click.secho('Moved alias "%s" of run %s (%d spooled items) to '
+                        '"%s"' % (held_run['index_alias'], run_identifier,
+                                  held_run['spooled'],
+                                  held_run['new_index_name']), fg='green')
+        else:
+            click.secho('Run %s was superseded by a later run, removed '
+                        '"%s"' % (run_identifier, held_run['new_index_name']),
+                        fg='yellow')
+        celery_app.backend.client.hdel(HELD_RUNS_KEY, run_identifier)
+
+
+@command('text_stats')
+def text_cache_stats():
+    """
+    Shows the number of entries and the size of the cache of text extracted
+    from documents, in total and per extractor version.
+    """
+    stats = text_cache.stats()
+    click.secho('%d entries, %.1f of %.1f MB' % (
+        stats['entries'], stats['size'] / 1024.0 ** 2,
+        stats['max_size'] / 1024.0 ** 2), fg='green')
+
+    for version, version_stats in sorted(stats['versions'].items()):
+        click.echo('- extractor %s: %d entries, %.1f MB' % (
+            version, version_stats['entries'],
+            version_stats['size'] / 1024.0 ** 2))
+
+
+@command('text_evict')
+@click.option('--max-size', type=int, default=None,
+              help='Size in bytes to shrink the cache to.')
+def text_cache_evict(max_size):
+    """
+    Removes the least recently used entries from the cache of text extracted
+    from documents until it is smaller than the maximum size.
+
+    :param max-size: Size in bytes to shrink the cache to. Defaults to ``TEXT_CACHE_MAX_SIZE``.
+    """
+    removed, removed_size = text_cache.evict(max_size)
+    click.secho('Removed %d entries (%.1f MB)' % (
+        removed, removed_size / 1024.0 ** 2), fg='green')
+
+
+@command('resolver_seed')
+@click.option('--chunk-size', default=1000, type=int,
+              help='Number of documents per scroll request.')
+def resolver_cache_seed(chunk_size):
+    """
+    Loads the content types of all documents in the resolver index into the
+    set of known resolver documents, so loaders only write the resolver
+    documents that are new or changed. Replaces the current set.
+
+    :param chunk-size: Number of documents per scroll request. Defaults to 1000.
+    """
+    count = resolver_doc_cache.seed(es, chunk_size=chunk_size)
+    click.secho('Loaded %d known resolver documents' % count, fg='green')
+
+
 @command('list_sources')
 @click.option('--sources_config', default=SOURCES_CONFIG_FILE)
 def extract_list_sources(sources_config):
@@ -389,6 +550,43 @@ def extract_start(source_id, subitem, entiteit, sources_config):
                 setup_pipeline(source)
 
 
+@command('worker')
+@click.option('--profile', type=click.Choice(sorted(WORKER_PROFILES)),
+              default=None, help='Only consume the queues of this profile, '
+                                 'with its pool and concurrency')
+@click.option('--concurrency', '-c', type=int, default=None,
+              help='Override the concurrency of the profile')
+@click.option('--loglevel', '-l', default='info')
+def extract_worker(profile, concurrency, loglevel):
+    """
+    Start a Celery worker for the extraction pipeline. Without a profile,
+    the worker consumes all queues.
+
+    :param profile: the name of a worker profile in ``WORKER_PROFILES``,
+        such as ``cpu`` for document parsing or ``io`` for the other
+        stages.
+    :param concurrency: the number of worker processes.
+    :param loglevel: the level of the log messages.
+    """
+    from ocd_backend import celery_app
+
+    argv = ['worker', '--loglevel=%s' % loglevel]
+    if profile:
+        worker_profile = WORKER_PROFILES[profile]
+        argv += [
+            '--queues=%s' % ','.join(worker_profile['queues']),
+            '--pool=%s' % worker_profile['pool'],
+            '--concurrency=%d' % (concurrency or
+                                  worker_profile['concurrency']),
+            '--prefetch-multiplier=%d' % worker_profile['prefetch_multiplier'],
+            '--hostname=%s@%%h' % profile,
+        ]
+    elif concurrency:
+        argv.append('--concurrency=%d' % concurrency)
+
+    celery_app.worker_main(argv)
+
+
 @command('runserver')
 @click.argument('host', default='0.0.0.0')
 @click.argument('port', default=5000, type=int)
@@ -652,9 +850,17 @@ elasticsearch.add_command(es_put_mapping)
 elasticsearch.add_command(create_indexes)
 elasticsearch.add_command(delete_indexes)
 elasticsearch.add_command(available_indices)
+elasticsearch.add_command(recompute_vote_counts)
+elasticsearch.add_command(replay_spool)
+elasticsearch.add_command(finish_held_runs)
+
+cache.add_command(text_cache_stats)
+cache.add_command(text_cache_evict)
+cache.add_command(resolver_cache_seed)
 
 extract.add_command(extract_list_sources)
 extract.add_command(extract_start)
+extract.add_command(extract_worker)
 
 
 if __name__ == '__main__':
@@ -13,6 +13,7 @@ celery_app = Celery('ocd_backend', include=[
     'ocd_backend.transformers.ggm',
     'ocd_backend.enrichers.media_enricher',
     'ocd_backend.enrichers.media_enricher.static',
+    'ocd_backend.enrichers.document_text',
     'ocd_backend.loaders',
     'ocd_backend.loaders.file',
     'ocd_backend.tasks'
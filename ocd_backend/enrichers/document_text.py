@@ -0,0 +1,180 @@
+import json
+import zlib
+from hashlib import sha1
+from multiprocessing.pool import ThreadPool
+
+from ocd_backend import celery_app
+from ocd_backend import settings
+from ocd_backend.enrichers import BaseEnricher
+from ocd_backend.exceptions import SkipEnrichment
+from ocd_backend.extractors import HttpRequestMixin
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils import json_encoder
+from ocd_backend.utils.file_parsing import FileToTextMixin
+
+log = get_source_logger('enricher')
+
+
+class DocumentTextEnricher(BaseEnricher, HttpRequestMixin, FileToTextMixin):
+    """Extracts the text of the documents in the ``sources`` of an item
+    and stores it as the ``description`` of each source. The text is also
+    added to the ``all_text`` of the combined index document, and to the
+    ``combined_index_data`` that the combined index is rebuilt from.
+
+    Items defer the extraction to this enricher (see
+    :meth:`~ocd_backend.utils.file_parsing.FileToTextMixin.file_source`)
+    when it is configured for the source, so the transformer doesn't have
+    to download and parse documents. Each URL is converted once per item,
+    documents are downloaded concurrently and the text is cached in the
+    result backend by URL, so the same file attached to a meeting and its
+    agenda items is only downloaded once. Documents published under
+    different URLs are parsed once thanks to the text cache of
+    :meth:`~ocd_backend.utils.file_parsing.FileToTextMixin.file_to_text`.
+    Text that could not be extracted, or only partially, is not cached by
+    URL, so it is extracted again next time.
+
+    Supported ``enricher_settings``:
+
+    - ``concurrency``: the number of documents that are downloaded and
+      converted at the same time (default: 4).
+    - ``text_field``: the name of a top-level field that should be set to
+      the last non-empty text that is extracted, such as the ``text`` of
+      a motion.
+    """
+
+    #: Lets items know that they shouldn't extract document text themselves
+    extracts_document_text = True
+
+    #: Parsing documents is CPU-bound (see
+    #: :func:`~ocd_backend.utils.routing.get_queue`)
+    queue = 'enrich_cpu'
+
+    cache_key_prefix = 'ori_document_text'
+
+    def _url_key(self, url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return '%s_url_%s_%s' % (self.cache_key_prefix, self.max_pages,
+                                 sha1(url).hexdigest())
+
+    def _cache_get(self, key):
+        try:
+            value = celery_app.backend.get(key)
+        except Exception, e:
+            log.warning('Unable to read from document text cache: %s' % e)
+            return
+
+        if value is not None:
+            return zlib.decompress(value).decode('utf-8')
+
+    def _cache_set(self, key, text):
+        try:
+            celery_app.backend.set_with_ttl(
+                key, zlib.compress(text.encode('utf-8')),
+                settings.DOCUMENT_TEXT_CACHE_TTL)
+        except Exception, e:
+            log.warning('Unable to write to document text cache: %s' % e)
+
+    def get_text(self, url):
+        """Returns the text of the document at ``url``, from the cache if
+        possible."""
+        url_key = self._url_key(url)
+        text = self._cache_get(url_key)
+        if text is not None:
+            return text
+
+        tf = self.file_download(url)
+        if tf is None:
+            return u''
+
+        try:
+            text, complete = self.file_extract_text(
+                tf.name, self.max_pages, tf.sha256, tf.mime_type)
+        finally:
+            tf.close()
+
+        if text is None:
+            return u''
+        if complete:
+            self._cache_set(url_key, text)
+        return text
+
+    def _get_text_or_empty(self, url):
+        try:
+            return self.get_text(url)
+        except Exception:
+            log.exception('Unable to extract text from %s' % url)
+            return u''
+
+    def enrich_item(self, enrichments, object_id, combined_index_doc, doc,
+                    doc_type):
+        self.max_pages = self.source_definition.get('pdf_max_pages', 20)
+
+        # The documents usually share the same sources list, only handle
+        # each list once
+        sources_lists = {}
+        for document in (combined_index_doc, doc):
+            if document.get('sources'):
+                sources_lists[id(document['sources'])] = document['sources']
+
+        pending = [source for sources in sources_lists.values()
+                   for source in sources
+                   if source.get('url') and 'description' not in source]
+        if not pending:
+            raise SkipEnrichment('No sources without text in document.')
+
+        urls = sorted(set(source['url'] for source in pending))
+        concurrency = min(self.enricher_settings.get('concurrency', 4),
+                          len(urls))
+
+        pool = ThreadPool(concurrency)
+        try:
+            texts = dict(zip(urls, pool.map(self._get_text_or_empty, urls)))
+        finally:
+            pool.close()
+            pool.join()
+
+        for source in pending:
+            source['description'] = texts[source['url']]
+
+        text = None
+        text_field = self.enricher_settings.get('text_field')
+        if text_field:
+            for source in pending:
+                if source['description'].strip():
+                    text = source['description'].strip()
+            if text:
+                combined_index_doc[text_field] = text
+                doc[text_field] = text
+
+        extracted = [texts[url] for url in urls if texts[url].strip()]
+        if extracted:
+            combined_index_doc['all_text'] = u' '.join(
+                [combined_index_doc.get('all_text') or u''] + extracted
+            ).strip()
+
+        if doc.get('combined_index_data'):
+            doc['combined_index_data'] = self._update_combined_index_data(
+                doc['combined_index_data'], texts, text_field, text,
+                combined_index_doc.get('all_text'))
+
+        log.debug('Extracted text of %d documents for %s'
+                  % (len(urls), object_id))
+
+        return enrichments
+
+    @staticmethod
+    def _update_combined_index_data(combined_index_data, texts, text_field,
+                                    text, all_text):
+        """Returns the encoded ``combined_index_data`` of the item, which
+        was encoded before the text was extracted, with the extracted
+        text."""
+        data = json.loads(combined_index_data)
+        for source in data.get('sources') or []:
+            if source.get('url') in texts and 'description' not in source:
+                source['description'] = texts[source['url']]
+        if text:
+            data[text_field] = text
+        if all_text is not None:
+            data['all_text'] = all_text
+        return json_encoder.encode(data)
@@ -1,18 +1,17 @@
-import os
-from base64 import b64encode
-from tempfile import SpooledTemporaryFile
-
-from requests import Session
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from collections import deque
+from multiprocessing.pool import ThreadPool
+from threading import BoundedSemaphore, Event
+from urlparse import urlparse
 
 from ggm import GegevensmagazijnMotionText
 from ocd_backend.enrichers import BaseEnricher
 from ocd_backend.exceptions import SkipEnrichment, UnsupportedContentType
 from ocd_backend.log import get_source_logger
-from ocd_backend.settings import TEMP_DIR_PATH, USER_AGENT
+from ocd_backend.utils.downloads import partial_download, stream_download
+from ocd_backend.utils.http_sessions import http_session_pool
+from ocd_backend.utils.media_store import media_store
 from ocd_backend.utils.misc import get_secret
-from .tasks import ImageMetadata, MediaType, FileToText
+from .tasks import ImageMetadata, ImageThumbnails, MediaType, FileToText
 
 log = get_source_logger('enricher')
 
@@ -23,7 +22,9 @@ class MediaEnricher(BaseEnricher):
     ``media_urls`` array).
 
     Media items are fetched from the source and then passed on to a
-    set of registered tasks that are responsible for the analysis.
+    set of registered tasks that are responsible for the analysis. With
+    the ``store_media`` setting, media items are kept in the media store
+    (see :meth:`fetch_stored_media`) instead of a temporary file.
     """
 
     #: The registry of available sub-tasks that are responsible for the
@@ -32,43 +33,39 @@ class MediaEnricher(BaseEnricher):
     #: returned ``content-type``.
     available_tasks = {
         'image_metadata': ImageMetadata,
+        'image_thumbnails': ImageThumbnails,
         'media_type': MediaType,
         'file_to_text': FileToText,
         'ggm_motion_text': GegevensmagazijnMotionText
     }
 
-    http_session = None
-
-    def setup_http_session(self):
-        if self.http_session:
-            self.http_session.close()
-
-        self.http_session = Session()
-        self.http_session.headers['User-Agent'] = USER_AGENT
+    #: The number of bytes that is fetched of media items when
+    #: ``partial_media_fetch`` is enabled
+    partial_fetch_size = 1024*1024*2
 
-        http_retry = Retry(total=5, status_forcelist=[500, 503],
-                           backoff_factor=.5)
-        http_adapter = HTTPAdapter(max_retries=http_retry)
-        self.http_session.mount('http://', http_adapter)
-
-        http_retry = Retry(total=5, status_forcelist=[500, 503],
-                           backoff_factor=.5)
-        http_adapter = HTTPAdapter(max_retries=http_retry)
-        self.http_session.mount('https://', http_adapter)
+    def get_http_auth(self):
+        """Returns the ``(user, password)`` of the source when the
+        enricher is configured to use ``authentication``."""
+        if self.enricher_settings.get('authentication', False):
+            user, password = get_secret(self.source_definition['id'])
+            return user, password
 
-    def setup_http_auth(self):
-        user, password = get_secret(self.source_definition['id'])
-        self.http_session.headers['Authorization'] = 'Basic %s' % b64encode(
-            '%s:%s' % (user, password))
+    def get_http_session(self, url):
+        """Returns the worker-wide session for the host of ``url``, so
+        connections are reused across items (see
+        :class:`~ocd_backend.utils.http_sessions.HttpSessionPool`)."""
+        return http_session_pool.get(url, self.get_http_auth())
 
     def fetch_media(self, object_id, url, partial_fetch=False):
         """Retrieves a given media object from a remote (HTTP) location
         and returns the content-type and a file-like object containing
         the media content.
 
-        The file-like object is a temporary file that - depending on the
-        size - lives in memory or on disk. Once the file is closed, the
-        contents are removed from storage.
+        The file-like object is a
+        :class:`~ocd_backend.utils.downloads.Download`, a temporary file
+        on disk that also carries the SHA-256 and sniffed MIME type of the
+        content. Once the file is closed, the contents are removed from
+        storage.
 
         :param object_id: the identifier of the item that is being enriched.
         :type object_id: str
@@ -77,60 +74,95 @@ class MediaEnricher(BaseEnricher):
         :param partial_fetch: determines if the the complete file should
             be fetched, or if only the first 2 MB should be retrieved.
             This feature is used to prevent complete retrieval of large
-            a/v material.
+            a/v material. The first 2 MB are requested with a ``Range``
+            header (see
+            :func:`~ocd_backend.utils.downloads.partial_download`).
         :type partial_fetch: bool.
         :returns: a tuple with the ``content-type``, ``content-lenght``
             and a file-like object containing the media content. The
-            value of ``content-length`` will be ``None`` in case
-            a partial fetch is requested and ``content-length`` is not
-            returned by the remote server.
+            value of ``content-length`` is the size of the complete file,
+            or ``None`` in case a partial fetch is requested and the size
+            can't be determined.
         """
+        if self.enricher_settings.get('store_media', False):
+            return self.fetch_stored_media(object_id, url)
+
+        session = self.get_http_session(url)
+        if partial_fetch:
+            return self.describe_media(partial_download(
+                session, url, self.partial_fetch_size, timeout=(60, 120)))
 
-        http_resp = self.http_session.get(url, stream=True, timeout=(60, 120))
+        http_resp = session.get(url, stream=True, timeout=(60, 120))
         http_resp.raise_for_status()
 
-        if not os.path.exists(TEMP_DIR_PATH):
-            log.debug('Creating temp directory %s' % TEMP_DIR_PATH)
-            os.makedirs(TEMP_DIR_PATH)
-
-        # Create a temporary file to store the media item, write the file
-        # to disk if it is larger than 1 MB.
-        media_file = SpooledTemporaryFile(max_size=1024*1024, prefix='ocd_m_',
-                                          suffix='.tmp',
-                                          dir=TEMP_DIR_PATH)
-
-        # When a partial fetch is requested, request up to two MB
-        partial_target_size = 1024*1024*2
-        content_length = http_resp.headers.get('content-length')
-        if content_length and int(content_length) < partial_target_size:
-            partial_target_size = int(content_length)
-
-        retrieved_bytes = 0
-        for chunk in http_resp.iter_content(chunk_size=512*1024):
-            if chunk:  # filter out keep-alive chunks
-                media_file.write(chunk)
-                retrieved_bytes += len(chunk)
-
-            if partial_fetch and retrieved_bytes >= partial_target_size:
-                break
-
-        media_file.flush()
-        log.debug('Fetched media item %s [%s/%s]' % (url, retrieved_bytes,
-                                                     content_length))
-
-        # If the server doens't provide a content-length and this isn't
-        # a partial fetch, determine the size by looking at the retrieved
-        # content
-        if not content_length and not partial_fetch:
-            media_file.seek(0, 2)
-            content_length = media_file.tell()
+        return self.read_media(url, http_resp, partial_fetch)
+
+    def fetch_stored_media(self, object_id, url):
+        """Retrieves a given media object through the
+        :class:`~ocd_backend.utils.media_store.MediaStore`.
+
+        A file that is already stored for ``url`` is revalidated with a
+        conditional request and only downloaded again when it has been
+        modified. The store needs the complete file, so media is never
+        fetched partially.
+
+        :returns: a tuple with the ``content-type``, ``content-lenght``
+            and the stored file.
+        """
+        metadata = media_store.get_metadata(url)
+        headers = {}
+        if metadata:
+            headers = media_store.get_conditional_headers(metadata)
+
+        http_resp = self.get_http_session(url).get(
+            url, headers=headers, stream=True, timeout=(60, 120))
+
+        if headers and http_resp.status_code == 304:
+            http_resp.close()
+            log.debug('Media item %s has not been modified' % url)
+        else:
+            http_resp.raise_for_status()
+            metadata = media_store.store(url, http_resp)
+            log.debug('Fetched media item %s [%s]' % (url, metadata['size']))
+
+        return (
+            metadata['content_type'] or metadata.get('mime_type'),
+            metadata['size'],
+            media_store.open(metadata)
+        )
+
+    def read_media(self, url, http_resp, partial_fetch=False):
+        """Reads the content of a streamed response into a temporary
+        file, which is hashed and sniffed while it is written (see
+        :func:`~ocd_backend.utils.downloads.stream_download`). See
+        :meth:`fetch_media`."""
+        return self.describe_media(stream_download(
+            url, http_resp,
+            partial_size=self.partial_fetch_size if partial_fetch else None))
+
+    def describe_media(self, media_file):
+        """Returns the ``content-type``, ``content-length`` and file of a
+        :class:`~ocd_backend.utils.downloads.Download`."""
+        # If the server doens't provide a content-length and the complete
+        # file was fetched, use the size of the retrieved content
+        content_length = media_file.content_length
+        if content_length is None and media_file.complete:
+            content_length = media_file.size
 
         return (
-            http_resp.headers.get('content-type'),
+            media_file.content_type or media_file.mime_type,
             content_length,
             media_file
         )
 
+    def _fetch_media_item(self, object_id, media_item, partial_fetch,
+                          host_slots, cancelled):
+        url = media_item['original_url']
+        with host_slots[urlparse(url).netloc]:
+            if cancelled.is_set():
+                return
+            return self.fetch_media(object_id, url, partial_fetch)
+
     def enrich_item(self, enrichments, object_id, combined_index_doc, doc,
                     doc_type):
         """Enriches the media objects referenced in a single item.
@@ -140,54 +172,86 @@ class MediaEnricher(BaseEnricher):
         item fails, enrichment of the media item will be skipped. In case
         a specific media enrichment task fails, only that task is
         skipped, which means that we move on to the next task.
+
+        Media items are fetched by a pool of ``concurrency`` threads
+        (default: 4), with at most ``per_host_concurrency`` (default: 2)
+        requests to the same host at a time. The tasks of a media item
+        run as soon as it and the items before it are fetched, so the
+        enrichments (and the documents the tasks modify) keep the order
+        of ``media_urls``.
         """
 
         if not doc.get('media_urls', []):
             raise SkipEnrichment('No "media_urls" in document.')
 
-        self.setup_http_session()
-
-        if self.enricher_settings.get('authentication', False):
-            self.setup_http_auth()
-
         # Check the settings to see if media should by fetch partially
         partial_fetch = self.enricher_settings.get('partial_media_fetch', False)
 
+        concurrency = min(self.enricher_settings.get('concurrency', 4),
+                          len(doc['media_urls']))
+        per_host_concurrency = self.enricher_settings.get(
+            'per_host_concurrency', 2)
+        host_slots = {
+            urlparse(media_item['original_url']).netloc:
+                BoundedSemaphore(per_host_concurrency)
+            for media_item in doc['media_urls']
+        }
+
+        cancelled = Event()
+        pool = ThreadPool(concurrency)
+        pending = deque(
+            (media_item, pool.apply_async(self._fetch_media_item, (
+                object_id, media_item, partial_fetch, host_slots, cancelled)))
+            for media_item in doc['media_urls'])
+        pool.close()
+
         media_urls_enrichments = []
-        for media_item in doc['media_urls']:
-            media_item_enrichment = {}
-
-            content_type, content_length, media_file = self.fetch_media(
-                object_id,
-                media_item['original_url'],
-                partial_fetch
-            )
-
-            for task in self.enricher_settings['tasks']:
-                # Seek to the beginning of the file before starting a task
-                media_file.seek(0)
+        try:
+            while pending:
+                media_item, fetch = pending[0]
+                content_type, content_length, media_file = fetch.get()
+                pending.popleft()
+
+                media_item_enrichment = {}
                 try:
-                    self.available_tasks[task](media_item, content_type,
-                                               media_file,
-                                               media_item_enrichment,
-                                               object_id, combined_index_doc,
-                                               doc,
-                                               doc_type, )
-                except UnsupportedContentType:
-                    log.debug('Skipping media enrichment task %s, '
-                              'content-type %s (object_id: %s, url %s) is not '
-                              'supported.' % (task, content_type, object_id,
-                                              media_item['original_url']))
-                    continue
-
-            media_item_enrichment['url'] = media_item['url']
-            media_item_enrichment['original_url'] = media_item['original_url']
-            media_item_enrichment['content_type'] = content_type
-            media_item_enrichment['size_in_bytes'] = content_length
-
-            media_file.close()
-
-            media_urls_enrichments.append(media_item_enrichment)
+                    for task in self.enricher_settings['tasks']:
+                        # Seek to the beginning of the file before starting
+                        # a task
+                        media_file.seek(0)
+                        try:
+                            self.available_tasks[task](media_item,
+                                                       content_type,
+                                                       media_file,
+                                                       media_item_enrichment,
+                                                       object_id,
+                                                       combined_index_doc,
+                                                       doc,
+                                                       doc_type, )
+                        except UnsupportedContentType:
+                            log.debug('Skipping media enrichment task %s, '
+                                      'content-type %s (object_id: %s, url '
+                                      '%s) is not supported.' % (
+                                          task, content_type, object_id,
+                                          media_item['original_url']))
+                            continue
+                finally:
+                    media_file.close()
+
+                media_item_enrichment['url'] = media_item['url']
+                media_item_enrichment['original_url'] = \
+                    media_item['original_url']
+                media_item_enrichment['content_type'] = content_type
+                media_item_enrichment['size_in_bytes'] = content_length
+
+                media_urls_enrichments.append(media_item_enrichment)
+        finally:
+            # When fetching or a task failed, don't fetch the remaining
+            # media items, and close the ones that were fetched already
+            cancelled.set()
+            pool.join()
+            for media_item, fetch in pending:
+                if fetch.successful() and fetch.get() is not None:
+                    fetch.get()[2].close()
 
         enrichments['media_urls'] = media_urls_enrichments
 
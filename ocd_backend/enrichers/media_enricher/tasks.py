@@ -1,8 +1,9 @@
 import os
-from PIL import Image
 
+from ocd_backend import settings
 from ocd_backend.exceptions import UnsupportedContentType
 from ocd_backend.utils.file_parsing import FileToTextMixin
+from ocd_backend.utils.images import generate_thumbnails, probe_image
 
 
 class BaseMediaEnrichmentTask(object):
@@ -72,16 +73,40 @@ class ImageMetadata(BaseMediaEnrichmentTask):
     def enrich_item(self, media_item, content_type, file_object,
                     enrichment_data, object_id, combined_index_doc, doc,
                     doc_type):
-        img = Image.open(file_object)
-        enrichment_data['image_format'] = img.format
-        enrichment_data['image_mode'] = img.mode
+        # Only the header of the image is read
+        image = probe_image(file_object)
+        enrichment_data['image_format'] = image['format']
+        enrichment_data['image_mode'] = image['mode']
         enrichment_data['resolution'] = {
-            'width': img.size[0],
-            'height': img.size[1],
-            'total_pixels': img.size[0] * img.size[1]
+            'width': image['width'],
+            'height': image['height'],
+            'total_pixels': image['width'] * image['height']
         }
 
 
+class ImageThumbnails(BaseMediaEnrichmentTask):
+    """Writes all ``THUMBNAIL_SIZES`` variants of an image to the
+    ``THUMBNAILS_DIR`` the frontend serves them from, decoding the image
+    once (see :func:`~ocd_backend.utils.images.generate_thumbnails`).
+    Thumbnails are identified by the resolver ID of the media URL."""
+    content_types = [
+        'image/jpeg',
+        'image/png',
+        'image/tiff'
+    ]
+
+    def enrich_item(self, media_item, content_type, file_object,
+                    enrichment_data, object_id, combined_index_doc, doc,
+                    doc_type):
+        # A partially fetched image can't be decoded
+        if not getattr(file_object, 'complete', True):
+            return
+
+        enrichment_data['thumbnails'] = generate_thumbnails(
+            file_object, media_item['url'].split('/')[-1],
+            settings.THUMBNAIL_SIZES, settings.THUMBNAILS_DIR)
+
+
 class ViedeoMetadata(BaseMediaEnrichmentTask):
     content_types = [
         'video/ogg',
@@ -104,8 +129,12 @@ class FileToText(BaseMediaEnrichmentTask, FileToTextMixin):
                     enrichment_data, object_id, combined_index_doc, doc,
                     doc_type):
 
+        # Downloads know their hash and MIME type, so the file isn't read
+        # again to determine them
         path = os.path.realpath(file_object.name)
-        self.text = self.file_to_text(path)
+        self.text = self.file_to_text(
+            path, content_hash=getattr(file_object, 'sha256', None),
+            mime_type=getattr(file_object, 'mime_type', None))
         self.format_text()
 
         if self.text:
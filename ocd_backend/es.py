@@ -1,8 +1,9 @@
 import json
 
-from elasticsearch import Elasticsearch, serializer, compat, exceptions
+from elasticsearch import serializer, compat, exceptions
 
-from ocd_backend.settings import ELASTICSEARCH_HOST, ELASTICSEARCH_PORT
+from ocd_backend import settings
+from ocd_frontend.es_client import ElasticsearchPool
 
 
 class JSONSerializerPython2(serializer.JSONSerializer):
@@ -22,9 +23,12 @@ class JSONSerializerPython2(serializer.JSONSerializer):
             raise exceptions.SerializationError(data, e)
 
 
-def setup_elasticsearch(host=ELASTICSEARCH_HOST, port=ELASTICSEARCH_PORT):
-    return Elasticsearch([{'host': host, 'port': port}],
-                         serializer=JSONSerializerPython2())
+def setup_elasticsearch(hosts=settings.ELASTICSEARCH_HOSTS):
+    return ElasticsearchPool(hosts, sniff=settings.ES_SNIFF,
+                             maxsize=settings.ES_MAXSIZE,
+                             timeout=settings.ES_TIMEOUT,
+                             timeouts=settings.ES_TIMEOUTS,
+                             serializer=JSONSerializerPython2())
 
 
 elasticsearch = setup_elasticsearch()
@@ -35,5 +35,10 @@ class UnsupportedContentType(Exception):
     media content that is doesn't understand."""
 
 
+class DownloadTooLarge(Exception):
+    """Thrown when a file that is being downloaded is larger than the
+    maximum download size."""
+
+
 class MissingTemplateTag(KeyError):
     """Thrown when a template tag is missing in the configuration"""
\ No newline at end of file
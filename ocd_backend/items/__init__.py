@@ -1,11 +1,22 @@
 import json
-from collections import MutableMapping
+from collections import namedtuple
 from datetime import datetime
 from hashlib import sha1
 
 from ocd_backend.exceptions import (UnableToGenerateObjectId,
                                     FieldNotAvailable)
 from ocd_backend.utils import json_encoder
+from ocd_backend.utils.schema import compile_schema
+
+
+#: The documents produced for a single item by :meth:`BaseItem.build_documents`
+ItemDocuments = namedtuple('ItemDocuments', [
+    'combined_object_id',
+    'object_id',
+    'combined_index_doc',
+    'index_doc',
+    'combined_index_blob'
+])
 
 
 class BaseItem(object):
@@ -57,6 +68,8 @@ class BaseItem(object):
         self.original_item = item
         self.doc_type = doc_type
 
+        self._documents = None
+
         # On init, all data should be available to construct self.meta
         # and self.combined_item
         self._construct_object_meta(processing_started)
@@ -65,68 +78,95 @@ class BaseItem(object):
         self.index_data = self.get_index_data()
 
     def _construct_object_meta(self, processing_started=None):
-        self.meta = StrictMappingDict(self.meta_fields)
+        meta = {}
         if not processing_started:
-            self.meta['processing_started'] = datetime.now()
+            meta['processing_started'] = datetime.now()
+
+        meta['source_id'] = unicode(self.source_definition['id'])
+        meta['collection'] = self.get_collection()
+        meta['rights'] = self.get_rights()
+        meta['original_object_id'] = self.get_original_object_id()
+        meta['original_object_urls'] = self.get_original_object_urls()
 
-        self.meta['source_id'] = unicode(self.source_definition['id'])
-        self.meta['collection'] = self.get_collection()
-        self.meta['rights'] = self.get_rights()
-        self.meta['original_object_id'] = self.get_original_object_id()
-        self.meta['original_object_urls'] = self.get_original_object_urls()
+        self.meta = compile_schema(self.meta_fields, 'Meta').from_dict(meta)
 
     def _construct_combined_index_data(self):
-        self.combined_index_data = StrictMappingDict(self.combined_index_fields)
+        self.combined_index_data = compile_schema(
+            self.combined_index_fields, 'CombinedIndexData'
+        ).from_dict(self.get_combined_index_data(), skip_empty=True)
+
+    def build_documents(self):
+        """Construct the ids and documents of this item in a single pass.
+
+        The meta and combined index data are copied once, :meth:`get_all_text`
+        and :meth:`get_object_id` are called once and the combined index
+        document is JSON-encoded once. The result is memoised, so the
+        documents should only be built after the item data is final (i.e.
+        after the transformer added the resolvable media urls).
+
+        :returns: the ids, both documents and the encoded combined index
+            document.
+        :rtype: :class:`ItemDocuments`
+        """
+        if self._documents is not None:
+            return self._documents
 
-        for field, value in self.get_combined_index_data().iteritems():
-            if type(value) == bool:
-                self.combined_index_data[field] = value
-            elif value:
-                self.combined_index_data[field] = value
+        object_id = self.get_object_id()
 
-    def get_combined_index_doc(self):
-        """Construct the document that should be inserted into the 'combined
-        index'.
+        # Only call get_combined_object_id when a subclass overrides it, by
+        # default it is the same as the object id
+        if self.get_combined_object_id.__func__ is \
+                BaseItem.get_combined_object_id.__func__:
+            combined_object_id = object_id
+        else:
+            combined_object_id = self.get_combined_object_id()
 
-        :returns: a dict ready to be indexed.
-        :rtype: dict
-        """
-        combined_item = {}
+        combined_index_data = self.combined_index_data.to_dict()
 
-        combined_item['meta'] = dict(self.meta)
+        combined_item = {}
+        combined_item['meta'] = self.meta.to_dict()
         combined_item['enrichments'] = {}
-        combined_item.update(dict(self.combined_index_data))
+        combined_item.update(combined_index_data)
         combined_item['all_text'] = self.get_all_text()
 
-        return combined_item
-
-    def get_index_doc(self):
-        """Construct the document that should be inserted into the index
-        belonging to the item's source.
+        # Store a string representation of the combined index data on the
+        # collection specific index as well, as we need to be able to
+        # reconstruct the combined index from the individual indices
+        combined_index_blob = json_encoder.encode(combined_item)
 
-        :returns: a dict ready for indexing.
-        :rtype: dict
-        """
         item = {}
-
-        item['meta'] = dict(self.meta)
+        item['meta'] = self.meta.to_dict()
         item['enrichments'] = {}
         item['source_data'] = {
             'content_type': self.data_content_type,
             'data': self.data
         }
-
-        combined_index_data = dict(self.combined_index_data)
         item.update(combined_index_data)
+        item['combined_index_data'] = combined_index_blob
+        item.update(self.index_data)
 
-        # Store a string representation of the combined index data on the
-        # collection specific index as well, as we need to be able to
-        # reconstruct the combined index from the individual indices
-        item['combined_index_data'] = json_encoder.encode(self.get_combined_index_doc())
+        self._documents = ItemDocuments(combined_object_id, object_id,
+                                        combined_item, item,
+                                        combined_index_blob)
+        return self._documents
 
-        item.update(self.index_data)
+    def get_combined_index_doc(self):
+        """Construct the document that should be inserted into the 'combined
+        index'.
 
-        return item
+        :returns: a dict ready to be indexed.
+        :rtype: dict
+        """
+        return self.build_documents().combined_index_doc
+
+    def get_index_doc(self):
+        """Construct the document that should be inserted into the index
+        belonging to the item's source.
+
+        :returns: a dict ready for indexing.
+        :rtype: dict
+        """
+        return self.build_documents().index_doc
 
     def get_original_object_id(self):
         """Retrieves the ID used by the source for identify this item.
@@ -319,43 +359,3 @@ class LocalDumpItem(BaseItem):
         :rtype: dict
         """
         return self.original_item.get('_source', {})
-
-
-class StrictMappingDict(MutableMapping):
-    """A dictionary that can only contain a select number of predefined
-    key-value pairs.
-
-    When setting an item, the key is first checked against
-    mapping. If the key is not in the mapping, a :exc:`KeyError` is
-    raised. If the value is not of the datetype that is specified in the
-    mapping, a :exc:`TypeError` is raised.
-
-    :param mapping: the mapping of allowed keys and value datatypes.
-    :type mapping: dict
-    """
-
-    def __init__(self, mapping):
-        self.mapping = mapping
-
-        self.store = {}
-
-    def __getitem__(self, key):
-        return self.store[key]
-
-    def __setitem__(self, key, value):
-        if key not in self.mapping:
-            raise KeyError('According to the mapping, %s is not in allowed' % key)
-        elif type(value) is not self.mapping[key]:
-            raise TypeError('Value of %s must be %s, not %s'
-                            % (key, self.mapping[key], type(value)))
-        else:
-            self.store[key] = value
-
-    def __delitem__(self, key):
-        del self.store[key]
-
-    def __iter__(self):
-        return iter(self.store)
-
-    def __len__(self):
-        return len(self.store)
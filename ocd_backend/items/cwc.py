@@ -127,14 +127,12 @@ class VideotulenItem(
                     continue
                 for a in topic['Attachments']['Attachment']:
                     try:
-                        description = self.file_get_contents(
-                            a['Location'],
-                            self.source_definition.get('pdf_max_pages', 20))
+                        documents.append(
+                            self.file_source(a['Location'], a['Description']))
                     except Exception as e:
-                        description = u''
-                    documents.append({
-                        'url': a['Location'], 'note': a['Description'],
-                        'description': description})
+                        documents.append({
+                            'url': a['Location'], 'note': a['Description'],
+                            'description': u''})
         combined_index_data['sources'] += documents
 
         return combined_index_data
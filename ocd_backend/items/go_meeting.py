@@ -11,6 +11,7 @@ import iso8601
 
 from ocd_backend.items.popolo import EventItem
 from ocd_backend.utils.misc import slugify
+from ocd_backend.utils.parsing import parse_dutch_date
 from ocd_backend import settings
 from ocd_backend.extractors import HttpRequestMixin
 from ocd_backend.utils.api import FrontendAPIMixin
@@ -65,25 +66,7 @@ class MeetingItem(
         return {self._find_meeting_type_id(c): c for c in results}
 
     def _convert_date(self, date_str):
-        month_names2int = {
-            u'januari': u'01',
-            u'februari': u'02',
-            u'maart': u'03',
-            u'april': u'04',
-            u'mei': u'05',
-            u'juni': u'06',
-            u'juli': u'07',
-            u'augustus': u'08',
-            u'september': u'09',
-            u'oktober': u'10',
-            u'november': u'11',
-            u'december': u'12',
-        }
-        output = date_str
-        for k, v in month_names2int.iteritems():
-            output = output.replace(k, v)
-        parts = output.split(u' ')
-        return u'%s-%s-%s' % (parts[2], parts[1], parts[0],)
+        return parse_dutch_date(date_str)
 
     def _get_object_id_for(self, object_id, urls={}):
         """Generates a new object ID which is used within OCD to identify
@@ -296,8 +279,7 @@ class MeetingItem(
         for source in combined_index_data['sources']:
             if not source['url'].lower().endswith('.pdf'):
                 continue
-            source['description'] = self.file_get_contents(
-                source['url'], self.source_definition.get('pdf_max_pages', 20))
+            source.update(self.file_source(source['url'], source['note']))
 
         return combined_index_data
 
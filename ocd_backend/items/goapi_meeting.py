@@ -114,18 +114,9 @@ class Meeting(
             documents = []
 
         for document in documents:
-            # sleep(1)
             url = u"%s/documents/%s" % (current_permalink, document['id'])
-            description = self.file_get_contents(
-                url,
-                self.source_definition.get('pdf_max_pages', 20)
-            )
-
-            combined_index_data['sources'].append({
-                'url': url,
-                'note': document['filename'],
-                'description': description
-            })
+            combined_index_data['sources'].append(
+                self.file_source(url, document['filename']))
 
         return combined_index_data
 
@@ -3,7 +3,6 @@ import json
 from pprint import pprint
 import re
 from hashlib import sha1
-from time import sleep
 
 import iso8601
 
@@ -134,17 +133,11 @@ class IBabsMeetingItem(
             documents = []
 
         for document in documents:
-            sleep(1)
             print u"%s: %s" % (
                 combined_index_data['name'], document['DisplayName'],)
-            description = self.file_get_contents(
-                document['PublicDownloadURL'],
-                self.source_definition.get('pdf_max_pages', 20))
-            combined_index_data['sources'].append({
-                'url': document['PublicDownloadURL'],
-                'note': document['DisplayName'],
-                'description': description
-            })
+            combined_index_data['sources'].append(self.file_source(
+                document['PublicDownloadURL'], document['DisplayName'],
+                throttle=1))
 
         return combined_index_data
 
@@ -296,17 +289,11 @@ class IBabsReportItem(
             documents = []
 
         for document in documents:
-            sleep(1)
             print u"Extra docs : %s: %s" % (
                 combined_index_data['name'], document['DisplayName'],)
-            description = self.file_get_contents(
-                document['PublicDownloadURL'],
-                self.source_definition.get('pdf_max_pages', 20))
-            combined_index_data['sources'].append({
-                'url': document['PublicDownloadURL'],
-                'note': document['DisplayName'],
-                'description': description
-            })
+            combined_index_data['sources'].append(self.file_source(
+                document['PublicDownloadURL'], document['DisplayName'],
+                throttle=1))
 
         for field in self.original_item.keys():
             id_for_field = '%sIds' % (field,)
@@ -319,14 +306,13 @@ class IBabsReportItem(
                 continue
             field_values = self.original_item[field][0].split(r'\s*;\s*')
             field_ids = self.original_item[id_for_field][0].split(r'\s*;\s*')
-            documents = map(
-                lambda a, b: {
-                    'url': self._get_public_url(b),
-                    'notes': a,
-                    'description': self.file_get_contents(
-                        self._get_public_url(b),
-                        self.source_definition.get('pdf_max_pages', 20)),
-                }, field_values, field_ids)
+
+            def _field_source(note, doc_id):
+                source = self.file_source(self._get_public_url(doc_id), note)
+                source['notes'] = source.pop('note')
+                return source
+
+            documents = map(_field_source, field_values, field_ids)
             combined_index_data['sources'] += documents
 
         return combined_index_data
@@ -2,7 +2,6 @@ from datetime import datetime
 import json
 from pprint import pprint
 from hashlib import sha1
-from time import sleep
 import re
 import random
 
@@ -185,21 +184,22 @@ class IBabsMotionVotingMixin(
         # then that text will be used.
         combined_index_data['text'] = u"-"
         for document in documents:
-            sleep(1)
             print u"%s: %s" % (
                 combined_index_data['name'], document['DisplayName'],)
-            description = self.file_get_contents(
-                document['PublicDownloadURL'],
-                self.source_definition.get('pdf_max_pages', 20)).strip()
-            combined_index_data['sources'].append({
-                'url': document['PublicDownloadURL'],
-                'note': document['DisplayName'],
-                'description': description
-            })
+            source = self.file_source(
+                document['PublicDownloadURL'], document['DisplayName'],
+                throttle=1)
+            combined_index_data['sources'].append(source)
+
+            # When the text is extracted later on, the enricher fills 'text'
+            if 'description' not in source:
+                continue
+
+            source['description'] = source['description'].strip()
             # FIXME: assumes that there is only one document from which
             # we can extract text; is that a valid assumption?
-            if len(description) > 0:
-                combined_index_data['text'] = description
+            if len(source['description']) > 0:
+                combined_index_data['text'] = source['description']
 
         return combined_index_data
 
@@ -8,6 +8,7 @@ from ocd_backend import settings
 
 from ocd_backend.extractors import HttpRequestMixin
 from ocd_backend.utils.api import FrontendAPIMixin
+from ocd_backend.utils.tally import VoteTally
 
 
 class IBabsVotingRoundItem(HttpRequestMixin, FrontendAPIMixin, BaseItem):
@@ -63,23 +64,11 @@ class IBabsVotingRoundItem(HttpRequestMixin, FrontendAPIMixin, BaseItem):
     def _get_group_results(self, parties):
         if not self.original_item['entry']['ListCanVote']:
             return []
-        id2names = dict(list(set(
-            [(v['GroupId'], v['GroupName']) for v in self.original_item['votes']])))
-        counts = {}
-        for v in self.original_item['votes']:
-            vote_as_str = "yes" if v['Vote'] else "no"
-            try:
-                counts[(v['GroupId'], vote_as_str)] += 1
-            except KeyError as e:
-                counts[(v['GroupId'], vote_as_str)] = 1
-        return [{
-            "option": group_info[1],
-            "value": num_votes,
-            "group_id": group_info[0],
-            "group": {
-                "name": id2names[group_info[0]]
-            }
-        } for group_info, num_votes in counts.iteritems()]
+        id2names = {v['GroupId']: v['GroupName']
+                    for v in self.original_item['votes']}
+        tally = VoteTally.from_ibabs_votes(
+            [(self.get_object_id(), self.original_item['votes'])])
+        return tally.get_group_results(self.get_object_id(), id2names)
 
     def _get_counts(self, council, parties, members):
         if not self.original_item['entry']['ListCanVote']:
@@ -1,6 +1,8 @@
 import json
+from functools import partial
 
-import requests
+from celery.signals import worker_process_shutdown
+from elasticsearch.exceptions import TransportError
 
 from ocd_backend import celery_app
 from ocd_backend import settings
@@ -9,6 +11,10 @@ from ocd_backend.exceptions import ConfigurationError
 from ocd_backend.log import get_source_logger
 from ocd_backend.mixins import (OCDBackendTaskSuccessMixin,
                                 OCDBackendTaskFailureMixin)
+from ocd_backend.utils.bulk import BulkBuffer
+from ocd_backend.utils.misc import load_object
+from ocd_backend.utils.resolver import resolver_doc_cache
+from ocd_backend.utils.spool import bulk_spool, is_unavailable
 
 log = get_source_logger('loader')
 
@@ -61,9 +67,16 @@ class ElasticsearchLoader(BaseLoader):
     of the same source as the item.
 
     Each URL found in ``media_urls`` is added as a document to the
-    ``RESOLVER_URL_INDEX`` (if it doesn't already exist).
+    ``RESOLVER_URL_INDEX``, unless the same document was already indexed
+    (see :class:`~ocd_backend.utils.resolver.ResolverDocCache`).
+
+    When Elasticsearch is unavailable, the documents of the item are
+    appended to the spool (see :class:`~ocd_backend.utils.spool.BulkSpool`)
+    instead of failing the task, and the item is added to the
+    ``<run_identifier>_spooled`` set of the run.
     """
     def run(self, *args, **kwargs):
+        self.run_identifier = kwargs.get('run_identifier')
         self.current_index_name = kwargs.get('current_index_name')
         self.index_name = kwargs.get('new_index_name')
         self.alias = kwargs.get('index_alias')
@@ -73,16 +86,16 @@ class ElasticsearchLoader(BaseLoader):
 
         return super(ElasticsearchLoader, self).run(*args, **kwargs)
 
-    def load_item(self, combined_object_id, object_id, combined_index_doc, doc,
-                  doc_type):
-        log.info('Indexing document id: %s' % object_id)
-        elasticsearch.index(index=settings.COMBINED_INDEX,
-                            doc_type=doc_type, id=combined_object_id,
-                            body=combined_index_doc)
-
-        # Index documents into new index
-        elasticsearch.index(index=self.index_name, doc_type=doc_type,
-                            body=doc, id=object_id)
+    def get_actions(self, combined_object_id, object_id, combined_index_doc,
+                    doc, doc_type):
+        """Returns the ``(index, doc_type, id, body)`` of the documents
+        that are indexed for an item."""
+        actions = [
+            (settings.COMBINED_INDEX, doc_type, combined_object_id,
+             combined_index_doc),
+            # Index documents into new index
+            (self.index_name, doc_type, object_id, doc)
+        ]
 
         m_url_content_types = {}
         if 'media_urls' in doc['enrichments']:
@@ -93,6 +106,7 @@ class ElasticsearchLoader(BaseLoader):
 
         # For each media_urls.url, add a resolver document to the
         # RESOLVER_URL_INDEX
+        url_docs = {}
         if 'media_urls' in doc:
             for media_url in doc['media_urls']:
                 url_hash = media_url['url'].split('/')[-1]
@@ -104,10 +118,135 @@ class ElasticsearchLoader(BaseLoader):
                     url_doc['content_type'] = \
                         m_url_content_types[media_url['original_url']]
 
-                # Update if already exists
-                elasticsearch.index(index=settings.RESOLVER_URL_INDEX,
-                                         doc_type='url', id=url_hash,
-                                         body=url_doc)
+                url_docs[url_hash] = url_doc
+
+        # Only (re)write the resolver documents that are new or changed
+        for url_hash, url_doc in sorted(
+                resolver_doc_cache.filter_changed(url_docs).items()):
+            actions.append((settings.RESOLVER_URL_INDEX, 'url', url_hash,
+                            url_doc))
+
+        return actions
+
+    @staticmethod
+    def get_url_docs(actions):
+        """Returns the resolver documents in ``actions`` by URL hash."""
+        return dict((doc_id, body) for index, _, doc_id, body in actions
+                    if index == settings.RESOLVER_URL_INDEX)
+
+    def load_item(self, combined_object_id, object_id, combined_index_doc, doc,
+                  doc_type):
+        log.info('Indexing document id: %s' % object_id)
+        actions = self.get_actions(combined_object_id, object_id,
+                                   combined_index_doc, doc, doc_type)
+        try:
+            for index, action_doc_type, doc_id, body in actions:
+                elasticsearch.index(index=index, doc_type=action_doc_type,
+                                    id=doc_id, body=body)
+        except TransportError, e:
+            if not is_unavailable(e):
+                raise
+            log.warning('Spooling document id %s: %s' % (object_id, e))
+            serializer = elasticsearch.transport.serializer
+            lines = []
+            for index, action_doc_type, doc_id, body in actions:
+                lines.append(serializer.dumps({'index': {
+                    '_index': index, '_type': action_doc_type,
+                    '_id': doc_id}}))
+                lines.append(serializer.dumps(body))
+            bulk_spool.append(lines)
+            _record_item(object_id, '%s_spooled' % self.run_identifier)
+            return
+
+        resolver_doc_cache.mark_written(self.get_url_docs(actions))
+
+
+class ElasticsearchBulkLoader(ElasticsearchLoader):
+    """Indexes items into Elasticsearch like the
+    :class:`ElasticsearchLoader`, but buffers the documents of the items
+    loaded by a worker process and sends them with a single ``_bulk``
+    request (see :class:`~ocd_backend.utils.bulk.BulkBuffer` and the
+    ``ES_BULK_*`` settings).
+
+    The chain of an item is only marked as done (by calling the cleanup
+    task) after its documents are sent, so ``CleanupElasticsearch`` can't
+    swap the alias of the index before all items are indexed. Items that
+    fail to index are logged and added to the ``<run_identifier>_failed``
+    set of the run, which is reported when the run is finished. Items that
+    are spooled because Elasticsearch is unavailable are added to the
+    ``<run_identifier>_spooled`` set.
+    """
+
+    def load_item(self, combined_object_id, object_id, combined_index_doc, doc,
+                  doc_type):
+        log.debug('Buffering document id: %s' % object_id)
+        actions = self.get_actions(combined_object_id, object_id,
+                                   combined_index_doc, doc, doc_type)
+        bulk_actions = [
+            ({'index': {'_index': index, '_type': action_doc_type,
+                        '_id': doc_id}}, body)
+            for index, action_doc_type, doc_id, body in actions
+        ]
+        self._buffered_items.append(
+            (object_id, bulk_actions, self.get_url_docs(actions)))
+
+    def run(self, *args, **kwargs):
+        self._buffered_items = []
+        return super(ElasticsearchBulkLoader, self).run(*args, **kwargs)
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        if status != 'SUCCESS':
+            return super(ElasticsearchBulkLoader, self).after_return(
+                status, retval, task_id, args, kwargs, einfo)
+
+        # The chain is done once the last of its items is sent
+        pending = {'items': len(self._buffered_items)}
+        if not pending['items']:
+            return self.cleanup(**kwargs)
+
+        cleanup_path = self.source_definition.get('cleanup')
+        for object_id, actions, url_docs in self._buffered_items:
+            bulk_buffer.add(actions, partial(
+                _item_flushed, object_id, url_docs, pending, cleanup_path,
+                kwargs))
+        self._buffered_items = []
+
+
+def _item_flushed(object_id, url_docs, pending, cleanup_path, kwargs,
+                  errors, spooled=False):
+    """Called by the bulk buffer once the documents of an item are sent
+    (or spooled); calls the cleanup task of the chain after its last
+    item."""
+    if spooled:
+        _record_item(object_id, '%s_spooled' % kwargs.get('run_identifier'))
+    elif not errors:
+        resolver_doc_cache.mark_written(url_docs)
+    else:
+        log.error('Indexing document id %s failed: %s' % (object_id, errors))
+        _record_item(object_id, '%s_failed' % kwargs.get('run_identifier'))
+
+    pending['items'] -= 1
+    if pending['items'] == 0:
+        load_object(cleanup_path)().delay(**kwargs)
+
+
+def _record_item(object_id, set_name):
+    try:
+        celery_app.backend.add_value_to_set(set_name, object_id)
+    except Exception, e:
+        log.warning('Unable to add item %s to %s: %s' % (object_id, set_name,
+                                                         e))
+
+
+bulk_buffer = BulkBuffer(elasticsearch, settings.ES_BULK_MAX_ACTIONS,
+                         settings.ES_BULK_MAX_BYTES,
+                         settings.ES_BULK_MAX_INTERVAL, spool=bulk_spool)
+
+
+@worker_process_shutdown.connect
+def flush_bulk_buffer(**kwargs):
+    bulk_buffer.flush()
+    bulk_spool.close()
 
 
 class ElasticsearchUpdateOnlyLoader(ElasticsearchLoader):
@@ -171,42 +310,27 @@ def json_serial(obj):
 class PopitLoader(BaseLoader):
     """
     Loads data to a Popit instance.
-    """
 
-    def _create_or_update_item(self, item, item_id):
-        """
-        First tries to post (aka create) a new item. If that does not work,
-        do an update (aka put).
-        """
-
-        headers = {
-            "Apikey": self.source_definition['popit_api_key'],
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
-
-        popit_url = "%s/%s" % (
-            self.source_definition['popit_base_url'],
-            self.source_definition['doc_type'],)
-        resp = requests.post(
-            popit_url,
-            headers=headers, data=json.dumps(item, default=json_serial))
-
-        # popit update controls where we should update the data from ibabs (overwriting our own data)
-        # or whether we should only add things when there's new information.
-        if ((not self.source_definition.get('popit_update', False)) or (resp.status_code != 500)):
-            return resp
+    The items of a run are collected in the ``<run_identifier>_popit``
+    hash of the result backend, and synced with the collection at once by
+    the :class:`~ocd_backend.tasks.CleanupPopit` task when the run is
+    finished (see :class:`~ocd_backend.utils.popit.PopitSync`).
+    """
 
-        return requests.put(
-            "%s/%s" % (popit_url, item_id,),
-            headers=headers, data=json.dumps(item, default=json_serial))
+    def run(self, *args, **kwargs):
+        self.run_identifier = kwargs.get('run_identifier')
+        return super(PopitLoader, self).run(*args, **kwargs)
 
     def load_item(
             self, combined_object_id, object_id, combined_index_doc, doc,
             doc_type
     ):
-        resp = self._create_or_update_item(
-            combined_index_doc, combined_object_id)
+        key = '%s_popit' % self.run_identifier
+        client = celery_app.backend.client
+        client.hset(key, combined_object_id,
+                    json.dumps(combined_index_doc, default=json_serial))
+        client.expire(key, settings.CELERY_CONFIG
+                      .get('CELERY_TASK_RESULT_EXPIRES', 1800))
 
 
 class JsonLDLoader(BaseLoader):
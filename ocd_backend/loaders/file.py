@@ -1,32 +1,33 @@
-import os
+from celery.signals import worker_process_shutdown
 
 from ocd_backend.extractors import HttpRequestMixin
 from ocd_backend.loaders import JsonLDLoader
 from ocd_backend.log import get_source_logger
 from ocd_backend.utils import json_encoder
+from ocd_backend.utils.segments import segment_store
 
 log = get_source_logger('loader')
 
 
 class FileLoader(JsonLDLoader, HttpRequestMixin):
+    """Appends the JSON-LD documents of items to compressed JSONL segments
+    of the run (see :class:`~ocd_backend.utils.segments.SegmentStore`).
+    Use :class:`~ocd_backend.tasks.CleanupSegments` as the cleanup task to
+    write a manifest of the segments when the run is finished.
+    """
+
+    def run(self, *args, **kwargs):
+        self.run_identifier = kwargs.get('run_identifier')
+        return super(FileLoader, self).run(*args, **kwargs)
+
     def load_item(self, combined_object_id, object_id, combined_index_doc, doc,
                   doc_type):
-        path = "/opt/ori/dumps/%s/%ss" % \
-               (self.source_definition['index_name'], doc_type)
-        print path
-        if not os.path.exists(path):
-            try:
-                os.makedirs(path)
-            except OSError, e:  # Guard against race condition
-                print "File path error", e
-
-        try:
-            file = open(path + '/' + object_id, "w")
-            # print doc
-            print "Write file %s/%s" % (path, object_id)
-            file.write(json_encoder.encode(doc))
-            file.close()
-            return True
-        except Exception, e:
-            print "FILE LOADER ERROR: ", e
-            return False
+        log.debug('Writing document id: %s' % object_id)
+        segment_store.write(self.source_definition['index_name'],
+                            self.run_identifier, doc_type, object_id,
+                            json_encoder.encode(doc))
+
+
+@worker_process_shutdown.connect
+def close_segments(**kwargs):
+    segment_store.close()
@@ -8,7 +8,9 @@ from celery import chain, group
 from ocd_backend.es import elasticsearch as es
 from ocd_backend import settings, celery_app
 from ocd_backend.log import get_source_logger
+from ocd_backend.utils.index_settings import create_build_index
 from ocd_backend.utils.misc import load_object, propagate_chain_get
+from ocd_backend.utils.routing import get_queue
 from ocd_backend.exceptions import ConfigurationError
 
 logger = get_source_logger('pipeline')
@@ -49,6 +51,9 @@ def setup_pipeline(source_definition):
             index_alias=index_alias,
             now=datetime.utcnow().strftime('%Y%m%d%H%M%S')
         )
+        # The serving settings are restored by CleanupElasticsearch
+        if new_index_name != current_index_name:
+            create_build_index(es, new_index_name)
 
     # Parameters that are passed to each task in the chain
     params = {
@@ -123,7 +128,8 @@ def setup_pipeline(source_definition):
                         *item,
                         source_definition=pipeline_definitions[pipeline['id']],
                         **params
-                        )
+                        ).set(queue=get_queue(
+                            'extension', pipeline_definitions[pipeline['id']]))
                     )
                     # Prevent old item being passed down to next steps
                     item = []
@@ -132,7 +138,8 @@ def setup_pipeline(source_definition):
                 step_chain.append(pipeline_transformers[pipeline['id']].s(
                     *item,
                     source_definition=pipeline_definitions[pipeline['id']],
-                    **params))
+                    **params).set(queue=get_queue(
+                        'transformer', pipeline_definitions[pipeline['id']])))
 
                 # Enrichers
                 for enricher_task, enricher_settings in pipeline_enrichers[
@@ -143,7 +150,9 @@ def setup_pipeline(source_definition):
                             pipeline['id']],
                         enricher_settings=enricher_settings,
                         **params
-                        )
+                        ).set(queue=get_queue(
+                            'enricher', pipeline_definitions[pipeline['id']],
+                            enricher_task, enricher_settings))
                     )
 
                 # Loaders
@@ -153,7 +162,8 @@ def setup_pipeline(source_definition):
                     initialized_loaders.append(loader.s(
                         source_definition=pipeline_definitions[
                             pipeline['id']],
-                        **params))
+                        **params).set(queue=get_queue(
+                            'loader', pipeline_definitions[pipeline['id']])))
                 step_chain.append(group(initialized_loaders))
 
                 result = chain(step_chain).delay()
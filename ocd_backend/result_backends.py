@@ -52,6 +52,15 @@ class OCDBackendMixin(object):
     def update_ttl(self, key, ttl=300):
         """Extend the TTL of `key` with `ttl` seconds"""
 
+    def set_with_ttl(self, key, value, ttl):
+        """Set `key` to `value`, expiring after `ttl` seconds"""
+        raise NotImplementedError('Subclass should implement `set_with_ttl` '
+                                  'method')
+
+    def incr(self, key):
+        """Increment the integer value of `key` and return the new value"""
+        raise NotImplementedError('Subclass should implement `incr` method')
+
 
 class OCDRedisBackend(RedisBackend, OCDBackendMixin):
 
@@ -72,3 +81,9 @@ class OCDRedisBackend(RedisBackend, OCDBackendMixin):
 
     def update_ttl(self, key, ttl=300):
         return self.client.expire(key, ttl)
+
+    def set_with_ttl(self, key, value, ttl):
+        return self.client.set(key, value, ex=ttl)
+
+    def incr(self, key):
+        return self.client.incr(key)
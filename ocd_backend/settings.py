@@ -1,6 +1,8 @@
 import os
 import pickle
+from multiprocessing import cpu_count
 
+from kombu import Queue
 from kombu.serialization import register
 
 register('ocd_serializer', pickle.dumps, pickle.loads,
@@ -10,6 +12,52 @@ register('ocd_serializer', pickle.dumps, pickle.loads,
 REDIS_HOST = os.getenv(REDIS_HOST, "redis")
 REDIS_PORT = os.getenv(REDIS_PORT, "6379")
 
+# The Celery queue of each pipeline stage, which can be overridden per source
+# with the ``queues`` of its definition
+PIPELINE_QUEUES = {
+    'extension': 'transform',
+    'transformer': 'transform',
+    'enricher': 'enrich_io',
+    'loader': 'load',
+}
+
+# The queue of the MediaEnricher tasks and other enricher task types. An
+# enricher is sent to the queue of its most expensive task (the first one in
+# ENRICHER_QUEUE_COSTS), so slow PDF parsing doesn't hold up fast stages.
+ENRICHER_TASK_QUEUES = {
+    'file_to_text': 'enrich_cpu',
+    'image_thumbnails': 'enrich_cpu',
+    'image_metadata': 'enrich_io',
+    'media_type': 'enrich_io',
+    'ggm_motion_text': 'enrich_io',
+}
+ENRICHER_QUEUE_COSTS = ('enrich_cpu', 'enrich_io')
+
+# Other queues that the ``queues`` of sources or the ``queue`` of enrichers
+# may name, comma-separated. Tasks can only be sent to declared queues,
+# which workers started without ``-Q`` consume.
+EXTRA_QUEUES = [name for name in os.getenv('EXTRA_QUEUES', '').split(',')
+                if name]
+
+# Worker profiles started with ``./manage.py extract worker --profile``:
+# CPU-heavy enrichment runs in a pool sized to the cores, I/O-bound stages in
+# a larger pool that prefetches more tasks. A worker started without a profile
+# consumes all queues.
+WORKER_PROFILES = {
+    'cpu': {
+        'queues': ['enrich_cpu'],
+        'pool': 'prefork',
+        'concurrency': cpu_count(),
+        'prefetch_multiplier': 1,
+    },
+    'io': {
+        'queues': ['celery', 'transform', 'enrich_io', 'load'],
+        'pool': 'prefork',
+        'concurrency': int(os.getenv('WORKER_IO_CONCURRENCY', 4 * cpu_count())),
+        'prefetch_multiplier': 4,
+    },
+}
+
 CELERY_CONFIG = {
     'BROKER_URL': 'redis://%s:%s/0' % (REDIS_HOST, REDIS_PORT),
     'CELERY_ACCEPT_CONTENT': ['ocd_serializer'],
@@ -27,7 +75,11 @@ CELERY_CONFIG = {
     # Expire results after 30 minutes; otherwise Redis will keep
     # claiming memory for a day
     'CELERY_TASK_RESULT_EXPIRES': 1800,
-    'CELERY_REDIRECT_STDOUTS_LEVEL': 'INFO'
+    'CELERY_REDIRECT_STDOUTS_LEVEL': 'INFO',
+    'CELERY_DEFAULT_QUEUE': 'celery',
+    'CELERY_QUEUES': [Queue(name) for name in sorted(
+        {'celery'} | set(PIPELINE_QUEUES.values()) |
+        set(ENRICHER_QUEUE_COSTS) | set(EXTRA_QUEUES))]
 }
 
 LOGGING = {
@@ -84,6 +136,44 @@ if os.path.exists('/var/log/backend.err'):
 ELASTICSEARCH_HOST = os.getenv('ELASTICSEARCH_HOST', 'localhost')
 ELASTICSEARCH_PORT = os.getenv('ELASTICSEARCH_PORT', 9200)
 
+# Comma separated host:port list of the nodes of the cluster. With ES_SNIFF
+# the other nodes are discovered. Every worker process keeps a pool of up to
+# ES_MAXSIZE connections per node. Bulk requests get ES_BULK_TIMEOUT seconds,
+# searches ES_SEARCH_TIMEOUT seconds and other requests ES_TIMEOUT seconds
+ELASTICSEARCH_HOSTS = os.getenv('ELASTICSEARCH_HOSTS', '{}:{}'.format(
+    ELASTICSEARCH_HOST, ELASTICSEARCH_PORT))
+ES_SNIFF = os.getenv('ES_SNIFF', '').lower() in ('1', 'true', 'yes')
+ES_MAXSIZE = int(os.getenv('ES_MAXSIZE', 10))
+ES_TIMEOUT = float(os.getenv('ES_TIMEOUT', 10))
+ES_TIMEOUTS = {
+    'bulk': float(os.getenv('ES_BULK_TIMEOUT', 120)),
+    'search': float(os.getenv('ES_SEARCH_TIMEOUT', 30))
+}
+
+# The ElasticsearchBulkLoader sends the buffered documents of a worker process
+# with one _bulk request when ES_BULK_MAX_ACTIONS actions or ES_BULK_MAX_BYTES
+# bytes are buffered, or ES_BULK_MAX_INTERVAL seconds after the first one
+ES_BULK_MAX_ACTIONS = int(os.getenv('ES_BULK_MAX_ACTIONS', 500))
+ES_BULK_MAX_BYTES = int(os.getenv('ES_BULK_MAX_BYTES', 10 * 1024 ** 2))
+ES_BULK_MAX_INTERVAL = float(os.getenv('ES_BULK_MAX_INTERVAL', 5))
+
+# A new index that is filled by a full run is created with the build settings,
+# which are replaced by the serving settings before the alias of the source is
+# moved to it. The index is then merged to ES_FORCEMERGE_MAX_SEGMENTS segments
+# (0 to skip), which may take up to ES_FORCEMERGE_TIMEOUT seconds
+ES_BUILD_INDEX_SETTINGS = {
+    'refresh_interval': '-1',
+    'number_of_replicas': 0,
+    'translog.durability': 'async'
+}
+ES_SERVING_INDEX_SETTINGS = {
+    'refresh_interval': os.getenv('ES_REFRESH_INTERVAL', '1s'),
+    'number_of_replicas': int(os.getenv('ES_NUMBER_OF_REPLICAS', 0)),
+    'translog.durability': 'request'
+}
+ES_FORCEMERGE_MAX_SEGMENTS = int(os.getenv('ES_FORCEMERGE_MAX_SEGMENTS', 1))
+ES_FORCEMERGE_TIMEOUT = int(os.getenv('ES_FORCEMERGE_TIMEOUT', 3600))
+
 ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
 
 # The path of the directory used to store temporary files
@@ -92,6 +182,72 @@ TEMP_DIR_PATH = os.path.join(ROOT_PATH, 'temp')
 # The path of the directory used to store static files
 DATA_DIR_PATH = os.path.join(ROOT_PATH, '../data')
 
+# The path of the content-addressed store of media files, which is served by
+# the resolver of the frontend
+MEDIA_STORE_PATH = os.path.join(DATA_DIR_PATH, 'static')
+
+# The path of the cache of text extracted from documents, keyed by the hash of
+# the document
+TEXT_CACHE_PATH = os.path.join(DATA_DIR_PATH, 'text_cache')
+
+# The directory the frontend serves thumbnails from, to which the
+# image_thumbnails task of the MediaEnricher writes every THUMBNAIL_SIZES
+# variant of images, so the frontend never has to decode the originals
+THUMBNAILS_DIR = os.getenv('THUMBNAILS_DIR', os.path.join(ROOT_PATH, '../ocd_frontend/.thumbnail-cache'))
+
+THUMBNAIL_SMALL = 250
+THUMBNAIL_MEDIUM = 500
+THUMBNAIL_LARGE = 1000
+
+THUMBNAIL_SIZES = {
+    'large': {'size': (THUMBNAIL_LARGE, THUMBNAIL_LARGE), 'type': 'aspect'},
+    'medium': {'size': (THUMBNAIL_MEDIUM, THUMBNAIL_MEDIUM), 'type': 'aspect'},
+    'small': {'size': (THUMBNAIL_SMALL, THUMBNAIL_SMALL), 'type': 'aspect'},
+    'large_sq': {'size': (THUMBNAIL_LARGE, THUMBNAIL_LARGE), 'type': 'crop'},
+    'medium_sq': {'size': (THUMBNAIL_MEDIUM, THUMBNAIL_MEDIUM), 'type': 'crop'},
+    'small_sq': {'size': (THUMBNAIL_SMALL, THUMBNAIL_SMALL), 'type': 'crop'},
+}
+
+# The FileLoader appends documents to compressed JSONL segments in
+# FILE_LOADER_DIR/<index_name>/<run_identifier>/<doc_type>s/, and starts a new
+# segment when the current one is larger than FILE_LOADER_SEGMENT_SIZE bytes.
+# The segments of the latest FILE_LOADER_KEEP_RUNS runs of an index are kept
+FILE_LOADER_DIR = os.getenv('FILE_LOADER_DIR', '/opt/ori/dumps')
+FILE_LOADER_SEGMENT_SIZE = int(os.getenv('FILE_LOADER_SEGMENT_SIZE',
+                                         64 * 1024 ** 2))
+FILE_LOADER_KEEP_RUNS = int(os.getenv('FILE_LOADER_KEEP_RUNS', 2))
+
+# Bulk actions that can't be sent because Elasticsearch is unavailable are
+# appended to segments in ES_SPOOL_DIR, which are replayed with
+# 'manage.py elasticsearch replay_spool'. Segments are fsynced every
+# ES_SPOOL_FSYNC_RECORDS items or ES_SPOOL_FSYNC_INTERVAL seconds
+ES_SPOOL_DIR = os.getenv('ES_SPOOL_DIR', os.path.join(DATA_DIR_PATH, 'es_spool'))
+ES_SPOOL_SEGMENT_SIZE = int(os.getenv('ES_SPOOL_SEGMENT_SIZE', 64 * 1024 ** 2))
+ES_SPOOL_FSYNC_RECORDS = int(os.getenv('ES_SPOOL_FSYNC_RECORDS', 100))
+ES_SPOOL_FSYNC_INTERVAL = float(os.getenv('ES_SPOOL_FSYNC_INTERVAL', 1))
+
+# The maximum size of the text cache in bytes, the least recently used entries
+# are evicted when it grows larger
+TEXT_CACHE_MAX_SIZE = int(os.getenv('TEXT_CACHE_MAX_SIZE', 2 * 1024 ** 3))
+
+# Processes that extract the text of a PDF document in parallel, each one a
+# range of PDF_EXTRACTION_PAGES_PER_TASK pages. Set to 0 to extract in the
+# worker itself, without time and memory limits.
+PDF_EXTRACTION_PROCESSES = int(os.getenv('PDF_EXTRACTION_PROCESSES', 2))
+PDF_EXTRACTION_PAGES_PER_TASK = 25
+
+# Seconds after which the extraction of a PDF document is stopped, and only
+# the text extracted so far is used
+PDF_EXTRACTION_TIMEOUT = int(os.getenv('PDF_EXTRACTION_TIMEOUT', 120))
+
+# Maximum address space of a PDF extraction process in bytes, 0 for no limit
+PDF_EXTRACTION_MEMORY_LIMIT = int(os.getenv('PDF_EXTRACTION_MEMORY_LIMIT', 1024 ** 3))
+
+# Seconds between the log messages with the number of documents and the time
+# spent per text extraction backend of a worker, 0 to not log them
+EXTRACTION_TIMINGS_LOG_INTERVAL = int(os.getenv(
+    'EXTRACTION_TIMINGS_LOG_INTERVAL', 600))
+
 # The path of the JSON file containing the sources config
 SOURCES_CONFIG_FILE = os.path.join(ROOT_PATH, 'sources/*')
 
@@ -113,6 +269,40 @@ USER_AGENT = 'Open Raadsinformatie/0.1 (+http://www.openraadsinformatie.nl/)'
 # to download dumps from another API instance than the one hosted by OpenState
 API_URL = os.getenv('API_URL', 'http://frontend:5000/v0/')
 
+# Frontend API search results for these doc types are cached by
+# FrontendAPIMixin.api_request, as items request the same council, committees,
+# parties and persons over and over while they are being transformed
+DIRECTORY_CACHE_DOC_TYPES = ('organizations', 'persons')
+
+# Seconds a cached directory result is kept in Redis, shared by all workers
+DIRECTORY_CACHE_TTL = 6 * 3600
+
+# Seconds a worker process keeps a directory result in memory before it checks
+# Redis again for invalidation
+DIRECTORY_CACHE_LOCAL_TTL = 60
+
+# Seconds the text extracted from a document by the DocumentTextEnricher is
+# cached by URL
+DOCUMENT_TEXT_CACHE_TTL = 7 * 24 * 3600
+
+# HTTP sessions the MediaEnricher keeps per worker process, one per host and
+# set of credentials, so connections are reused across items
+HTTP_SESSION_POOL_MAX_SESSIONS = int(os.getenv('HTTP_SESSION_POOL_MAX_SESSIONS', 32))
+
+# Connections each pooled HTTP session keeps open to its host
+HTTP_SESSION_POOL_MAXSIZE = int(os.getenv('HTTP_SESSION_POOL_MAXSIZE', 10))
+
+# Seconds after which an unused pooled HTTP session is closed
+HTTP_SESSION_POOL_IDLE_TIMEOUT = int(os.getenv('HTTP_SESSION_POOL_IDLE_TIMEOUT', 300))
+
+# Concurrent requests the CleanupPopit task sends to a PopIt instance, at most
+# HTTP_SESSION_POOL_MAXSIZE
+POPIT_SYNC_CONCURRENCY = int(os.getenv('POPIT_SYNC_CONCURRENCY', 4))
+
+# The maximum size of a downloaded document or media file in bytes, larger
+# files are not downloaded
+DOWNLOAD_MAX_SIZE = int(os.getenv('DOWNLOAD_MAX_SIZE', 512 * 1024 ** 2))
+
 # The endpoint for the iBabs API
 IBABS_WSDL = u'https://www.mijnbabs.nl/iBabsWCFService/Public.svc?singleWsdl'
 
@@ -1,12 +1,22 @@
+import json
+
+from elasticsearch.exceptions import NotFoundError
 
 from ocd_backend import celery_app
 from ocd_backend import settings
 from ocd_backend.es import elasticsearch as es
 from ocd_backend.log import get_source_logger
+from ocd_backend.utils.api import directory_cache
+from ocd_backend.utils.index_settings import finish_build_index
+from ocd_backend.utils.popit import PopitClient, PopitSync
+from ocd_backend.utils.segments import segment_store
 
 
 log = get_source_logger('ocd_backend.tasks')
 
+# The runs of which the alias wasn't moved because items were spooled
+HELD_RUNS_KEY = 'ori_held_runs'
+
 
 class BaseCleanup(celery_app.Task):
     ignore_result = True
@@ -34,7 +44,82 @@ class BaseCleanup(celery_app.Task):
                                   'in a subclass.')
 
 
+def finish_run(current_index_name, new_index_name, index_alias,
+               source_definition=None, **kwargs):
+    """Moves the alias of a run that reindexed a source to its new index,
+    and removes the old index.
+
+    :param current_index_name: the index the alias was applied to.
+    :param new_index_name: the index the run loaded the items into.
+    :param index_alias: the alias of the source.
+    :param source_definition: the definition of the source.
+    """
+    # The new index was created with the build settings
+    if current_index_name != new_index_name:
+        finish_build_index(es, new_index_name)
+
+    actions = {
+        'actions': [
+            {
+                'remove': {
+                    'index': current_index_name,
+                    'alias': index_alias
+                }
+            },
+            {
+                'add': {
+                    'index': new_index_name,
+                    'alias': index_alias
+                }
+            }
+        ]
+    }
+
+    # Set alias to new index
+    es.indices.update_aliases(body=actions)
+
+    # Remove old index
+    if current_index_name != new_index_name:
+        es.indices.delete(index=current_index_name)
+
+    # Items of later runs should see the reloaded organizations or persons
+    source_definition = source_definition or {}
+    if source_definition.get('doc_type') in \
+            settings.DIRECTORY_CACHE_DOC_TYPES:
+        directory_cache.invalidate(source_definition.get(
+            'index_name', source_definition.get('id')))
+
+
+def finish_held_run(current_index_name, new_index_name, index_alias,
+                    **kwargs):
+    """Finishes a run that was held because items were spooled (see
+    :func:`finish_run`), unless a later run of the source moved the
+    alias away from ``current_index_name`` in the meantime. The index of
+    such a superseded run is removed instead. Held runs of the same alias
+    should be finished from the newest to the oldest.
+
+    :returns: whether the run was finished, ``False`` if it was
+        superseded.
+    :rtype: bool
+    """
+    try:
+        alias_indexes = es.indices.get_alias(name=index_alias)
+    except NotFoundError:
+        alias_indexes = {}
+
+    if current_index_name in alias_indexes:
+        finish_run(current_index_name, new_index_name, index_alias, **kwargs)
+        return True
+
+    if new_index_name not in alias_indexes:
+        es.indices.delete(index=new_index_name, ignore=404)
+    return False
+
+
 class CleanupElasticsearch(BaseCleanup):
+    """Moves the alias of the source to the index of the run once all
+    items are loaded, unless items of the run were spooled; the run is
+    then held in ``HELD_RUNS_KEY`` until the spool is replayed."""
 
     def run_finished(self, run_identifier, **kwargs):
         current_index_name = kwargs.get('current_index_name')
@@ -47,31 +132,83 @@ class CleanupElasticsearch(BaseCleanup):
                                               new_index_name)
         log.info(result)
 
-        actions = {
-            'actions': [
-                {
-                    'remove': {
-                        'index': current_index_name,
-                        'alias': alias
-                    }
-                },
-                {
-                    'add': {
-                        'index': new_index_name,
-                        'alias': alias
-                    }
-                }
-            ]
-        }
+        # Items the ElasticsearchBulkLoader failed to index
+        failed_key = '{}_failed'.format(run_identifier)
+        failed = self.backend.get_set_cardinality(failed_key)
+        if failed:
+            log.warning('{} items of run {} could not be indexed'
+                        .format(failed, run_identifier))
+            self.backend.remove(failed_key)
+
+        # The documents of spooled items aren't in the new index until the
+        # spool is replayed, so the alias is moved by 'manage.py
+        # elasticsearch finish_held_runs' afterwards
+        spooled_key = '{}_spooled'.format(run_identifier)
+        spooled = self.backend.get_set_cardinality(spooled_key)
+        if spooled:
+            log.warning('{} items of run {} were spooled, the alias "{}" is '
+                        'held on "{}". Load them with "manage.py '
+                        'elasticsearch replay_spool" on each worker host, '
+                        'then run "manage.py elasticsearch finish_held_runs"'
+                        .format(spooled, run_identifier, alias,
+                                current_index_name))
+            held_run = {
+                'current_index_name': current_index_name,
+                'new_index_name': new_index_name,
+                'index_alias': alias,
+                'source_definition': kwargs.get('source_definition', {}),
+                'spooled': spooled
+            }
+            self.backend.client.hset(HELD_RUNS_KEY, run_identifier,
+                                     json.dumps(held_run))
+            self.backend.remove(spooled_key)
+            return result
+
+        finish_run(**kwargs)
 
-        # Set alias to new index
-        es.indices.update_aliases(body=actions)
+        return result
 
-        # Remove old index
-        if current_index_name != new_index_name:
-            es.indices.delete(index=current_index_name)
 
-        return result
+class CleanupSegments(BaseCleanup):
+    """Writes the manifest of the segments written by the
+    :class:`~ocd_backend.loaders.file.FileLoader` during the run."""
+
+    def run_finished(self, run_identifier, **kwargs):
+        source_definition = kwargs.get('source_definition', {})
+        segment_store.close()
+        segment_store.write_manifest(source_definition['index_name'],
+                                     run_identifier)
+        log.info('Finished run {}.'.format(run_identifier))
+
+
+class CleanupPopit(BaseCleanup):
+    """Syncs the items collected by the
+    :class:`~ocd_backend.loaders.PopitLoader` with the PopIt collection of
+    the source. Existing items are only updated if the source sets
+    ``popit_update``, and items that were not loaded are only deleted if
+    it sets ``popit_delete``."""
+
+    def run_finished(self, run_identifier, **kwargs):
+        source_definition = kwargs.get('source_definition', {})
+        key = '{}_popit'.format(run_identifier)
+        desired = dict(
+            (item_id.decode('utf-8'), json.loads(item))
+            for item_id, item in self.backend.client.hgetall(key).iteritems())
+        self.backend.remove(key)
+
+        # Don't empty the collection when nothing was loaded
+        if not desired:
+            log.warning('No PopIt items were loaded in run {}'
+                        .format(run_identifier))
+            return
+
+        client = PopitClient(source_definition['popit_base_url'],
+                             source_definition['popit_api_key'],
+                             source_definition['doc_type'])
+        PopitSync(client, update=source_definition.get('popit_update', False),
+                  delete=source_definition.get('popit_delete', False),
+                  concurrency=settings.POPIT_SYNC_CONCURRENCY).sync(desired)
+        log.info('Finished run {}.'.format(run_identifier))
 
 
 class DummyCleanup(BaseCleanup):
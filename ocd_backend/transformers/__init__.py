@@ -79,11 +79,12 @@ class BaseTransformer(OCDBackendTaskFailureMixin, celery_app.Task):
 
         self.add_resolveable_media_urls(item)
 
+        documents = item.build_documents()
         return (
-            item.get_combined_object_id(),
-            item.get_object_id(),
-            item.get_combined_index_doc(),
-            item.get_index_doc(),
+            documents.combined_object_id,
+            documents.object_id,
+            documents.combined_index_doc,
+            documents.index_doc,
             item.doc_type,
         )
 
@@ -1,8 +1,106 @@
 import json
+import time
+from hashlib import sha1
 
 import requests
 
+from ocd_backend import celery_app
 from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('api')
+
+
+class DirectoryCache(object):
+    """
+    Caches frontend API search results for directory-like doc types
+    (organizations, persons) that items request for every document.
+
+    Results are stored in the result backend (Redis) with a TTL, so they
+    are shared by all workers, and in a short-lived in-process layer. Each
+    index has a generation counter that is part of the Redis keys;
+    :meth:`invalidate` increments it when the directory entities of an
+    index are reloaded, which orphans all results cached for that index.
+    """
+
+    key_prefix = 'ori_directory_cache'
+
+    #: Prune expired in-process entries once this many are stored
+    max_local_entries = 1000
+
+    def __init__(self, ttl=settings.DIRECTORY_CACHE_TTL,
+                 local_ttl=settings.DIRECTORY_CACHE_LOCAL_TTL):
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self._local = {}
+
+    @staticmethod
+    def request_key(api_url, api_query):
+        return sha1(u'%s %s' % (api_url, json.dumps(api_query, sort_keys=True))
+                    ).hexdigest()
+
+    def _generation_key(self, index_name):
+        return '%s_%s_generation' % (self.key_prefix, index_name)
+
+    def _key(self, index_name, request_key):
+        generation = celery_app.backend.get(
+            self._generation_key(index_name)) or 0
+        return '%s_%s_%s_%s' % (self.key_prefix, index_name, generation,
+                                request_key)
+
+    def get(self, index_name, request_key):
+        """Returns the cached result, or ``None`` if it is not cached."""
+        entry = self._local.get((index_name, request_key))
+        if entry and entry[0] > time.time():
+            return json.loads(entry[1])
+
+        try:
+            value = celery_app.backend.get(self._key(index_name, request_key))
+        except Exception, e:
+            log.warning('Unable to read from directory cache: %s' % e)
+            return
+
+        if value is None:
+            return
+
+        self._set_local(index_name, request_key, value)
+        return json.loads(value)
+
+    def set(self, index_name, request_key, result):
+        value = json.dumps(result)
+        self._set_local(index_name, request_key, value)
+
+        try:
+            celery_app.backend.set_with_ttl(self._key(index_name, request_key),
+                                            value, self.ttl)
+        except Exception, e:
+            log.warning('Unable to write to directory cache: %s' % e)
+
+    def invalidate(self, index_name):
+        """Drop all results that are cached for ``index_name``."""
+        for key in self._local.keys():
+            if key[0] == index_name:
+                del self._local[key]
+
+        try:
+            celery_app.backend.incr(self._generation_key(index_name))
+        except Exception, e:
+            log.warning('Unable to invalidate directory cache for %s: %s'
+                        % (index_name, e))
+            return
+        log.info('Invalidated directory cache for %s' % index_name)
+
+    def _set_local(self, index_name, request_key, value):
+        now = time.time()
+        if len(self._local) >= self.max_local_entries:
+            for key, entry in self._local.items():
+                if entry[0] <= now:
+                    del self._local[key]
+
+        self._local[(index_name, request_key)] = (now + self.local_ttl, value)
+
+
+directory_cache = DirectoryCache()
 
 
 class FrontendAPIMixin(object):
@@ -45,6 +143,16 @@ class FrontendAPIMixin(object):
                 else:
                     api_query["filters"][k] = v
 
+        # Organizations and persons don't change during a run, so they are
+        # served from the directory cache when possible
+        use_cache = doc_type in settings.DIRECTORY_CACHE_DOC_TYPES and \
+            self.source_definition.get('directory_cache', True)
+        if use_cache:
+            request_key = directory_cache.request_key(api_url, api_query)
+            result = directory_cache.get(index_name, request_key)
+            if result is not None:
+                return result
+
         r = self.http_session.post(
             api_url,
             data=json.dumps(api_query)
@@ -56,10 +164,16 @@ class FrontendAPIMixin(object):
 
         if doc_type:
             try:
-                return r.json()[doc_type]
+                result = r.json()[doc_type]
             except KeyError:
                 return None
-        return r.json()
+        else:
+            result = r.json()
+
+        if use_cache:
+            directory_cache.set(index_name, request_key, result)
+
+        return result
 
     def api_request_object(self, index_name, doc_type, object_id, *args,
                            **kwargs):
@@ -0,0 +1,157 @@
+import os
+import threading
+
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils.spool import is_unavailable
+
+log = get_source_logger('bulk')
+
+
+class BulkBuffer(object):
+    """Buffers Elasticsearch actions of a worker process and sends them in
+    a single ``_bulk`` request.
+
+    The buffer is flushed when it holds ``max_actions`` actions or
+    ``max_bytes`` bytes, and at the latest ``max_interval`` seconds after
+    the first action was added, by a timer thread. Actions are added per
+    item, each with a callback that is called with the errors of the
+    item's actions (an empty list when all succeeded) once they are sent.
+
+    When a ``spool`` (see :class:`~ocd_backend.utils.spool.BulkSpool`) is
+    given, the actions of items that can't be sent because Elasticsearch
+    is unavailable, or that it rejects because it is overloaded, are
+    appended to the spool, and the callback is called with an empty list
+    and ``spooled=True``.
+
+    A forked process starts with an empty buffer; the actions of the
+    parent are flushed by the parent.
+
+    :param es: the Elasticsearch client.
+    :param max_actions: the maximum number of buffered actions.
+    :type max_actions: int
+    :param max_bytes: the maximum size of the buffered request body.
+    :type max_bytes: int
+    :param max_interval: the maximum number of seconds an action is
+        buffered.
+    :type max_interval: float
+    :param spool: the spool of actions that can't be sent.
+    """
+
+    def __init__(self, es, max_actions, max_bytes, max_interval, spool=None):
+        self.es = es
+        self.max_actions = max_actions
+        self.max_bytes = max_bytes
+        self.max_interval = max_interval
+        self.spool = spool
+        self._reset()
+
+    def _reset(self):
+        self._items = []
+        self._actions = 0
+        self._bytes = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+
+    def __len__(self):
+        return self._actions
+
+    def add(self, actions, callback=None):
+        """Adds the actions of an item.
+
+        :param actions: a list of ``(action, source)`` tuples, where
+            ``action`` is the metadata line of a bulk action, such as
+            ``{'index': {'_index': ..., '_type': ..., '_id': ...}}``, and
+            ``source`` the document, or ``None`` for actions without one.
+        :type actions: list
+        :param callback: a function that is called with the list of errors
+            of the actions after they are sent.
+        """
+        if os.getpid() != self._pid:
+            self._reset()
+
+        serializer = self.es.transport.serializer
+        lines = []
+        for action, source in actions:
+            lines.append(serializer.dumps(action))
+            if source is not None:
+                lines.append(serializer.dumps(source))
+
+        with self._lock:
+            self._items.append((lines, len(actions), callback))
+            self._actions += len(actions)
+            self._bytes += sum(len(line) + 1 for line in lines)
+
+            if self._actions >= self.max_actions or \
+                    self._bytes >= self.max_bytes:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Sends all buffered actions and calls the callbacks of their
+        items.
+
+        :returns: the number of items that were sent.
+        """
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+
+            items = self._items
+            if self._timer is not None:
+                self._timer.cancel()
+            self._items = []
+            self._actions = 0
+            self._bytes = 0
+            self._timer = None
+
+            if not items:
+                return 0
+
+            body = '\n'.join(line for lines, _, _ in items
+                             for line in lines) + '\n'
+            unavailable = False
+            try:
+                results = self.es.bulk(body=body)['items']
+            except Exception, e:
+                log.exception('Bulk request of %d items failed' % len(items))
+                results = None
+                error = repr(e)
+                unavailable = is_unavailable(e)
+
+            offset = 0
+            for lines, n_actions, callback in items:
+                if results is None:
+                    errors = [error] * n_actions
+                    rejected = unavailable
+                else:
+                    item_results = [result.values()[0] for result in
+                                    results[offset:offset + n_actions]]
+                    errors = [result['error'] for result in item_results
+                              if result.get('error')]
+                    rejected = any(result.get('status') == 429
+                                   for result in item_results)
+                offset += n_actions
+
+                spooled = False
+                if rejected and self.spool is not None:
+                    try:
+                        self.spool.append(lines)
+                        spooled = True
+                    except Exception:
+                        log.exception('Spooling bulk item failed')
+
+                if callback is not None:
+                    try:
+                        if spooled:
+                            callback([], spooled=True)
+                        else:
+                            callback(errors)
+                    except Exception:
+                        log.exception('Callback of bulk item failed')
+
+        log.debug('Flushed %d items (%d actions)' % (len(items), offset))
+        return len(items)
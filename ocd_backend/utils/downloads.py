@@ -0,0 +1,213 @@
+import os
+import re
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+
+import magic
+
+from ocd_backend import settings
+from ocd_backend.exceptions import DownloadTooLarge
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('downloads')
+
+#: The number of bytes the MIME type is sniffed from
+SNIFF_SIZE = 8192
+
+_content_range_re = re.compile(r'bytes\s+\d+-\d+/(\d+|\*)')
+
+
+class Download(object):
+    """A downloaded file, spooled to a temporary file on disk that is
+    removed when it is closed.
+
+    Behaves like the file it was spooled to, and additionally has the
+    ``url``, the ``sha256`` and ``size`` of the retrieved content, the
+    ``mime_type`` sniffed from its first bytes, the ``content_type``
+    sent by the server and whether the content is ``complete``.
+    """
+
+    def __init__(self, url, file_object, checksum, size, mime_type,
+                 content_type, content_length, complete):
+        self.url = url
+        self.file = file_object
+        self.sha256 = checksum
+        self.size = size
+        self.mime_type = mime_type
+        self.content_type = content_type
+        self.content_length = content_length
+        self.complete = complete
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def stream_download(url, http_resp, max_size=None, partial_size=None,
+                    chunk_size=512*1024, spool_dir=None):
+    """Streams the content of a response to a temporary file on disk,
+    computing its SHA-256 and sniffing its MIME type from the first bytes
+    while it is written, so the file never has to be read again.
+
+    The response is closed afterwards, which releases the connection to
+    the pool of its session.
+
+    :param url: the URL that was requested.
+    :type url: str
+    :param http_resp: the response of a request made with
+        ``stream=True``.
+    :type http_resp: :class:`requests.Response`
+    :param max_size: the maximum number of bytes that is downloaded,
+        ``DOWNLOAD_MAX_SIZE`` by default.
+    :type max_size: int
+    :param partial_size: stop after this number of bytes, the complete
+        content is retrieved if ``None``.
+    :type partial_size: int
+    :param spool_dir: the directory of the temporary file,
+        ``TEMP_DIR_PATH`` by default.
+    :type spool_dir: str
+    :raises DownloadTooLarge: if the content is larger than ``max_size``.
+    :rtype: :class:`Download`
+    """
+    if max_size is None:
+        max_size = settings.DOWNLOAD_MAX_SIZE
+    if spool_dir is None:
+        spool_dir = settings.TEMP_DIR_PATH
+
+    content_length = http_resp.headers.get('content-length')
+    content_length = int(content_length) if content_length else None
+    if max_size and content_length > max_size and not partial_size:
+        http_resp.close()
+        raise DownloadTooLarge('%s is %d bytes, the maximum is %d bytes'
+                               % (url, content_length, max_size))
+
+    if not os.path.exists(spool_dir):
+        try:
+            os.makedirs(spool_dir)
+        except OSError:
+            # Created by another worker in the meantime
+            pass
+
+    spool_file = NamedTemporaryFile(prefix='ocd_d_', suffix='.tmp',
+                                    dir=spool_dir)
+    checksum = sha256()
+    head = b''
+    size = 0
+    complete = True
+
+    try:
+        for chunk in http_resp.iter_content(chunk_size=chunk_size):
+            if not chunk:  # filter out keep-alive chunks
+                continue
+
+            if partial_size and size + len(chunk) >= partial_size:
+                chunk = chunk[:partial_size - size]
+                complete = content_length == size + len(chunk)
+
+            if len(head) < SNIFF_SIZE:
+                head += chunk[:SNIFF_SIZE - len(head)]
+
+            size += len(chunk)
+            if max_size and size > max_size:
+                raise DownloadTooLarge('%s is larger than the maximum of %d '
+                                       'bytes' % (url, max_size))
+
+            spool_file.write(chunk)
+            checksum.update(chunk)
+
+            if partial_size and size >= partial_size:
+                break
+    except:
+        spool_file.close()
+        raise
+    finally:
+        # Releases the connection to the pool, or discards it when the
+        # response wasn't read completely
+        http_resp.close()
+
+    spool_file.flush()
+    spool_file.seek(0)
+
+    mime_type = magic.from_buffer(head, mime=True) if head else None
+    log.debug('Downloaded %s [%s/%s, %s]' % (url, size, content_length,
+                                              mime_type))
+
+    return Download(url, spool_file, checksum.hexdigest(), size, mime_type,
+                    http_resp.headers.get('content-type'), content_length,
+                    complete)
+
+
+def probe_size(session, url, **kwargs):
+    """Returns the size of the file at ``url`` from the ``content-length``
+    of a HEAD request, or ``None`` when the server doesn't send it.
+
+    :param session: the session that is used for the request.
+    :type session: :class:`requests.Session`
+    """
+    try:
+        http_resp = session.head(url, allow_redirects=True, **kwargs)
+    except Exception, e:
+        log.debug('HEAD request for %s failed: %s' % (url, e))
+        return
+    http_resp.close()
+
+    content_length = http_resp.headers.get('content-length')
+    if http_resp.ok and content_length:
+        return int(content_length)
+
+
+def partial_download(session, url, size, **kwargs):
+    """Downloads the first ``size`` bytes of the file at ``url`` with a
+    ``Range`` request, so the server only sends what is needed and the
+    connection can be reused afterwards.
+
+    When the server ignores the range, the content is streamed until
+    ``size`` bytes are retrieved instead (see :func:`stream_download`).
+    The ``content_length`` of the returned download is the size of the
+    complete file, taken from the ``content-range`` of the response or a
+    HEAD request, or ``None`` if it's unknown.
+
+    :param session: the session that is used for the requests.
+    :type session: :class:`requests.Session`
+    :param url: the URL of the file.
+    :type url: str
+    :param size: the number of bytes that is retrieved.
+    :type size: int
+    :param kwargs: additional arguments of the requests, like ``timeout``.
+    :rtype: :class:`Download`
+    """
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers['Range'] = 'bytes=0-%d' % (size - 1)
+    http_resp = session.get(url, headers=headers, stream=True, **kwargs)
+
+    if http_resp.status_code == 416:
+        # The range can't be satisfied by an empty file
+        http_resp.close()
+        del headers['Range']
+        http_resp = session.get(url, headers=headers, stream=True, **kwargs)
+    http_resp.raise_for_status()
+
+    if http_resp.status_code != 206:
+        log.debug('Server ignored range request for %s' % url)
+        return stream_download(url, http_resp, partial_size=size)
+
+    match = _content_range_re.match(http_resp.headers.get('content-range', ''))
+    if match and match.group(1) != '*':
+        total_size = int(match.group(1))
+    else:
+        total_size = probe_size(session, url, **kwargs)
+
+    # The response only contains the requested range, so it is read
+    # completely, which keeps the connection reusable
+    download = stream_download(url, http_resp)
+    download.content_length = total_size
+    download.complete = total_size is not None and download.size >= total_size
+    return download
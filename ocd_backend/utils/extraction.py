@@ -0,0 +1,260 @@
+import re
+import time
+import zipfile
+from collections import defaultdict
+
+import magic
+import pdfparser.poppler as pdf
+import tika.parser as parser
+from lxml import etree, html
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils.pdf_extraction import pdf_extraction_service
+
+log = get_source_logger('extraction')
+
+WORDPROCESSINGML = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+DRAWINGML = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+SPREADSHEETML = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+ODF_TEXT = 'urn:oasis:names:tc:opendocument:xmlns:text:1.0'
+
+_blank_lines_re = re.compile(r'\n\s*\n+')
+
+
+def poppler_page_count(fname):
+    return pdf.Document(fname).no_of_pages
+
+
+def poppler_pages_text(fname, first, last):
+    """Returns the text of pages ``first`` to ``last`` (one-based,
+    inclusive) of a PDF document, one line per line of text."""
+    text_array = []
+    d = pdf.Document(fname)
+    for i in xrange(first, last + 1):
+        for f in d.get_page(i):
+            for b in f:
+                for l in b:
+                    text_array.append(l.text.encode('UTF-8'))
+    return '\n'.join(text_array)
+
+
+def extract_pdf(fname, pages=None):
+    return pdf_extraction_service.extract(
+        fname, poppler_pages_text, poppler_page_count, pages)
+
+
+def extract_plain(fname, pages=None):
+    with open(fname, 'rb') as f:
+        content = f.read()
+    try:
+        content = content.decode('utf-8')
+    except UnicodeDecodeError:
+        content = content.decode('cp1252', 'replace')
+    return content.encode('utf-8'), True
+
+
+def extract_html(fname, pages=None):
+    root = html.parse(fname).getroot()
+    if root is None:
+        return '', True
+
+    for element in root.iter('script', 'style'):
+        element.drop_tree()
+
+    text = u'\n'.join(line.strip() for line in root.text_content().split('\n'))
+    return _blank_lines_re.sub(u'\n\n', text).strip().encode('utf-8'), True
+
+
+def _iter_paragraphs(xml_file, paragraph_tags, text_tags=None):
+    """Streams the text of the paragraphs in an XML document, clearing
+    the elements that are done to keep memory usage flat.
+
+    :param paragraph_tags: the (namespaced) tags of paragraphs.
+    :param text_tags: the tags that contain text in a paragraph, or
+        ``None`` to use all text in the paragraph.
+    """
+    for _, element in etree.iterparse(xml_file, events=('end',),
+                                      tag=paragraph_tags):
+        if text_tags:
+            text = u''.join(t.text or u'' for t in element.iter(*text_tags))
+        else:
+            text = u''.join(element.itertext())
+        if text.strip():
+            yield text
+        element.clear()
+
+
+def _natural_key(name):
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', name)]
+
+
+def extract_ooxml(fname, pages=None):
+    """Extracts the text of Word, PowerPoint and Excel (2007+) files."""
+    paragraphs = []
+    with zipfile.ZipFile(fname) as archive:
+        names = archive.namelist()
+
+        if 'word/document.xml' in names:
+            with archive.open('word/document.xml') as part:
+                paragraphs.extend(_iter_paragraphs(
+                    part, '{%s}p' % WORDPROCESSINGML,
+                    ('{%s}t' % WORDPROCESSINGML,)))
+
+        slides = sorted((n for n in names
+                         if re.match(r'ppt/slides/slide\d+\.xml$', n)),
+                        key=_natural_key)
+        for name in slides[:pages] if pages else slides:
+            with archive.open(name) as part:
+                paragraphs.extend(_iter_paragraphs(
+                    part, '{%s}p' % DRAWINGML, ('{%s}t' % DRAWINGML,)))
+
+        if 'xl/sharedStrings.xml' in names:
+            with archive.open('xl/sharedStrings.xml') as part:
+                paragraphs.extend(_iter_paragraphs(
+                    part, '{%s}si' % SPREADSHEETML))
+
+    return u'\n'.join(paragraphs).encode('utf-8'), True
+
+
+def extract_odf(fname, pages=None):
+    """Extracts the text of OpenDocument text, presentation and
+    spreadsheet files."""
+    with zipfile.ZipFile(fname) as archive:
+        with archive.open('content.xml') as part:
+            paragraphs = list(_iter_paragraphs(
+                part, ('{%s}p' % ODF_TEXT, '{%s}h' % ODF_TEXT)))
+    return u'\n'.join(paragraphs).encode('utf-8'), True
+
+
+def extract_tika(fname, pages=None):
+    content = parser.from_file(fname)['content']
+    return (content or '').encode('UTF-8'), True
+
+
+class ExtractionRouter(object):
+    """Extracts the text of a file with the cheapest backend for its MIME
+    type. Plain text, HTML, Office Open XML and OpenDocument files are
+    parsed in the worker process, PDF documents by the
+    :class:`~ocd_backend.utils.pdf_extraction.PDFExtractionService`, and
+    only other files (or files an in-process backend fails on) are sent
+    to Tika.
+
+    The number of documents, failures and seconds spent per backend are
+    kept in :attr:`timings`, and logged every ``log_interval`` seconds
+    (``EXTRACTION_TIMINGS_LOG_INTERVAL``).
+    """
+
+    #: The registry of available backends, each a function that takes the
+    #: path of a file and the maximum number of pages and returns the UTF-8
+    #: encoded text and whether it is complete
+    available_backends = {
+        'pdf': extract_pdf,
+        'plain': extract_plain,
+        'html': extract_html,
+        'ooxml': extract_ooxml,
+        'odf': extract_odf,
+        'tika': extract_tika,
+    }
+
+    #: The backend per MIME type, Tika is used for other types
+    mime_types = {
+        'application/pdf': 'pdf',
+        'text/plain': 'plain',
+        'text/csv': 'plain',
+        'text/html': 'html',
+        'application/xhtml+xml': 'html',
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'ooxml',
+        'application/vnd.openxmlformats-officedocument.presentationml.presentation': 'ooxml',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': 'ooxml',
+        'application/vnd.oasis.opendocument.text': 'odf',
+        'application/vnd.oasis.opendocument.presentation': 'odf',
+        'application/vnd.oasis.opendocument.spreadsheet': 'odf',
+    }
+
+    fallback_backend = 'tika'
+
+    def __init__(self, log_interval=settings.EXTRACTION_TIMINGS_LOG_INTERVAL):
+        self.log_interval = log_interval
+        self.timings = defaultdict(
+            lambda: {'documents': 0, 'failures': 0, 'seconds': 0.0})
+        self._logged_at = time.time()
+
+    def log_timings(self):
+        """Logs the number of documents, failures and seconds spent per
+        backend since the worker started."""
+        self._logged_at = time.time()
+        for backend, timing in sorted(self.timings.items()):
+            log.info('Text extraction with %s: %d documents (%d failed) in '
+                     '%.1fs, %.3fs per document' % (
+                         backend, timing['documents'], timing['failures'],
+                         timing['seconds'],
+                         timing['seconds'] / (timing['documents'] or 1)))
+
+    def get_backend(self, fname, mime_type=None):
+        """Returns the name of the backend for a file, sniffing the MIME
+        type from its contents if it isn't given."""
+        if not mime_type:
+            mime_type = magic.from_file(fname, mime=True)
+
+        backend = self.mime_types.get(mime_type.split(';')[0].strip().lower())
+        if backend is None and mime_type == 'application/zip':
+            # Older versions of libmagic don't recognize Office files
+            try:
+                with zipfile.ZipFile(fname) as archive:
+                    names = archive.namelist()
+            except zipfile.BadZipfile:
+                names = []
+            if '[Content_Types].xml' in names:
+                backend = 'ooxml'
+            elif 'content.xml' in names:
+                backend = 'odf'
+
+        return backend or self.fallback_backend
+
+    def _run(self, backend, fname, pages):
+        timing = self.timings[backend]
+        start = time.time()
+        try:
+            return self.available_backends[backend](fname, pages)
+        except Exception:
+            timing['failures'] += 1
+            raise
+        finally:
+            elapsed = time.time() - start
+            timing['documents'] += 1
+            timing['seconds'] += elapsed
+            log.debug('Extracted text of %s with %s in %.3fs'
+                      % (fname, backend, elapsed))
+            if self.log_interval and \
+                    time.time() - self._logged_at >= self.log_interval:
+                self.log_timings()
+
+    def extract(self, fname, pages=None, mime_type=None):
+        """Extracts the text of a file.
+
+        :param fname: the path of the file.
+        :type fname: str
+        :param pages: the maximum number of pages to extract from paged
+            documents, all pages if ``None``.
+        :type pages: int
+        :param mime_type: the MIME type of the file, sniffed from the
+            file if it isn't given.
+        :type mime_type: str
+        :returns: a tuple with the UTF-8 encoded text and whether the text
+            is complete.
+        """
+        backend = self.get_backend(fname, mime_type)
+        try:
+            return self._run(backend, fname, pages)
+        except Exception, e:
+            if backend in ('pdf', self.fallback_backend):
+                raise
+            log.warning('Extracting text of %s with %s failed, falling back '
+                        'to %s: %s' % (fname, backend, self.fallback_backend,
+                                       e))
+            return self._run(self.fallback_backend, fname, pages)
+
+
+extraction_router = ExtractionRouter()
@@ -1,35 +1,32 @@
 import tempfile
-import magic
+from time import sleep
 from urllib2 import HTTPError
 
-import pdfparser.poppler as pdf
-import tika.parser as parser
+from ocd_backend.exceptions import DownloadTooLarge
+from ocd_backend.utils.downloads import stream_download
+from ocd_backend.utils.extraction import extraction_router
+from ocd_backend.utils.text_cache import file_checksum, text_cache
+
+# Increase when the output of file_parser changes, so text that is cached
+# by file_to_text is extracted again
+TEXT_EXTRACTOR_VERSION = 3
+
+
+def parse_file(fname, pages=None, mime_type=None):
+    """Returns the UTF-8 encoded text of a file and whether it is the text
+    of the complete file (or first ``pages`` pages), which it isn't when
+    the extraction of a PDF timed out. The backend is chosen by the
+    :class:`~ocd_backend.utils.extraction.ExtractionRouter` from the MIME
+    type of the file."""
+    try:
+        return extraction_router.extract(fname, pages, mime_type)
+    except Exception as e:
+        print "File Parser Exception: ", e
+    return None, False
 
 
 def file_parser(fname, pages=None):
-    if magic.from_file(fname, mime=True) == 'application/pdf':
-        try:
-            text_array = []
-            d = pdf.Document(fname)
-            for i, p in enumerate(d, start=1):
-                for f in p:
-                    for b in f:
-                        for l in b:
-                            text_array.append(l.text.encode('UTF-8'))
-
-                if i == pages:  # break after x pages
-                    break
-
-            print "Processed %i pages" % (i)
-            return '\n'.join(text_array)
-        except Exception as e:
-            print "PDF Parser Exception: ", e
-    else:
-        try:
-            content = parser.from_file(fname)['content']
-            return (content or '').encode('UTF-8')
-        except Exception as e:
-            print "File Parser Exception: ", e
+    return parse_file(fname, pages)[0]
 
 
 class FileToTextMixin(object):
@@ -47,36 +44,103 @@ class FileToTextMixin(object):
         """
         tf = self.file_download(url)
         if tf is not None:
-            return self.file_to_text(tf.name, max_pages)
+            return self.file_to_text(
+                tf.name, max_pages, getattr(tf, 'sha256', None),
+                getattr(tf, 'mime_type', None))
         else:
             return u'' # FIXME: should be something else ...
 
+    def file_text_deferred(self):
+        """
+        Returns ``True`` when one of the enrichers of the source extracts
+        the text of documents, in which case items shouldn't do it
+        themselves.
+        """
+        from ocd_backend.utils.misc import load_object
+
+        deferred = getattr(self, '_file_text_deferred', None)
+        if deferred is None:
+            deferred = any(
+                getattr(load_object(enricher[0]), 'extracts_document_text',
+                        False)
+                for enricher in self.source_definition.get('enrichers', []))
+            self._file_text_deferred = deferred
+        return deferred
+
+    def file_source(self, url, note, throttle=0):
+        """
+        Returns an entry for ``sources`` for the document at ``url``. The
+        ``description`` is left out when the text is extracted later on by
+        :class:`~ocd_backend.enrichers.document_text.DocumentTextEnricher`,
+        otherwise the document is downloaded and converted right away,
+        after waiting ``throttle`` seconds.
+        """
+        source = {
+            'url': url,
+            'note': note
+        }
+
+        if not self.file_text_deferred():
+            if throttle:
+                sleep(throttle)
+            source['description'] = self.file_get_contents(
+                url, self.source_definition.get('pdf_max_pages', 20))
+
+        return source
+
     def file_download(self, url):
         """
-        Downloads a given url to a tempfile.
+        Downloads a given url to a tempfile, which is hashed and sniffed
+        while it is written (see
+        :func:`~ocd_backend.utils.downloads.stream_download`).
         """
 
         print "Downloading %s" % (url,)
         try:
             # GO has no wildcard domain for SSL
-            r = self.http_session.get(url, verify=False)
-            tf = tempfile.NamedTemporaryFile()
-            tf.write(r.content)
-            tf.seek(0)
-            return tf
+            r = self.http_session.get(url, verify=False, stream=True)
+            return stream_download(url, r)
         except HTTPError as e:
             print "Something went wrong downloading %s" % (url,)
+        except DownloadTooLarge as e:
+            print "Not downloading %s: %s" % (url, e)
         except Exception as e:
             print "Some other exception %s" % (url,)
 
-    def file_to_text(self, path, max_pages=20):
+    def file_to_text(self, path, max_pages=20, content_hash=None,
+                     mime_type=None):
         """
-        Method to convert a given PDF file into text file using a subprocess
+        Method to convert a given PDF file into text file using a subprocess.
+        The text is cached by the SHA-256 of the file (see
+        :class:`~ocd_backend.utils.text_cache.TextCache`), so the same
+        document is only parsed once. The hash and MIME type are
+        determined from the file unless they are given.
         """
+        return self.file_extract_text(path, max_pages, content_hash,
+                                      mime_type)[0]
 
-        try:
-            content = file_parser(path, max_pages)
-            text = self.file_clean_text(content.decode('utf-8'))
-            return unicode(text)
-        except AttributeError:
-            return
+    def file_extract_text(self, path, max_pages=20, content_hash=None,
+                          mime_type=None):
+        """
+        Converts a file into text like :meth:`file_to_text`, and returns
+        the text (``None`` if it could not be extracted) and whether it is
+        complete, i.e. extraction did not time out.
+        """
+
+        key = text_cache.key(content_hash or file_checksum(path),
+                             TEXT_EXTRACTOR_VERSION, max_pages)
+        content = text_cache.get(key)
+        complete = True
+
+        if content is None:
+            content, complete = parse_file(path, max_pages, mime_type)
+            if content is None:
+                return None, False
+            content = content.decode('utf-8')
+
+            # Partial text of a document that timed out isn't cached, so
+            # it is extracted again next time
+            if complete:
+                text_cache.set(key, content)
+
+        return unicode(self.file_clean_text(content)), complete
@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from base64 import b64encode
+from collections import OrderedDict
+from urlparse import urlparse
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('http_sessions')
+
+
+class HttpSessionPool(object):
+    """Keeps a :class:`requests.Session` per host and set of credentials
+    for the lifetime of a worker process, so connections to the same host
+    are reused (HTTP Keep-Alive) across items and tasks.
+
+    Sessions that have not been used for ``idle_timeout`` seconds are
+    closed. When more than ``max_sessions`` sessions are open, the least
+    recently used one is closed. A forked process starts with an empty
+    pool, as connections can't be shared with the parent.
+
+    :param max_sessions: the maximum number of sessions that is kept.
+    :type max_sessions: int
+    :param pool_maxsize: the maximum number of connections each session
+        keeps open to its host.
+    :type pool_maxsize: int
+    :param idle_timeout: seconds after which an unused session is closed.
+    :type idle_timeout: int
+    """
+
+    def __init__(self, max_sessions, pool_maxsize, idle_timeout):
+        self.max_sessions = max_sessions
+        self.pool_maxsize = pool_maxsize
+        self.idle_timeout = idle_timeout
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _create_session(self, auth):
+        session = Session()
+        session.headers['User-Agent'] = settings.USER_AGENT
+
+        for prefix in ('http://', 'https://'):
+            http_retry = Retry(total=5, status_forcelist=[500, 503],
+                               backoff_factor=.5)
+            http_adapter = HTTPAdapter(pool_connections=1,
+                                       pool_maxsize=self.pool_maxsize,
+                                       max_retries=http_retry)
+            session.mount(prefix, http_adapter)
+
+        if auth:
+            session.headers['Authorization'] = 'Basic %s' % b64encode(
+                '%s:%s' % auth)
+
+        return session
+
+    def _close(self, key, session):
+        log.debug('Closing HTTP session for %s://%s' % key[:2])
+        session.close()
+
+    def get(self, url, auth=None):
+        """Returns the session for the host of ``url``.
+
+        :param url: the URL that is going to be requested.
+        :type url: str
+        :param auth: an optional ``(user, password)`` tuple that is sent
+            as HTTP Basic authentication.
+        :type auth: tuple
+        :rtype: :class:`requests.Session`
+        """
+        parsed_url = urlparse(url)
+        key = (parsed_url.scheme, parsed_url.netloc,
+               tuple(auth) if auth else None)
+        now = time.time()
+
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._sessions.clear()
+                self._pid = os.getpid()
+
+            # Sessions are ordered by last use, so the idle ones are first
+            while self._sessions:
+                oldest_key, (session, last_used) = next(
+                    self._sessions.iteritems())
+                if now - last_used < self.idle_timeout:
+                    break
+                del self._sessions[oldest_key]
+                self._close(oldest_key, session)
+
+            entry = self._sessions.pop(key, None)
+            session = entry[0] if entry else self._create_session(auth)
+            self._sessions[key] = (session, now)
+
+            while len(self._sessions) > self.max_sessions:
+                oldest_key, (oldest_session, _) = self._sessions.popitem(
+                    last=False)
+                self._close(oldest_key, oldest_session)
+
+        return session
+
+    def close(self):
+        """Closes all sessions in the pool."""
+        with self._lock:
+            while self._sessions:
+                key, (session, _) = self._sessions.popitem()
+                self._close(key, session)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+http_session_pool = HttpSessionPool(
+    settings.HTTP_SESSION_POOL_MAX_SESSIONS,
+    settings.HTTP_SESSION_POOL_MAXSIZE,
+    settings.HTTP_SESSION_POOL_IDLE_TIMEOUT)
@@ -0,0 +1,94 @@
+import os
+from tempfile import NamedTemporaryFile
+
+from PIL import Image, ImageOps
+
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('images')
+
+
+def probe_image(file_object):
+    """Returns the format, mode and dimensions of an image.
+
+    PIL only parses the header of the image when it is opened, the pixel
+    data is never decoded, so this is cheap even for very large images.
+
+    :param file_object: the (seekable) file-like object of the image.
+    :rtype: dict
+    """
+    img = Image.open(file_object)
+    return {
+        'format': img.format,
+        'mode': img.mode,
+        'width': img.size[0],
+        'height': img.size[1]
+    }
+
+
+def get_thumbnail_path(root, identifier, thumbnail_size):
+    """Returns the path of a thumbnail, using the same layout as the
+    frontend (see :func:`ocd_frontend.thumbnails.get_thumbnail_path`)."""
+    return os.path.join(root, identifier[:2],
+                        '{}_{}.jpg'.format(identifier[2:], thumbnail_size))
+
+
+def _save_jpeg(img, path):
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # Created by another worker in the meantime
+            pass
+
+    with NamedTemporaryFile(prefix='.ocd_t_', suffix='.tmp', dir=directory,
+                            delete=False) as tf:
+        img.save(tf, 'JPEG', quality=90)
+    os.rename(tf.name, path)
+
+
+def generate_thumbnails(file_object, identifier, thumbnail_sizes, root):
+    """Creates all thumbnail variants of an image, decoding it only once.
+
+    JPEG images are decoded in draft mode, which lets the decoder scale
+    the image down by up to a factor of 8 while it is decoded, to the
+    smallest size that is still at least as large as the largest
+    thumbnail.
+
+    :param file_object: the (seekable) file-like object of the image.
+    :param identifier: the identifier of the thumbnails, the resolver ID
+        of the media URL.
+    :type identifier: str
+    :param thumbnail_sizes: the variants, mapping a name to the ``size``
+        and ``type`` (``aspect`` or ``crop``) of a thumbnail.
+    :type thumbnail_sizes: dict
+    :param root: the directory the thumbnails are written to.
+    :type root: str
+    :returns: the names of the created variants.
+    :rtype: list
+    """
+    img = Image.open(file_object)
+
+    max_width = max(variant['size'][0] for variant in thumbnail_sizes.values())
+    max_height = max(variant['size'][1] for variant in thumbnail_sizes.values())
+    if img.format == 'JPEG':
+        img.draft('RGB', (max_width, max_height))
+
+    img.load()
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    created = []
+    for name, variant in sorted(thumbnail_sizes.items()):
+        if variant.get('type') == 'crop':
+            thumbnail = ImageOps.fit(img, variant['size'], Image.ANTIALIAS)
+        else:
+            thumbnail = img.copy()
+            thumbnail.thumbnail(variant['size'], Image.ANTIALIAS)
+
+        _save_jpeg(thumbnail, get_thumbnail_path(root, identifier, name))
+        created.append(name)
+
+    log.debug('Created %d thumbnails of %s' % (len(created), identifier))
+    return created
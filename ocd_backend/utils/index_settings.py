@@ -0,0 +1,49 @@
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('index_settings')
+
+
+def create_build_index(es, index_name):
+    """Creates an index that is going to be filled by a full run with the
+    ``ES_BUILD_INDEX_SETTINGS``: no refreshes, no replicas and an
+    asynchronous translog. The other settings and the mappings come from
+    the index template.
+
+    :param es: the Elasticsearch client.
+    :param index_name: the name of the new index.
+    """
+    log.info('Creating index %s with the build settings' % index_name)
+    es.indices.create(index=index_name, body={
+        'settings': {'index': settings.ES_BUILD_INDEX_SETTINGS}
+    })
+
+
+def finish_build_index(es, index_name):
+    """Prepares an index created by :func:`create_build_index` for serving,
+    before an alias is moved to it: restores the
+    ``ES_SERVING_INDEX_SETTINGS``, merges the segments of the index to at
+    most ``ES_FORCEMERGE_MAX_SEGMENTS`` and refreshes it, so all documents
+    are searchable once the alias is moved.
+
+    :param es: the Elasticsearch client.
+    :param index_name: the name of the index.
+    """
+    es.indices.put_settings(index=index_name, body={
+        'index': settings.ES_SERVING_INDEX_SETTINGS
+    })
+
+    if settings.ES_FORCEMERGE_MAX_SEGMENTS:
+        log.info('Merging index %s to %d segments' % (
+            index_name, settings.ES_FORCEMERGE_MAX_SEGMENTS))
+        es.indices.forcemerge(
+            index=index_name,
+            max_num_segments=settings.ES_FORCEMERGE_MAX_SEGMENTS,
+            request_timeout=settings.ES_FORCEMERGE_TIMEOUT)
+
+    es.indices.refresh(index=index_name)
+
+    # Wait for the replicas that were added back
+    if settings.ES_SERVING_INDEX_SETTINGS.get('number_of_replicas'):
+        es.cluster.health(index=index_name, wait_for_status='green',
+                          request_timeout=settings.ES_FORCEMERGE_TIMEOUT)
@@ -0,0 +1,168 @@
+import json
+import os
+from hashlib import sha1
+from tempfile import NamedTemporaryFile
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils.downloads import stream_download
+
+log = get_source_logger('media_store')
+
+
+class MediaStore(object):
+    """A content-addressed store of the media files referenced by items.
+
+    Files are stored once per SHA-256 of their content in
+    ``objects/<sha256[:2]>/<sha256>``, so identical files published under
+    different URLs are only stored once. For each URL the store keeps
+    ``urls/<sha1(url)>.json`` with the ``etag``, ``last_modified``,
+    ``sha256``, ``size``, ``content_type`` and sniffed ``mime_type`` of
+    the last response, which are used to revalidate the file instead of
+    downloading it again.
+
+    ``<sha1(url)>`` is kept as a hard link to the content, so readers of
+    the previous flat layout (one file per URL hash) keep working.
+
+    All files are written to a temporary file first and then renamed
+    or linked into place, so concurrent workers never see partially written files.
+
+    :param root: the directory of the store.
+    :type root: str
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    @staticmethod
+    def url_hash(url):
+        if isinstance(url, unicode):
+            url = url.encode('utf-8')
+        return sha1(url).hexdigest()
+
+    def metadata_path(self, url):
+        return os.path.join(self.root, 'urls', '%s.json' % self.url_hash(url))
+
+    def object_path(self, content_hash):
+        return os.path.join(self.root, 'objects', content_hash[:2],
+                            content_hash)
+
+    def link_path(self, url):
+        return os.path.join(self.root, self.url_hash(url))
+
+    def _temporary_file(self):
+        tmp_dir = os.path.join(self.root, 'tmp')
+        if not os.path.exists(tmp_dir):
+            try:
+                os.makedirs(tmp_dir)
+            except OSError:
+                # Created by another worker in the meantime
+                pass
+        return NamedTemporaryFile(prefix='ocd_s_', suffix='.tmp',
+                                  dir=tmp_dir, delete=False)
+
+    def _move(self, src, dest):
+        dest_dir = os.path.dirname(dest)
+        if not os.path.exists(dest_dir):
+            try:
+                os.makedirs(dest_dir)
+            except OSError:
+                pass
+        os.rename(src, dest)
+
+    def get_metadata(self, url):
+        """Returns the metadata stored for ``url``, or ``None`` when the
+        URL (or its content) isn't in the store."""
+        try:
+            with open(self.metadata_path(url), 'rb') as f:
+                metadata = json.load(f)
+        except (IOError, ValueError):
+            return
+
+        if not os.path.exists(self.object_path(metadata['sha256'])):
+            return
+        return metadata
+
+    def get_conditional_headers(self, metadata):
+        """Returns the headers of a conditional request that revalidates
+        the stored file, or an empty dict if the file can't be
+        revalidated."""
+        headers = {}
+        if metadata.get('etag'):
+            headers['If-None-Match'] = metadata['etag']
+        if metadata.get('last_modified'):
+            headers['If-Modified-Since'] = metadata['last_modified']
+        return headers
+
+    def open(self, metadata):
+        """Opens the stored file of the metadata of a URL."""
+        return open(self.object_path(metadata['sha256']), 'rb')
+
+    def store(self, url, http_resp, chunk_size=512*1024):
+        """Stores the content of a streamed response for ``url``.
+
+        The content is hashed and its MIME type sniffed while it is
+        downloaded (see
+        :func:`~ocd_backend.utils.downloads.stream_download`). If a file
+        with the same content is already stored, the new copy is
+        discarded.
+
+        :param url: the URL that was requested.
+        :type url: str
+        :param http_resp: the (streamed) response of the request.
+        :type http_resp: :class:`requests.Response`
+        :returns: the metadata of the stored URL.
+        :rtype: dict
+        """
+        with stream_download(url, http_resp, chunk_size=chunk_size,
+                             spool_dir=os.path.join(self.root, 'tmp')) \
+                as download:
+            object_path = self.object_path(download.sha256)
+            if os.path.exists(object_path):
+                log.debug('Media item %s is already stored as %s'
+                          % (url, download.sha256))
+            else:
+                self._link_object(download.name, object_path)
+
+        metadata = {
+            'url': url,
+            'etag': http_resp.headers.get('etag'),
+            'last_modified': http_resp.headers.get('last-modified'),
+            'sha256': download.sha256,
+            'size': download.size,
+            'content_type': download.content_type,
+            'mime_type': download.mime_type,
+        }
+        self._write_metadata(url, metadata)
+        self._link(url, object_path)
+
+        return metadata
+
+    def _link_object(self, src, object_path):
+        object_dir = os.path.dirname(object_path)
+        if not os.path.exists(object_dir):
+            try:
+                os.makedirs(object_dir)
+            except OSError:
+                pass
+        try:
+            os.link(src, object_path)
+        except OSError:
+            # Stored by another worker in the meantime
+            if not os.path.exists(object_path):
+                raise
+
+    def _write_metadata(self, url, metadata):
+        with self._temporary_file() as tf:
+            json.dump(metadata, tf)
+        self._move(tf.name, self.metadata_path(url))
+
+    def _link(self, url, object_path):
+        with self._temporary_file() as tf:
+            pass
+        os.remove(tf.name)
+        os.link(object_path, tf.name)
+        self._move(tf.name, self.link_path(url))
+
+
+media_store = MediaStore(settings.MEDIA_STORE_PATH)
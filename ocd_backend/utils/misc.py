@@ -1,44 +1,47 @@
 import datetime
 import glob
 import json
-import re
-import translitcodec
 from lxml import etree
 from string import Formatter
 
 from ocd_backend.exceptions import MissingTemplateTag
+from ocd_backend.utils.parsing import (normalize_motion_id, parse_date,
+                                       parse_date_span, slugify)
 from elasticsearch.helpers import scan, bulk
 
 
-def normalize_motion_id(motion_id, date_as_str=None):
+def transform_hits(hits, transformation_callable=None,
+                   batch_transformation_callable=None, chunk_size=500):
     """
-    Normalizes forms of motion ids
+    Yields the hits of a scan after applying a transformation to them.
+
+    :arg transformation_callable: optional, called with each hit, returns the
+        transformed hit
+    :arg batch_transformation_callable: optional, called with lists of up to
+        `chunk_size` hits, returns the transformed hits. Use this to look up
+        data for many hits at once, such as with one `mget` per chunk
+    :arg chunk_size: number of hits passed to `batch_transformation_callable`
     """
+    if batch_transformation_callable is None:
+        for h in hits:
+            if transformation_callable is not None:
+                h = transformation_callable(h)
+            yield h
+        return
+
+    chunk = []
+    for h in hits:
+        chunk.append(h)
+        if len(chunk) >= chunk_size:
+            for transformed in batch_transformation_callable(chunk):
+                yield transformed
+            chunk = []
+    if chunk:
+        for transformed in batch_transformation_callable(chunk):
+            yield transformed
 
-    regexes = [
-        r'^M(?P<year>\d{4})\s*\-\s*(?P<id>\d+)',
-        r'^(?P<year>\d{4})\s*M\s*(?P<id>\d+)',
-        r'^(?P<year>\d{4})\s*\-\s*(?P<id>\d+)',
-        r'^M\s+(?P<id>\d+)'
-    ]
-
-    for regex in regexes:
-        res = re.match(regex, motion_id.upper())
-        if res is not None:
-            try:
-                year = res.group('year')
-            except IndexError as e:
-                year = None
-            if year is None:
-                if date_as_str is None:
-                    date_as_str = datetime.datetime.now().isoformat()
-                year = date_as_str[0:4]
-            mid = res.group('id')
-            return u'%sM%s' % (year, mid,)
-    return None
-
-
-def reindex(client, source_index, target_index, target_client=None, chunk_size=500, scroll='5m', transformation_callable=None):
+
+def reindex(client, source_index, target_index, target_client=None, chunk_size=500, scroll='5m', transformation_callable=None, batch_transformation_callable=None):
     """
     Reindex all documents from one index to another, potentially (if
     `target_client` is specified) on a different cluster.
@@ -56,6 +59,10 @@ def reindex(client, source_index, target_index, target_client=None, chunk_size=5
     :arg chunk_size: number of docs in one chunk sent to es (default: 500)
     :arg scroll: Specify how long a consistent view of the index should be
         maintained for scrolled search
+    :arg transformation_callable: optional, called with each hit, returns the
+        transformed hit
+    :arg batch_transformation_callable: optional, called with chunks of
+        `chunk_size` hits instead, see :func:`transform_hits`
     """
     target_client = client if target_client is None else target_client
 
@@ -63,11 +70,11 @@ def reindex(client, source_index, target_index, target_client=None, chunk_size=5
     def _change_doc_index(hits, index):
         for h in hits:
             h['_index'] = index
-            if transformation_callable is not None:
-                h = transformation_callable(h)
             yield h
 
-    return bulk(target_client, _change_doc_index(docs, target_index),
+    return bulk(target_client, transform_hits(
+        _change_doc_index(docs, target_index), transformation_callable,
+        batch_transformation_callable, chunk_size),
         chunk_size=chunk_size, stats_only=True)
 
 
@@ -219,46 +226,6 @@ def try_convert(conv, value):
         return value
 
 
-def parse_date(regexen, date_str):
-    """
-        Parse a messy string into a granular date
-
-        `regexen` is of the form [ (regex, (granularity, groups -> datetime)) ]
-    """
-    if date_str:
-        for reg, (gran, dater) in regexen:
-            m = re.match(reg, date_str)
-            if m:
-                try:
-                    return gran, dater(m.groups())
-                except ValueError:
-                    return 0, None
-    return 0, None
-
-
-def parse_date_span(regexen, date1_str, date2_str):
-    """
-        Parse a start & end date into a (less) granular date
-
-        `regexen` is of the form [ (regex, (granularity, groups -> datetime)) ]
-    """
-    date1_gran, date1 = parse_date(regexen, date1_str)
-    date2_gran, date2 = parse_date(regexen, date2_str)
-
-    if date2:
-        # TODO: integrate both granularities
-        if (date1_gran, date1) == (date2_gran, date2):
-            return date1_gran, date1
-        if (date2 - date1).days < 5*365:
-            return 4, date1
-        if (date2 - date1).days < 50*365:
-            return 3, date1
-        if (date2 - date1).days >= 50*365:
-            return 2, date1
-    else:
-        return date1_gran, date1
-
-
 class DatetimeJSONEncoder(json.JSONEncoder):
     """
     JSONEncoder that can handle ``datetime.datetime``, ``datetime.date`` and
@@ -272,18 +239,6 @@ class DatetimeJSONEncoder(json.JSONEncoder):
         else:
             return super(DatetimeJSONEncoder, self).default(o)
 
-_punct_re = re.compile(r'[\t\r\n !"#$%&\'()*\-/<=>?@\[\\\]^_`{|},.]+')
-
-
-def slugify(text, delim=u'-'):
-    """Generates an ASCII-only slug."""
-    result = []
-    for word in _punct_re.split(text.lower()):
-        word = word.encode('translit/long')
-        if word:
-            result.append(word)
-    return unicode(delim.join(result))
-
 
 def strip_namespaces(item):
     xslt = '''
@@ -0,0 +1,185 @@
+import datetime
+import re
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import translitcodec  # registers the translit codecs
+
+
+# Separates the positional and keyword arguments in the keys of memoize
+_kwargs_marker = object()
+
+
+def memoize(maxsize=1024):
+    """Decorator that caches the results of a function of hashable
+    (positional or keyword) arguments, keeping at most ``maxsize``
+    results. When the cache is full, the least recently used result is
+    evicted.
+
+    The cache of a decorated function can be emptied with its
+    ``cache_clear()`` attribute.
+    """
+    def decorator(func):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = args
+            if kwargs:
+                key += (_kwargs_marker,) + tuple(sorted(kwargs.items()))
+
+            with lock:
+                try:
+                    result = cache.pop(key)
+                    cache[key] = result
+                    return result
+                except KeyError:
+                    pass
+
+            result = func(*args, **kwargs)
+
+            with lock:
+                cache[key] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return result
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+
+        wrapper.cache_clear = cache_clear
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+
+_motion_id_res = [
+    re.compile(r'^M(?P<year>\d{4})\s*\-\s*(?P<id>\d+)'),
+    re.compile(r'^(?P<year>\d{4})\s*M\s*(?P<id>\d+)'),
+    re.compile(r'^(?P<year>\d{4})\s*\-\s*(?P<id>\d+)'),
+    re.compile(r'^M\s+(?P<id>\d+)'),
+]
+
+
+@memoize(maxsize=4096)
+def _match_motion_id(motion_id):
+    """Returns the year (or ``None``) and number of a motion id."""
+    motion_id = motion_id.upper()
+    for regex in _motion_id_res:
+        res = regex.match(motion_id)
+        if res is not None:
+            return res.groupdict().get('year'), res.group('id')
+
+
+def normalize_motion_id(motion_id, date_as_str=None):
+    """
+    Normalizes forms of motion ids
+    """
+    res = _match_motion_id(motion_id)
+    if res is None:
+        return None
+
+    year, mid = res
+    if year is None:
+        if date_as_str is None:
+            date_as_str = datetime.datetime.now().isoformat()
+        year = date_as_str[0:4]
+    return u'%sM%s' % (year, mid,)
+
+
+@memoize(maxsize=256)
+def compile_pattern(pattern):
+    """Returns the compiled form of a regular expression. Unlike the
+    cache of :mod:`re`, which is cleared when it holds 100 patterns,
+    patterns are only evicted when they are the least recently used."""
+    return re.compile(pattern)
+
+
+def parse_date(regexen, date_str):
+    """
+        Parse a messy string into a granular date
+
+        `regexen` is of the form [ (regex, (granularity, groups -> datetime)) ]
+    """
+    if date_str:
+        for reg, (gran, dater) in regexen:
+            m = compile_pattern(reg).match(date_str)
+            if m:
+                try:
+                    return gran, dater(m.groups())
+                except ValueError:
+                    return 0, None
+    return 0, None
+
+
+def parse_date_span(regexen, date1_str, date2_str):
+    """
+        Parse a start & end date into a (less) granular date
+
+        `regexen` is of the form [ (regex, (granularity, groups -> datetime)) ]
+    """
+    date1_gran, date1 = parse_date(regexen, date1_str)
+    date2_gran, date2 = parse_date(regexen, date2_str)
+
+    if date2:
+        # TODO: integrate both granularities
+        if (date1_gran, date1) == (date2_gran, date2):
+            return date1_gran, date1
+        days = (date2 - date1).days
+        if days < 5*365:
+            return 4, date1
+        if days < 50*365:
+            return 3, date1
+        return 2, date1
+    else:
+        return date1_gran, date1
+
+
+DUTCH_MONTHS = OrderedDict([
+    (u'januari', u'01'),
+    (u'februari', u'02'),
+    (u'maart', u'03'),
+    (u'april', u'04'),
+    (u'mei', u'05'),
+    (u'juni', u'06'),
+    (u'juli', u'07'),
+    (u'augustus', u'08'),
+    (u'september', u'09'),
+    (u'oktober', u'10'),
+    (u'november', u'11'),
+    (u'december', u'12'),
+])
+
+_dutch_month_re = re.compile(u'|'.join(DUTCH_MONTHS), re.UNICODE)
+
+
+@memoize(maxsize=4096)
+def parse_dutch_date(date_str):
+    """Converts a date of the form ``31 augustus 2015`` to ``2015-08-31``.
+
+    All month names are replaced in a single pass over the string.
+    """
+    output = _dutch_month_re.sub(
+        lambda m: DUTCH_MONTHS[m.group(0)], date_str)
+    parts = output.split(u' ')
+    return u'%s-%s-%s' % (parts[2], parts[1], parts[0],)
+
+
+_punct_re = re.compile(r'[\t\r\n !"#$%&\'()*\-/<=>?@\[\\\]^_`{|},.]+')
+
+
+@memoize(maxsize=4096)
+def slugify(text, delim=u'-'):
+    """Generates an ASCII-only slug."""
+    text = text.lower()
+    try:
+        # Nothing to transliterate, so the words can be joined as they are
+        text.encode('ascii')
+        words = _punct_re.split(text)
+    except UnicodeError:
+        words = (word.encode('translit/long')
+                 for word in _punct_re.split(text))
+    return unicode(delim.join(word for word in words if word))
@@ -13,6 +13,11 @@ from pdfminer.pdfpage import PDFPage
 import requests
 
 from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils.pdf_extraction import pdf_extraction_service
+
+log = get_source_logger('pdf')
+
 
 def convert(fname, pages=None):
     if not pages:
@@ -41,10 +46,9 @@ def convert(fname, pages=None):
             mediabox_pixels = 0
 
         if mediabox_pixels <= settings.PDF_MAX_MEDIABOX_PIXELS:
-            print "Processing page %s" % (page,)
             interpreter.process_page(page)
         else:
-            print "Skipped page %s" % (page,)
+            log.debug('Skipped page %s of %s' % (page, fname))
 
     infile.close()
     converter.close()
@@ -53,6 +57,17 @@ def convert(fname, pages=None):
     return text
 
 
+def pdfminer_page_count(fname):
+    with open(fname, 'rb') as infile:
+        return sum(1 for _ in PDFPage.get_pages(infile))
+
+
+def pdfminer_pages_text(fname, first, last):
+    """Returns the text of pages ``first`` to ``last`` (one-based,
+    inclusive) of a PDF document."""
+    return convert(fname, range(first - 1, last))
+
+
 class PDFToTextMixin(object):
     """
     Interface for converting a PDF file into text format using pdftotext
@@ -92,12 +107,12 @@ class PDFToTextMixin(object):
 
     def pdf_to_text(self, path, max_pages=20):
         """
-        Method to convert a given PDF file into text file using a subprocess
+        Method to convert a given PDF file into text file using the
+        :class:`~ocd_backend.utils.pdf_extraction.PDFExtractionService`
         """
 
-        if max_pages > 0:
-            content = convert(path, range(0, max_pages))
-        else:
-            content = convert(path)
+        content, _ = pdf_extraction_service.extract(
+            path, pdfminer_pages_text, pdfminer_page_count,
+            max_pages if max_pages > 0 else None)
 
         return unicode(self.pdf_clean_text(content.decode('utf-8')))
@@ -0,0 +1,212 @@
+import os
+import resource
+import subprocess
+import sys
+import time
+from tempfile import NamedTemporaryFile
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('pdf_extraction')
+
+#: The module that is run by the extraction processes
+WORKER_MODULE = 'ocd_backend.utils.pdf_extraction'
+
+
+def _limit_memory(memory_limit):
+    """Returns a function that limits the address space of an extraction
+    process, so a document that needs too much memory makes the process
+    fail instead of exhausting the host."""
+    def preexec():
+        if memory_limit:
+            resource.setrlimit(resource.RLIMIT_AS,
+                               (memory_limit, memory_limit))
+    return preexec
+
+
+class PDFExtractionService(object):
+    """Extracts the text of PDF documents in separate processes, so a
+    large or pathological document doesn't block the Celery worker that
+    requests it.
+
+    The pages of a document are counted by a process, and the document is
+    split into ranges of ``pages_per_task`` pages, which are extracted by
+    at most ``processes`` processes at the same time. Counting and
+    extracting a document is limited to ``timeout`` seconds; when
+    it takes longer, the processes that are still running are killed and
+    the text of the ranges that were extracted is returned. Each process
+    is limited to ``memory_limit`` bytes; ranges that exceed it are left
+    out.
+
+    Each range is extracted by a new process, which can always be killed
+    safely, instead of by a long-lived pool, as a pool started from a
+    (daemonic) Celery worker process can't be restarted reliably when
+    one of its processes hangs. With zero ``processes``, documents are
+    extracted in the calling process, without limits.
+
+    :param processes: the maximum number of extraction processes per
+        document.
+    :type processes: int
+    :param pages_per_task: the number of pages extracted per process.
+    :type pages_per_task: int
+    :param timeout: the maximum number of seconds per document.
+    :type timeout: int
+    :param memory_limit: the maximum size of the address space of an
+        extraction process in bytes, or ``0`` for no limit.
+    :type memory_limit: int
+    """
+
+    #: Seconds between checks whether extraction processes are finished
+    poll_interval = 0.05
+
+    def __init__(self, processes, pages_per_task, timeout, memory_limit):
+        self.processes = processes
+        self.pages_per_task = pages_per_task
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+
+    def page_ranges(self, page_count, max_pages=None):
+        """Returns the ``(first, last)`` page numbers (one-based,
+        inclusive) of the tasks of a document."""
+        if max_pages:
+            page_count = min(page_count, max_pages)
+        return [(first, min(first + self.pages_per_task - 1, page_count))
+                for first in xrange(1, page_count + 1, self.pages_per_task)]
+
+    def _start(self, function, fname, *pages):
+        output = NamedTemporaryFile(prefix='ocd_pdf_', suffix='.txt')
+        process = subprocess.Popen(
+            [sys.executable, '-m', WORKER_MODULE,
+             '%s.%s' % (function.__module__, function.__name__),
+             fname] + [str(page) for page in pages] + [output.name],
+            cwd=os.path.dirname(settings.ROOT_PATH),
+            preexec_fn=_limit_memory(self.memory_limit),
+            close_fds=True)
+        return process, output
+
+    def _count_pages(self, count_pages, fname, deadline):
+        """Returns the number of pages of a document, counted by a process
+        with the same limits as the extraction processes, or ``None`` if
+        it failed or didn't finish before ``deadline``."""
+        process, output = self._start(count_pages, fname)
+        try:
+            while process.poll() is None:
+                if time.time() > deadline:
+                    log.warning('Counting the pages of %s timed out after %d '
+                                'seconds' % (fname, self.timeout))
+                    return
+                time.sleep(self.poll_interval)
+
+            if process.returncode != 0:
+                log.warning('Counting the pages of %s failed with exit code '
+                            '%s' % (fname, process.returncode))
+                return
+            return int(output.read())
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            output.close()
+
+    def extract(self, fname, extract_pages, count_pages, max_pages=None):
+        """Extracts the text of a document.
+
+        :param fname: the path of the document.
+        :type fname: str
+        :param extract_pages: a module-level function that takes the path
+            and the first and last page number (one-based, inclusive) and
+            returns the UTF-8 encoded text of those pages.
+        :param count_pages: a module-level function that takes the path
+            and returns the number of pages of the document. Pages are
+            counted by a process as well, within the same time limit.
+        :param max_pages: the maximum number of pages that is extracted,
+            all pages if ``None``.
+        :type max_pages: int
+        :returns: a tuple with the UTF-8 encoded text, separated by
+            newlines per task, and whether the text is complete.
+        :rtype: tuple
+        """
+        if not self.processes:
+            return '\n'.join(extract_pages(fname, first, last)
+                             for first, last in self.page_ranges(
+                                 count_pages(fname), max_pages)), True
+
+        deadline = time.time() + self.timeout
+        page_count = self._count_pages(count_pages, fname, deadline)
+        if page_count is None:
+            return '', False
+
+        ranges = self.page_ranges(page_count, max_pages)
+        pending = list(enumerate(ranges))
+        running = []
+        texts = [None] * len(ranges)
+        complete = True
+
+        try:
+            while pending or running:
+                while pending and len(running) < self.processes:
+                    i, (first, last) = pending.pop(0)
+                    running.append((i, self._start(extract_pages, fname,
+                                                   first, last)))
+
+                for task in list(running):
+                    i, (process, output) = task
+                    if process.poll() is None:
+                        continue
+
+                    running.remove(task)
+                    if process.returncode == 0:
+                        texts[i] = output.read()
+                    else:
+                        log.warning('Extracting pages %d-%d of %s failed '
+                                    'with exit code %s' % (
+                                        ranges[i][0], ranges[i][1], fname,
+                                        process.returncode))
+                        complete = False
+                    output.close()
+
+                if not (pending or running):
+                    break
+
+                if time.time() > deadline:
+                    log.warning('Extracting the text of %s timed out after '
+                                '%d seconds, %d of %d tasks were finished'
+                                % (fname, self.timeout,
+                                   len(ranges) - len(pending) - len(running),
+                                   len(ranges)))
+                    complete = False
+                    break
+
+                time.sleep(self.poll_interval)
+        finally:
+            for _, (process, output) in running:
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+                output.close()
+
+        return '\n'.join(text for text in texts if text), complete
+
+
+def main(function_path, fname, *args):
+    """Writes the result of ``extract_pages(fname, first, last)`` or
+    ``count_pages(fname)`` to the file at the path given as last argument;
+    the entry point of the extraction processes."""
+    from ocd_backend.utils.misc import load_object
+
+    function = load_object(function_path)
+    pages, output_path = args[:-1], args[-1]
+    with open(output_path, 'wb') as output:
+        output.write(str(function(fname, *[int(page) for page in pages])))
+
+
+pdf_extraction_service = PDFExtractionService(
+    settings.PDF_EXTRACTION_PROCESSES,
+    settings.PDF_EXTRACTION_PAGES_PER_TASK,
+    settings.PDF_EXTRACTION_TIMEOUT,
+    settings.PDF_EXTRACTION_MEMORY_LIMIT)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
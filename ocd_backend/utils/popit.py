@@ -0,0 +1,151 @@
+import json
+from multiprocessing.pool import ThreadPool
+
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils.http_sessions import http_session_pool
+
+log = get_source_logger('popit')
+
+
+class PopitClient(object):
+    """Requests the items of a collection of a PopIt instance, with a
+    pooled session (see
+    :class:`~ocd_backend.utils.http_sessions.HttpSessionPool`).
+
+    :param base_url: the URL of the API of the instance.
+    :param api_key: the API key that is sent with each request.
+    :param collection: the name of the collection, such as ``persons``.
+    """
+
+    def __init__(self, base_url, api_key, collection):
+        self.url = '%s/%s' % (base_url.rstrip('/'), collection)
+        self.headers = {
+            'Apikey': api_key,
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+
+    @property
+    def session(self):
+        return http_session_pool.get(self.url)
+
+    def fetch_all(self, per_page=100):
+        """Returns all items of the collection by ID, following the
+        ``next_url`` of each page."""
+        items = {}
+        url = '%s?per_page=%d' % (self.url, per_page)
+        while url:
+            resp = self.session.get(url, headers=self.headers)
+            resp.raise_for_status()
+            page = resp.json()
+            for item in page.get('result') or []:
+                items[item['id']] = item
+            url = page.get('next_url')
+        return items
+
+    def create(self, item_id, data):
+        return self.session.post(self.url, data=data, headers=self.headers)
+
+    def update(self, item_id, data):
+        return self.session.put('%s/%s' % (self.url, item_id), data=data,
+                                headers=self.headers)
+
+    def delete(self, item_id, data=None):
+        return self.session.delete('%s/%s' % (self.url, item_id),
+                                   headers=self.headers)
+
+
+class PopitSync(object):
+    """Makes a PopIt collection contain the desired items with as few
+    requests as possible.
+
+    The remote collection is fetched once, and compared with the desired
+    items: items that don't exist yet are created, existing items of which
+    a field differs from the desired value are updated (if ``update``),
+    and items that are not desired are deleted (if ``delete``). Fields
+    that PopIt adds to items are ignored. The requests are sent by
+    ``concurrency`` threads.
+
+    :param client: the :class:`PopitClient` of the collection.
+    :param update: whether to overwrite items that were changed.
+    :type update: bool
+    :param delete: whether to delete items that are not desired.
+    :type delete: bool
+    :param concurrency: the number of concurrent requests.
+    :type concurrency: int
+    """
+
+    def __init__(self, client, update=False, delete=False, concurrency=4):
+        self.client = client
+        self.update = update
+        self.delete = delete
+        self.concurrency = concurrency
+
+    @staticmethod
+    def is_changed(desired, remote):
+        return any(remote.get(field) != value
+                   for field, value in desired.iteritems())
+
+    def plan(self, desired, remote):
+        """Returns the ``(operation, item_id, item)`` requests that make the
+        ``remote`` items equal to the ``desired`` ones.
+
+        :param desired: the desired items by ID, as decoded JSON.
+        :type desired: dict
+        :param remote: the items in the collection by ID.
+        :type remote: dict
+        :rtype: list
+        """
+        operations = []
+        for item_id, item in sorted(desired.iteritems()):
+            if item_id not in remote:
+                operations.append(('create', item_id, item))
+            elif self.update and self.is_changed(item, remote[item_id]):
+                operations.append(('update', item_id, item))
+
+        if self.delete:
+            for item_id in sorted(set(remote) - set(desired)):
+                operations.append(('delete', item_id, None))
+
+        return operations
+
+    def _apply(self, operation):
+        name, item_id, item = operation
+        data = json.dumps(item) if item is not None else None
+        try:
+            resp = getattr(self.client, name)(item_id, data)
+        except Exception, e:
+            log.warning('PopIt %s of %s failed: %s' % (name, item_id, e))
+            return False
+
+        if not resp.ok:
+            log.warning('PopIt %s of %s failed with status %d: %s' % (
+                name, item_id, resp.status_code, resp.text[:200]))
+        return resp.ok
+
+    def sync(self, desired):
+        """Fetches the remote collection and sends the requests that make it
+        equal to ``desired``.
+
+        :param desired: the desired items by ID, as decoded JSON.
+        :type desired: dict
+        :returns: the number of successful and failed requests by operation.
+        :rtype: dict
+        """
+        operations = self.plan(desired, self.client.fetch_all())
+
+        pool = ThreadPool(self.concurrency)
+        try:
+            results = pool.map(self._apply, operations)
+        finally:
+            pool.close()
+            pool.join()
+
+        stats = {}
+        for (name, _, _), ok in zip(operations, results):
+            counts = stats.setdefault(name, {'ok': 0, 'failed': 0})
+            counts['ok' if ok else 'failed'] += 1
+
+        log.info('Synced %d items with %s: %s' % (len(desired),
+                                                  self.client.url, stats))
+        return stats
@@ -0,0 +1,194 @@
+import json
+import os
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from tempfile import NamedTemporaryFile
+
+from elasticsearch.helpers import parallel_bulk, scan
+
+from ocd_backend.log import get_source_logger
+from ocd_backend.utils.misc import transform_hits
+
+log = get_source_logger('reindex')
+
+# The job of the slice processes, set before they are forked
+_job = None
+
+
+class ReindexState(object):
+    """The progress of a reindex, stored in the JSON file at ``path`` so an
+    interrupted reindex can be resumed. Slices that are completed are
+    skipped when resuming; slices that were interrupted are reindexed
+    from the start, which is safe as documents keep their ID.
+
+    :param path: the path of the state file, or ``None`` to not store it.
+    """
+
+    def __init__(self, path, source_index, target_index, slices):
+        self.path = path
+        self.data = {
+            'source_index': source_index,
+            'target_index': target_index,
+            'slices': slices,
+            'completed': {}
+        }
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if (data.get('source_index'), data.get('target_index'),
+                    data.get('slices')) != (source_index, target_index,
+                                            slices):
+                raise ValueError('State file %s belongs to another reindex '
+                                 'or number of slices' % path)
+            self.data = data
+
+    def is_completed(self, slice_id):
+        return str(slice_id) in self.data['completed']
+
+    def complete(self, slice_id, stats):
+        self.data['completed'][str(slice_id)] = stats
+        if not self.path:
+            return
+
+        with NamedTemporaryFile(prefix='.ocd_r_', suffix='.tmp',
+                                dir=os.path.dirname(os.path.abspath(
+                                    self.path)), delete=False) as tf:
+            json.dump(self.data, tf, indent=2)
+        os.rename(tf.name, self.path)
+
+
+def reindex_slice(slice_id):
+    """Reindexes one slice of the current job, and returns its statistics.
+    Runs in a slice process (or thread)."""
+    job = _job
+    query = {'sort': ['_doc']}
+    if job['slices'] > 1:
+        query['slice'] = {'id': slice_id, 'max': job['slices']}
+
+    hits = scan(job['client'], index=job['source_index'], query=query,
+                scroll=job['scroll'], size=job['chunk_size'],
+                _source_include=['*'])
+
+    def retarget(hits):
+        for hit in hits:
+            hit['_index'] = job['target_index']
+            hit.pop('sort', None)
+            hit.pop('_score', None)
+            yield hit
+
+    actions = transform_hits(retarget(hits), job['transformation_callable'],
+                             job['batch_transformation_callable'],
+                             job['chunk_size'])
+
+    stats = {'indexed': 0, 'errors': 0}
+    for ok, info in parallel_bulk(
+            job['target_client'], actions,
+            thread_count=job['thread_count'],
+            chunk_size=job['chunk_size'],
+            max_chunk_bytes=job['max_chunk_bytes'],
+            raise_on_error=False):
+        if ok:
+            stats['indexed'] += 1
+        else:
+            stats['errors'] += 1
+            log.warning('Reindexing failed: %s' % info)
+
+        processed = stats['indexed'] + stats['errors']
+        if processed % job['progress_interval'] == 0:
+            log.info('Slice %d: %d documents' % (slice_id, processed))
+
+    log.info('Slice %d done: %d indexed, %d errors' % (
+        slice_id, stats['indexed'], stats['errors']))
+    return slice_id, stats
+
+
+def parallel_reindex(client, source_index, target_index, target_client=None,
+                     slices=4, processes=None, thread_count=2,
+                     chunk_size=500, max_chunk_bytes=10 * 1024 ** 2,
+                     scroll='5m', transformation_callable=None,
+                     batch_transformation_callable=None,
+                     transform_in_workers=True, state_path=None,
+                     progress_interval=10000):
+    """Reindexes all documents from one index to another like
+    :func:`~ocd_backend.utils.misc.reindex`, but reads the source index
+    with a sliced scroll, and processes the slices in parallel.
+
+    Each slice is read, transformed and sent with
+    :func:`~elasticsearch.helpers.parallel_bulk` by a forked process, so
+    the clients must be fork-safe (see
+    :class:`~ocd_frontend.es_client.ElasticsearchPool`).
+
+    :param client: the client to read the documents with.
+    :param source_index: the index to read documents from.
+    :param target_index: the index to write the documents to.
+    :param target_client: the client to write with, defaults to ``client``.
+    :param slices: the number of slices of the scroll.
+    :type slices: int
+    :param processes: the number of slices processed at the same time,
+        defaults to ``slices``.
+    :type processes: int
+    :param thread_count: the number of bulk requests each slice sends at
+        the same time.
+    :type thread_count: int
+    :param chunk_size: the number of documents per scroll and bulk request.
+    :param max_chunk_bytes: the maximum size of a bulk request in bytes.
+    :param scroll: how long the scroll context is kept between requests.
+    :param transformation_callable: a function that is called with each
+        hit, and returns the hit that is indexed.
+    :param batch_transformation_callable: a function that is called with
+        lists of up to ``chunk_size`` hits instead, and returns the hits
+        that are indexed (see :func:`~ocd_backend.utils.misc.transform_hits`).
+    :param transform_in_workers: whether to process the slices (and run
+        the transformation) in worker processes; if ``False`` they are
+        processed by threads of this process, for transformations that
+        can't run in a forked process.
+    :type transform_in_workers: bool
+    :param state_path: the path of the file that keeps the progress, so an
+        interrupted reindex can be resumed by calling this function with
+        the same arguments.
+    :param progress_interval: log the progress of a slice every this many
+        documents.
+    :returns: the total number of indexed documents and errors.
+    :rtype: tuple
+    """
+    global _job
+
+    state = ReindexState(state_path, source_index, target_index, slices)
+    pending = [slice_id for slice_id in range(slices)
+               if not state.is_completed(slice_id)]
+    if len(pending) < slices:
+        log.info('Resuming reindex of %s, %d of %d slices left' % (
+            source_index, len(pending), slices))
+
+    _job = {
+        'client': client,
+        'target_client': target_client or client,
+        'source_index': source_index,
+        'target_index': target_index,
+        'slices': slices,
+        'thread_count': thread_count,
+        'chunk_size': chunk_size,
+        'max_chunk_bytes': max_chunk_bytes,
+        'scroll': scroll,
+        'transformation_callable': transformation_callable,
+        'batch_transformation_callable': batch_transformation_callable,
+        'progress_interval': progress_interval
+    }
+
+    pool_class = Pool if transform_in_workers else ThreadPool
+    pool = pool_class(min(processes or slices, len(pending)) or 1)
+    try:
+        for slice_id, stats in pool.imap_unordered(reindex_slice, pending):
+            state.complete(slice_id, stats)
+        pool.close()
+    except:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        _job = None
+
+    completed = state.data['completed'].values()
+    return (sum(stats['indexed'] for stats in completed),
+            sum(stats['errors'] for stats in completed))
@@ -0,0 +1,183 @@
+import time
+
+from elasticsearch import helpers
+from elasticsearch.exceptions import NotFoundError
+
+from ocd_backend import celery_app
+from ocd_backend import settings
+from ocd_backend.es import elasticsearch as es
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('resolver')
+
+
+class ResolverDocCache(object):
+    """Keeps the fingerprints of the documents in the
+    ``RESOLVER_URL_INDEX``, so loaders only write resolver documents that
+    are new or changed instead of rewriting the same documents on every
+    run.
+
+    The ID of a resolver document is the SHA-1 of its ``original_url``,
+    so the ``content_type`` is all that can change; it is the fingerprint
+    of the document. Fingerprints are kept in a Redis hash that is shared
+    by all workers (one field per URL hash), and in a bounded in-process
+    set of fingerprints that were already looked up or written. The hash
+    is seeded from the index by :meth:`seed`.
+
+    The UUID of the resolver index that the fingerprints belong to is
+    stored with the hash. Every ``check_interval`` seconds it is compared
+    with the UUID of the current index, and the fingerprints are cleared
+    when the index was dropped or recreated (see :meth:`clear`).
+    """
+
+    key = 'ori_resolver_known'
+    index_key = 'ori_resolver_known_index'
+
+    #: Clear the in-process set once it holds this many fingerprints
+    max_local_entries = 100000
+
+    #: Seconds between checks whether the resolver index was recreated
+    check_interval = 60
+
+    def __init__(self):
+        self._local = set()
+        self._index_uuid = None
+        self._checked_at = 0
+
+    @staticmethod
+    def get_index_uuid():
+        """Returns the UUID of the resolver index, or an empty string if it
+        doesn't exist."""
+        try:
+            index_settings = es.indices.get_settings(
+                index=settings.RESOLVER_URL_INDEX, name='index.uuid')
+        except NotFoundError:
+            return ''
+        return index_settings.values()[0]['settings']['index']['uuid']
+
+    def clear(self, index_uuid=''):
+        """Forgets all fingerprints, such as when the resolver index is
+        dropped or recreated.
+
+        :param index_uuid: the UUID of the resolver index that new
+            fingerprints belong to.
+        """
+        client = celery_app.backend.client
+        client.delete(self.key)
+        client.set(self.index_key, index_uuid)
+        self._local.clear()
+        self._index_uuid = index_uuid
+        self._checked_at = time.time()
+        log.info('Cleared known resolver documents')
+
+    def check_index(self):
+        """Clears the fingerprints when they belong to another resolver
+        index than the current one."""
+        if time.time() - self._checked_at < self.check_interval:
+            return
+        self._checked_at = time.time()
+
+        try:
+            index_uuid = self.get_index_uuid()
+            known_uuid = celery_app.backend.client.get(self.index_key)
+            if known_uuid is None or \
+                    known_uuid.decode('utf-8') != index_uuid:
+                self.clear(index_uuid)
+        except Exception, e:
+            log.warning('Unable to check the resolver index: %s' % e)
+            return
+
+        if self._index_uuid is not None and self._index_uuid != index_uuid:
+            # Recreated and cleared by another process
+            self._local.clear()
+        self._index_uuid = index_uuid
+
+    @staticmethod
+    def fingerprint(url_doc):
+        return url_doc.get('content_type') or ''
+
+    def _remember(self, entries):
+        if len(self._local) + len(entries) > self.max_local_entries:
+            self._local.clear()
+        self._local.update(entries)
+
+    def filter_changed(self, url_docs):
+        """Returns the resolver documents that aren't in the index yet, or
+        whose content type changed.
+
+        :param url_docs: the resolver documents by URL hash.
+        :type url_docs: dict
+        :rtype: dict
+        """
+        self.check_index()
+        pending = dict((url_hash, url_doc)
+                       for url_hash, url_doc in url_docs.iteritems()
+                       if (url_hash, self.fingerprint(url_doc))
+                       not in self._local)
+        if not pending:
+            return {}
+
+        url_hashes = pending.keys()
+        try:
+            known = celery_app.backend.client.hmget(self.key, url_hashes)
+        except Exception, e:
+            log.warning('Unable to read known resolver documents: %s' % e)
+            return pending
+
+        changed = {}
+        for url_hash, fingerprint in zip(url_hashes, known):
+            url_doc = pending[url_hash]
+            if fingerprint is not None and \
+                    fingerprint.decode('utf-8') == self.fingerprint(url_doc):
+                self._remember([(url_hash, fingerprint.decode('utf-8'))])
+            else:
+                changed[url_hash] = url_doc
+        return changed
+
+    def mark_written(self, url_docs):
+        """Records that resolver documents were written to the index.
+
+        :param url_docs: the resolver documents by URL hash.
+        :type url_docs: dict
+        """
+        if not url_docs:
+            return
+
+        fingerprints = dict((url_hash, self.fingerprint(url_doc))
+                            for url_hash, url_doc in url_docs.iteritems())
+        self._remember(fingerprints.items())
+        try:
+            celery_app.backend.client.hmset(self.key, fingerprints)
+        except Exception, e:
+            log.warning('Unable to write known resolver documents: %s' % e)
+
+    def seed(self, es, chunk_size=1000):
+        """Loads the fingerprints of all documents in the resolver index,
+        replacing the known fingerprints.
+
+        :param es: the Elasticsearch client.
+        :returns: the number of documents that were loaded.
+        """
+        client = celery_app.backend.client
+        self.clear(self.get_index_uuid())
+
+        count = 0
+        fingerprints = {}
+        for hit in helpers.scan(es, index=settings.RESOLVER_URL_INDEX,
+                                doc_type='url', size=chunk_size,
+                                _source_include=['content_type']):
+            fingerprints[hit['_id']] = self.fingerprint(hit['_source'])
+            if len(fingerprints) >= chunk_size:
+                client.hmset(self.key, fingerprints)
+                count += len(fingerprints)
+                fingerprints = {}
+
+        if fingerprints:
+            client.hmset(self.key, fingerprints)
+            count += len(fingerprints)
+
+        log.info('Seeded %d known resolver documents' % count)
+        return count
+
+
+resolver_doc_cache = ResolverDocCache()
@@ -0,0 +1,65 @@
+from ocd_backend import settings
+from ocd_backend.exceptions import ConfigurationError
+
+
+def _queue_cost(queue):
+    """Sorts queues from most to least expensive."""
+    try:
+        return settings.ENRICHER_QUEUE_COSTS.index(queue)
+    except ValueError:
+        return len(settings.ENRICHER_QUEUE_COSTS)
+
+
+def get_queue(stage, source_definition, task=None, task_settings=None):
+    """Returns the Celery queue a task of a pipeline stage is sent to.
+
+    The ``queues`` of the source definition override the queues of
+    stages (``PIPELINE_QUEUES``) and enricher task types
+    (``ENRICHER_TASK_QUEUES``). An enricher is sent to the ``queue`` of
+    its settings if it has one, and otherwise to the most expensive
+    queue of its ``tasks`` and its own ``queue`` attribute, such as the
+    CPU queue for enrichers that parse documents.
+
+    Only queues in ``CELERY_QUEUES`` are consumed by workers that are
+    started without ``-Q``, so other queues (which can be declared with
+    ``EXTRA_QUEUES``) raise a :class:`ConfigurationError` instead of
+    leaving the tasks unconsumed.
+
+    :param stage: the stage of the pipeline, one of ``extension``,
+        ``transformer``, ``enricher`` or ``loader``.
+    :type stage: str
+    :param source_definition: the (pipeline) definition of the source.
+    :type source_definition: dict
+    :param task: the task instance of the stage.
+    :param task_settings: the settings of an enricher.
+    :type task_settings: dict
+    :rtype: str
+    """
+    queue = _get_queue(stage, source_definition, task, task_settings)
+    if queue not in set(q.name for q in
+                        settings.CELERY_CONFIG['CELERY_QUEUES']):
+        raise ConfigurationError('Queue %s of the %s of %s is not declared '
+                                 'in CELERY_QUEUES, add it to EXTRA_QUEUES' %
+                                 (queue, stage, source_definition.get('id')))
+    return queue
+
+
+def _get_queue(stage, source_definition, task, task_settings):
+    queues = dict(settings.PIPELINE_QUEUES)
+    queues.update(settings.ENRICHER_TASK_QUEUES)
+    queues.update(source_definition.get('queues') or {})
+
+    if stage == 'enricher':
+        task_settings = task_settings or {}
+        if task_settings.get('queue'):
+            return task_settings['queue']
+
+        task_queues = [queues[task_type]
+                       for task_type in task_settings.get('tasks', [])
+                       if task_type in queues]
+        if getattr(task, 'queue', None):
+            task_queues.append(task.queue)
+        if task_queues:
+            return min(task_queues, key=_queue_cost)
+
+    return queues[stage]
@@ -0,0 +1,190 @@
+import re
+from collections import MutableMapping
+
+_field_name_re = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+_missing = object()
+
+_compiled_schemas = {}
+
+
+class SchemaRecord(object):
+    """Base class of the record types generated by :func:`compile_schema`.
+
+    A record can only contain the fields of the schema it was compiled
+    from, which are stored in ``__slots__``. It implements the mapping
+    interface, so it can be used like the dict it replaces. Setting a
+    single item validates that item; :meth:`from_dict` validates all
+    fields of a dict with one call to the precompiled validator.
+    """
+    __slots__ = ()
+
+    #: The mapping of allowed keys and value datatypes
+    fields = {}
+
+    @classmethod
+    def from_dict(cls, data, skip_empty=False):
+        """Create a record from ``data``.
+
+        :param data: the key-value pairs to store in the record.
+        :type data: dict
+        :param skip_empty: skip values that evaluate to ``False``, except
+            booleans.
+        :type skip_empty: bool
+        :raises KeyError: when a key is not in the schema.
+        :raises TypeError: when a value is not of the type specified in
+            the schema.
+        """
+        record = cls()
+        cls._load(record, data, skip_empty)
+        return record
+
+    def to_dict(self):
+        """Returns the fields that are set as a plain dict."""
+        return self._to_dict(self)
+
+    def __getitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.fields:
+            raise KeyError('According to the mapping, %s is not in allowed'
+                           % key)
+        elif type(value) is not self.fields[key]:
+            raise TypeError('Value of %s must be %s, not %s'
+                            % (key, self.fields[key], type(value)))
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self.fields:
+            raise KeyError(key)
+        try:
+            delattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.fields and hasattr(self, key)
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def __eq__(self, other):
+        if isinstance(other, SchemaRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.to_dict())
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.fields else default
+
+    def keys(self):
+        return self.to_dict().keys()
+
+    def values(self):
+        return self.to_dict().values()
+
+    def items(self):
+        return self.to_dict().items()
+
+    def iteritems(self):
+        return self.to_dict().iteritems()
+
+
+MutableMapping.register(SchemaRecord)
+
+
+def _compile_load(fields):
+    """Generate the source of a function that validates and stores all
+    fields of a dict on a record, with a check per field instead of a
+    lookup in the schema per value."""
+    lines = ['def _load(record, data, skip_empty):',
+             '    found = 0']
+    for i, field in enumerate(sorted(fields)):
+        lines += [
+            '    value = data.get(%r, _missing)' % field,
+            '    if value is not _missing:',
+            '        found += 1',
+            '        if not skip_empty or value or type(value) is bool:',
+            '            if type(value) is not _type_%d:' % i,
+            '                raise TypeError("Value of %%s must be %%s, not %%s"'
+            ' %% (%r, _type_%d, type(value)))' % (field, i),
+            '            record.%s = value' % field,
+        ]
+    lines += [
+        '    if found != len(data):',
+        '        for key, value in data.iteritems():',
+        '            if key not in _fields and (not skip_empty or value or'
+        ' type(value) is bool):',
+        '                raise KeyError("According to the mapping, %s is not'
+        ' in allowed" % key)',
+    ]
+    return '\n'.join(lines)
+
+
+def _compile_to_dict(fields):
+    """Generate the source of a function that copies the fields that are
+    set on a record into a new dict."""
+    lines = ['def _to_dict(record):',
+             '    result = {}']
+    for field in sorted(fields):
+        lines += [
+            '    value = getattr(record, %r, _missing)' % field,
+            '    if value is not _missing:',
+            '        result[%r] = value' % field,
+        ]
+    lines.append('    return result')
+    return '\n'.join(lines)
+
+
+def compile_schema(fields, name='SchemaRecord'):
+    """Compile a mapping of allowed keys and value datatypes (such as
+    :attr:`~ocd_backend.items.BaseItem.combined_index_fields`) into a
+    ``__slots__``-backed :class:`SchemaRecord` type.
+
+    Compiled types are cached, so compiling the same mapping twice
+    returns the same type.
+
+    :param fields: the mapping of allowed keys and value datatypes.
+    :type fields: dict
+    :param name: the name of the generated type.
+    :type name: str
+    :rtype: type
+    """
+    key = (name, frozenset(fields.iteritems()))
+    if key in _compiled_schemas:
+        return _compiled_schemas[key]
+
+    for field in fields:
+        if not _field_name_re.match(field) or hasattr(SchemaRecord, field):
+            raise ValueError('%s is not a valid field name' % field)
+
+    namespace = {'_missing': _missing, '_fields': dict(fields)}
+    for i, field in enumerate(sorted(fields)):
+        namespace['_type_%d' % i] = fields[field]
+
+    exec _compile_load(fields) in namespace
+    exec _compile_to_dict(fields) in namespace
+
+    record_type = type(str(name), (SchemaRecord,), {
+        '__slots__': tuple(sorted(fields)),
+        'fields': dict(fields),
+        '_load': staticmethod(namespace['_load']),
+        '_to_dict': staticmethod(namespace['_to_dict']),
+    })
+
+    _compiled_schemas[key] = record_type
+    return record_type
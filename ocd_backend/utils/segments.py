@@ -0,0 +1,337 @@
+import json
+import os
+import shutil
+import socket
+import zlib
+from datetime import datetime
+from glob import glob
+from tempfile import NamedTemporaryFile
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('segments')
+
+SEGMENT_SUFFIX = '.jsonl.gz'
+INDEX_SUFFIX = '.idx'
+MANIFEST_NAME = 'manifest.json'
+LOOKUP_NAME = 'objects.tsv'
+
+
+def compress_member(data):
+    """Returns ``data`` as a complete gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class SegmentWriter(object):
+    """Appends documents to a series of gzip-compressed JSONL segments in
+    ``directory``, and starts a new segment when the current one is
+    larger than ``max_bytes``.
+
+    Each document is written as a separate gzip member, so a segment can
+    be read as a whole with :mod:`gzip`, and a single document can be read
+    without decompressing the documents before it. The offset and length
+    of each member are appended to the index file of the segment, as
+    ``<object_id>\\t<offset>\\t<length>`` lines. Both files are flushed
+    after each document, so segments are always complete, even if the
+    process is killed.
+
+    :param directory: the directory of the segments.
+    :param prefix: the prefix of the names of the segments.
+    :param max_bytes: the size after which a new segment is started.
+    :type max_bytes: int
+    """
+
+    def __init__(self, directory, prefix, max_bytes):
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self._file = None
+        self._index = None
+        self._size = 0
+
+    def _rotate(self):
+        self.close()
+
+        try:
+            os.makedirs(self.directory)
+        except OSError:
+            # Created by another worker in the meantime
+            pass
+
+        name = '%s-%s' % (self.prefix,
+                          datetime.utcnow().strftime('%Y%m%d%H%M%S%f'))
+        path = os.path.join(self.directory, name)
+        self._file = open(path + SEGMENT_SUFFIX, 'ab')
+        self._index = open(path + INDEX_SUFFIX, 'ab')
+        self._size = self._file.tell()
+        log.debug('Writing segment %s' % path)
+
+    def write(self, object_id, data):
+        """Appends a document.
+
+        :param object_id: the ID of the document.
+        :param data: the JSON of the document.
+        :type data: str
+        """
+        if self._file is None or self._size >= self.max_bytes:
+            self._rotate()
+
+        if isinstance(object_id, unicode):
+            object_id = object_id.encode('utf-8')
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+
+        member = compress_member(data + '\n')
+        self._file.write(member)
+        self._file.flush()
+        self._index.write('%s\t%d\t%d\n' % (object_id, self._size,
+                                            len(member)))
+        self._index.flush()
+        self._size += len(member)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._index.close()
+        self._file = None
+        self._index = None
+        self._size = 0
+
+
+class SegmentStore(object):
+    """Stores documents in segments (see :class:`SegmentWriter`) in
+    ``<root>/<index_name>/<run_identifier>/<doc_type>s/``, one series of
+    segments per worker process, run and doc_type.
+
+    As each run has its own segments, the segments of a run are complete
+    once it is finished, and :meth:`write_manifest` only describes the
+    documents of that run. It also writes a lookup table of the latest
+    location of each document of the run, which :meth:`get` uses, and
+    removes the segments of all but the latest ``keep_runs`` runs.
+
+    :param root: the directory of the store.
+    :param max_bytes: the size after which a new segment is started.
+    :type max_bytes: int
+    :param keep_runs: the number of runs of an index that are kept.
+    :type keep_runs: int
+    """
+
+    def __init__(self, root, max_bytes, keep_runs=2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.keep_runs = keep_runs
+        self._writers = {}
+        self._pid = os.getpid()
+        self._lookups = {}
+
+    def directory(self, index_name, run_identifier=None, doc_type=None):
+        parts = [self.root, index_name]
+        if run_identifier is not None:
+            parts.append(run_identifier)
+            if doc_type is not None:
+                parts.append('%ss' % doc_type)
+        return os.path.join(*parts)
+
+    def write(self, index_name, run_identifier, doc_type, object_id, data):
+        """Appends a document of a run to the current segment of this
+        process."""
+        # The open segments of the parent process stay with the parent
+        if os.getpid() != self._pid:
+            self._writers = {}
+            self._pid = os.getpid()
+
+        key = (index_name, run_identifier, doc_type)
+        if key not in self._writers:
+            # The earlier runs of the index are finished
+            for other in self._writers.keys():
+                if other[0] == index_name and other[1] != run_identifier:
+                    self._writers.pop(other).close()
+
+            self._writers[key] = SegmentWriter(
+                self.directory(index_name, run_identifier, doc_type),
+                '%s-%d' % (socket.gethostname(), os.getpid()),
+                self.max_bytes)
+        self._writers[key].write(object_id, data)
+
+    def close(self):
+        """Closes the segments of this process, so the next documents are
+        written to new segments."""
+        for writer in self._writers.values():
+            writer.close()
+        self._writers = {}
+
+    def segments(self, index_name, run_identifier=None, doc_type=None):
+        """Returns the paths of the segments of an index, or of a run,
+        without their suffix, in the order they were started."""
+        pattern = os.path.join(
+            self.directory(index_name, run_identifier or '*', doc_type or '*'),
+            '*' + SEGMENT_SUFFIX)
+        paths = [path[:-len(SEGMENT_SUFFIX)] for path in glob(pattern)]
+        # Segment names end with the time they were started
+        return sorted(paths, key=lambda path: (path.rsplit('-', 1)[-1], path))
+
+    @staticmethod
+    def _read_index(path):
+        """Yields the ``(object_id, offset, length)`` of the documents in a
+        segment."""
+        with open(path + INDEX_SUFFIX, 'rb') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) == 3:
+                    yield parts[0], int(parts[1]), int(parts[2])
+
+    def _get_lookup(self, index_name, doc_type):
+        """Returns the lookup table of a doc_type of the run in the
+        manifest of an index, or ``None`` if there is no manifest."""
+        manifest_path = os.path.join(self.directory(index_name),
+                                     MANIFEST_NAME)
+        try:
+            mtime = os.path.getmtime(manifest_path)
+        except OSError:
+            return
+
+        cached = self._lookups.get((index_name, doc_type))
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with open(manifest_path, 'rb') as f:
+            run_identifier = json.load(f)['run_identifier']
+        directory = self.directory(index_name, run_identifier, doc_type)
+
+        lookup = {}
+        try:
+            with open(os.path.join(directory, LOOKUP_NAME), 'rb') as f:
+                for line in f:
+                    object_id, name, offset, length = \
+                        line.rstrip('\n').split('\t')
+                    lookup[object_id] = (os.path.join(directory, name),
+                                         int(offset), int(length))
+        except IOError:
+            pass
+
+        self._lookups[(index_name, doc_type)] = (mtime, lookup)
+        return lookup
+
+    def get(self, index_name, doc_type, object_id):
+        """Returns the JSON of the latest version of a document, or ``None``
+        if it isn't stored.
+
+        Documents are looked up in the lookup table of the run in the
+        manifest of the index. Before the first run of an index is
+        finished, there is no manifest, and all segments of the index are
+        scanned instead.
+        """
+        if isinstance(object_id, unicode):
+            object_id = object_id.encode('utf-8')
+
+        lookup = self._get_lookup(index_name, doc_type)
+        if lookup is not None:
+            location = lookup.get(object_id)
+        else:
+            location = None
+            for path in self.segments(index_name, doc_type=doc_type):
+                try:
+                    for doc_id, offset, length in self._read_index(path):
+                        if doc_id == object_id:
+                            location = (path, offset, length)
+                except IOError:
+                    continue
+
+        if location is None:
+            return
+
+        path, offset, length = location
+        with open(path + SEGMENT_SUFFIX, 'rb') as f:
+            f.seek(offset)
+            member = f.read(length)
+        return zlib.decompress(member, 16 + zlib.MAX_WBITS).rstrip('\n')
+
+    def write_manifest(self, index_name, run_identifier, **meta):
+        """Writes a manifest of the segments of a finished run to
+        ``<root>/<index_name>/manifest.json``, and the lookup table of the
+        documents of each doc_type, in which documents that were written
+        more than once only appear with their latest version. The segments
+        of older runs are removed, except for the latest ``keep_runs``.
+
+        :param meta: stored in the manifest.
+        :returns: the manifest.
+        """
+        directory = self.directory(index_name)
+        segments = []
+        doc_types = {}
+        for path in self.segments(index_name, run_identifier):
+            doc_type_dir = os.path.dirname(path)
+            doc_type = os.path.basename(doc_type_dir)[:-1]
+            lookup = doc_types.setdefault(doc_type, {})
+
+            documents = 0
+            try:
+                for object_id, offset, length in self._read_index(path):
+                    lookup[object_id] = (os.path.basename(path), offset,
+                                         length)
+                    documents += 1
+                size = os.path.getsize(path + SEGMENT_SUFFIX)
+            except (IOError, OSError):
+                continue
+
+            segments.append({
+                'doc_type': doc_type,
+                'segment': os.path.relpath(path + SEGMENT_SUFFIX, directory),
+                'index': os.path.relpath(path + INDEX_SUFFIX, directory),
+                'documents': documents,
+                'size': size
+            })
+
+        for doc_type, lookup in doc_types.iteritems():
+            doc_type_dir = self.directory(index_name, run_identifier,
+                                          doc_type)
+            with NamedTemporaryFile(prefix='.ocd_l_', suffix='.tmp',
+                                    dir=doc_type_dir, delete=False) as tf:
+                for object_id, location in sorted(lookup.iteritems()):
+                    tf.write('%s\t%s\t%d\t%d\n' % ((object_id,) + location))
+            os.rename(tf.name, os.path.join(doc_type_dir, LOOKUP_NAME))
+
+        manifest = dict(meta, index_name=index_name,
+                        run_identifier=run_identifier,
+                        created=datetime.utcnow().isoformat(),
+                        documents=sum(len(lookup)
+                                      for lookup in doc_types.values()),
+                        doc_types=dict((doc_type, len(lookup))
+                                       for doc_type, lookup
+                                       in doc_types.iteritems()),
+                        segments=segments)
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with NamedTemporaryFile(prefix='.ocd_m_', suffix='.tmp',
+                                dir=directory, delete=False) as tf:
+            json.dump(manifest, tf, indent=2)
+        os.rename(tf.name, os.path.join(directory, MANIFEST_NAME))
+
+        log.info('Wrote manifest of %d segments (%d documents) of %s' % (
+            len(segments), manifest['documents'], index_name))
+
+        self.remove_old_runs(index_name, run_identifier)
+        return manifest
+
+    def remove_old_runs(self, index_name, run_identifier):
+        """Removes the segments of the runs of an index other than
+        ``run_identifier`` and the latest ``keep_runs - 1`` runs before
+        it."""
+        directory = self.directory(index_name)
+        runs = [path for path in glob(os.path.join(directory, '*'))
+                if os.path.isdir(path) and
+                os.path.basename(path) != run_identifier]
+        runs.sort(key=os.path.getmtime, reverse=True)
+
+        for path in runs[max(self.keep_runs - 1, 0):]:
+            log.info('Removing segments of run %s' % os.path.basename(path))
+            shutil.rmtree(path, ignore_errors=True)
+
+
+segment_store = SegmentStore(settings.FILE_LOADER_DIR,
+                             settings.FILE_LOADER_SEGMENT_SIZE,
+                             settings.FILE_LOADER_KEEP_RUNS)
@@ -0,0 +1,306 @@
+import fcntl
+import json
+import os
+import socket
+import threading
+from datetime import datetime
+from glob import glob
+
+from elasticsearch.exceptions import ConnectionError, TransportError
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('spool')
+
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.spool'
+TEMP_SUFFIX = '.tmp'
+
+# The statuses of bulk items that are sent again on a later replay
+RETRY_STATUSES = (429, 503)
+
+
+def is_unavailable(error):
+    """Returns whether an Elasticsearch error means the cluster is down or
+    rejects requests because it is overloaded, rather than that the
+    request is invalid."""
+    if isinstance(error, ConnectionError):
+        return True
+    return isinstance(error, TransportError) and \
+        error.status_code in RETRY_STATUSES
+
+
+def _lock(path):
+    """Opens the segment at ``path`` and takes its lock, or returns
+    ``None`` if it was removed or another process holds the lock."""
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except IOError:
+        f.close()
+        return
+    return f
+
+
+def _split_actions(lines):
+    """Splits the serialized lines of an item into its actions: the
+    action line, followed by the source line unless it is a delete."""
+    actions = []
+    for line in lines:
+        if actions and len(actions[-1]) == 1 and \
+                'delete' not in json.loads(actions[-1][0]):
+            actions[-1].append(line)
+        else:
+            actions.append([line])
+    return actions
+
+
+class BulkSpool(object):
+    """A local write-ahead log of bulk actions that couldn't be sent to
+    Elasticsearch, which are sent by :meth:`replay` once it is available
+    again.
+
+    Each worker process appends the actions of an item as one JSON line
+    to its own segment, ``<host>-<pid>-<timestamp>.open``, and holds an
+    exclusive ``flock`` on it for as long as it writes to it. Every item
+    is flushed to the operating system when it is appended; the segment
+    is fsynced after every ``fsync_records`` items, or by a timer at most
+    ``fsync_interval`` seconds after the first item that wasn't synced.
+    A segment is sealed (renamed to ``.spool``) when it is larger than
+    ``max_bytes`` or the process shuts down. Only sealed segments, and
+    open segments of which the lock was released because the process
+    died, are replayed.
+
+    :param root: the directory of the segments.
+    :param max_bytes: the size after which a segment is sealed.
+    :type max_bytes: int
+    :param fsync_records: the number of items between fsyncs.
+    :type fsync_records: int
+    :param fsync_interval: the maximum number of seconds between fsyncs.
+    :type fsync_interval: float
+    """
+
+    def __init__(self, root, max_bytes, fsync_records, fsync_interval):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fsync_records = fsync_records
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file = None
+        self._reset()
+
+    def _reset(self):
+        # A forked process closes its copy of the segment of the parent,
+        # which keeps the lock of the parent
+        if self._file is not None and os.getpid() != self._pid:
+            self._file.close()
+        self._file = None
+        self._path = None
+        self._unsynced = 0
+        self._timer = None
+        self._pid = os.getpid()
+
+    def _open(self):
+        try:
+            os.makedirs(self.root)
+        except OSError:
+            # Created by another worker in the meantime
+            pass
+
+        name = '%s-%d-%s' % (socket.gethostname(), os.getpid(),
+                             datetime.utcnow().strftime('%Y%m%d%H%M%S%f'))
+        path = os.path.join(self.root, name + OPEN_SUFFIX)
+
+        # Locked before it is given the name that is replayed
+        self._file = open(path + TEMP_SUFFIX, 'ab')
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        os.rename(path + TEMP_SUFFIX, path)
+        self._path = path
+        log.warning('Spooling bulk actions to %s' % path)
+
+    def _sync(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _timed_sync(self):
+        with self._lock:
+            self._timer = None
+            if self._file is not None and self._unsynced and \
+                    os.getpid() == self._pid:
+                self._sync()
+
+    def _seal(self):
+        self._sync()
+        # Renamed while it is locked, so it isn't replayed before it is
+        # closed
+        os.rename(self._path, self._path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        self._file.close()
+        self._file = None
+        self._path = None
+
+    def append(self, lines):
+        """Appends the bulk actions of an item.
+
+        :param lines: the serialized lines of the actions, as sent in the
+            body of a ``_bulk`` request.
+        :type lines: list
+        """
+        with self._lock:
+            # The segment of the parent process stays with the parent
+            if os.getpid() != self._pid:
+                self._reset()
+            if self._file is None:
+                self._open()
+
+            self._file.write(json.dumps(lines) + '\n')
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_records:
+                self._sync()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.fsync_interval,
+                                              self._timed_sync)
+                self._timer.daemon = True
+                self._timer.start()
+
+            if self._file.tell() >= self.max_bytes:
+                self._seal()
+
+    def close(self):
+        """Seals the segment of this process."""
+        with self._lock:
+            if self._file is not None and os.getpid() == self._pid:
+                self._seal()
+            self._reset()
+
+    def segments(self):
+        """Returns the paths of the segments that can be replayed: the sealed
+        ones, and the open ones that aren't locked (their process died)."""
+        paths = glob(os.path.join(self.root, '*' + SEALED_SUFFIX))
+        for path in glob(os.path.join(self.root, '*' + OPEN_SUFFIX)):
+            f = _lock(path)
+            if f is not None:
+                f.close()
+                paths.append(path)
+        return sorted(paths)
+
+    def _write_segment(self, path, items):
+        """Replaces the segment at ``path`` by a sealed segment with
+        ``items``."""
+        sealed_path = path
+        if path.endswith(OPEN_SUFFIX):
+            sealed_path = path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX
+
+        with open(sealed_path + TEMP_SUFFIX, 'wb') as f:
+            for lines in items:
+                f.write(json.dumps(lines) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(sealed_path + TEMP_SUFFIX, sealed_path)
+        if sealed_path != path:
+            os.remove(path)
+
+    def replay(self, es, max_bytes=settings.ES_BULK_MAX_BYTES):
+        """Sends the actions of the segments that can be replayed. Actions
+        that fail because Elasticsearch is unavailable or overloaded are
+        kept in their segment for the next replay, and a segment is removed
+        once nothing is kept. Stops at the first request that can't be
+        sent.
+
+        Each segment is locked while it is replayed, so segments that are
+        replayed by another process are skipped.
+
+        :param es: the Elasticsearch client.
+        :param max_bytes: the maximum size of a bulk request.
+        :returns: the number of indexed actions, the number of actions that
+            failed, and the number of actions kept for the next replay.
+        :rtype: tuple
+        """
+        replayed = failed = kept = 0
+        for path in self.segments():
+            f = _lock(path)
+            if f is None:
+                continue
+
+            with f:
+                # Replayed by another process before it was locked
+                if not os.path.exists(path):
+                    continue
+
+                chunks = [[]]
+                size = 0
+                for line in f:
+                    try:
+                        lines = json.loads(line)
+                    except ValueError:
+                        # Incomplete last line of an abandoned segment
+                        log.warning('Skipping a corrupt item in %s' % path)
+                        continue
+                    if size >= max_bytes:
+                        chunks.append([])
+                        size = 0
+                    chunks[-1].append(lines)
+                    size += sum(len(l) + 1 for l in lines)
+
+                retry = []
+                unavailable = False
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if unavailable:
+                        retry.extend(chunk)
+                        continue
+
+                    body = '\n'.join(
+                        l for lines in chunk for l in lines) + '\n'
+                    try:
+                        result = es.bulk(body=body)
+                    except TransportError, e:
+                        log.error('Replaying %s failed: %s' % (path, e))
+                        retry.extend(chunk)
+                        unavailable = True
+                        continue
+
+                    actions = [action for lines in chunk
+                               for action in _split_actions(lines)]
+                    errors = []
+                    for action, item in zip(actions, result['items']):
+                        item = item.values()[0]
+                        if item.get('status') in RETRY_STATUSES:
+                            retry.append(action)
+                        elif item.get('error'):
+                            errors.append(item['error'])
+                        else:
+                            replayed += 1
+                    if errors:
+                        failed += len(errors)
+                        log.error('%d actions of %s failed: %s' % (
+                            len(errors), path, errors[:10]))
+
+                if retry:
+                    n_kept = sum(len(_split_actions(lines))
+                                 for lines in retry)
+                    kept += n_kept
+                    self._write_segment(path, retry)
+                    log.warning('Kept %d actions of %s for the next '
+                                'replay' % (n_kept, path))
+                else:
+                    os.remove(path)
+                    log.info('Replayed %s' % path)
+
+            if unavailable:
+                break
+
+        return replayed, failed, kept
+
+
+bulk_spool = BulkSpool(settings.ES_SPOOL_DIR, settings.ES_SPOOL_SEGMENT_SIZE,
+                       settings.ES_SPOOL_FSYNC_RECORDS,
+                       settings.ES_SPOOL_FSYNC_INTERVAL)
@@ -0,0 +1,204 @@
+import numpy as np
+
+
+def _encode(values):
+    """Encode a sequence of (hashable) values as integer codes.
+
+    :returns: a tuple with the array of unique values and the array of
+        codes, which index into the unique values.
+    """
+    index = {}
+    codes = np.fromiter((index.setdefault(v, len(index)) for v in values),
+                        dtype=np.intp)
+    uniques = [None] * len(index)
+    for value, code in index.iteritems():
+        uniques[code] = value
+    return uniques, codes
+
+
+class VoteTally(object):
+    """Tallies the votes of one or more voting rounds of a municipality.
+
+    The votes are encoded as integer arrays (round, person, party and
+    option), so the counts per round, per party per round and per person
+    are each computed with a single :func:`numpy.bincount` instead of a
+    Python loop over the votes.
+
+    :param votes: an iterable of ``(round_id, person_id, party_id, option)``
+        tuples.
+    """
+
+    #: The order in which options are reported, other options follow
+    #: in order of appearance
+    preferred_options = ('yes', 'no')
+
+    def __init__(self, votes):
+        votes = list(votes)
+        if votes:
+            round_ids, person_ids, party_ids, options = zip(*votes)
+        else:
+            round_ids = person_ids = party_ids = options = ()
+
+        self.rounds, self.round_codes = _encode(round_ids)
+        self.persons, self.person_codes = _encode(person_ids)
+        self.parties, self.party_codes = _encode(party_ids)
+
+        ordered = [o for o in self.preferred_options if o in set(options)]
+        self.options, self.option_codes = _encode(ordered + list(options))
+        self.option_codes = self.option_codes[len(ordered):]
+
+        self._round_index = {r: i for i, r in enumerate(self.rounds)}
+
+        n_rounds, n_parties = len(self.rounds), len(self.parties)
+        n_persons, n_options = len(self.persons), len(self.options)
+
+        self.round_counts = np.bincount(
+            self.round_codes * n_options + self.option_codes,
+            minlength=n_rounds * n_options
+        ).reshape(n_rounds, n_options)
+
+        self.party_counts = np.bincount(
+            (self.round_codes * n_parties + self.party_codes) * n_options +
+            self.option_codes,
+            minlength=n_rounds * n_parties * n_options
+        ).reshape(n_rounds, n_parties, n_options)
+
+        self.person_counts = np.bincount(
+            self.person_codes * n_options + self.option_codes,
+            minlength=n_persons * n_options
+        ).reshape(n_persons, n_options)
+
+    @classmethod
+    def from_ibabs_votes(cls, voting_rounds):
+        """Create a tally from iBabs votes.
+
+        :param voting_rounds: an iterable of ``(round_id, votes)`` tuples,
+            where votes is a list of iBabs vote dicts (with ``UserId``,
+            ``GroupId`` and a boolean ``Vote``).
+        """
+        return cls(
+            (round_id, v['UserId'], v['GroupId'], 'yes' if v['Vote'] else 'no')
+            for round_id, votes in voting_rounds for v in votes or [])
+
+    @classmethod
+    def from_vote_events(cls, vote_events):
+        """Create a tally from vote event documents as they are indexed.
+
+        :param vote_events: an iterable of ``(round_id, votes)`` tuples,
+            where votes is a list of dicts with ``voter_id``, ``group_id``
+            and ``option``.
+        """
+        return cls(
+            (round_id, v.get('voter_id'), v.get('group_id'), v['option'])
+            for round_id, votes in vote_events for v in votes or [])
+
+    @property
+    def cohesion(self):
+        """The share of the votes of each party in each round that were
+        cast for the option the majority of the party voted for, as an
+        array of rounds by parties. Parties that didn't vote in a round
+        have a cohesion of ``nan``."""
+        if not self.options:
+            return np.full(self.party_counts.shape[:2], np.nan)
+
+        totals = self.party_counts.sum(axis=2)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.party_counts.max(axis=2) / totals.astype(float)
+
+    def get_counts(self, round_id):
+        """Returns the number of votes per option in a round. Like the
+        counts of the items, the preferred options are always included,
+        even if nobody voted for them."""
+        if round_id not in self._round_index:
+            return []
+        counts = dict(zip(self.options,
+                          self.round_counts[self._round_index[round_id]]))
+        options = list(self.preferred_options) + [
+            o for o in self.options if o not in self.preferred_options]
+        return [{'option': option, 'value': int(counts.get(option, 0))}
+                for option in options]
+
+    def get_group_results(self, round_id, group_names=None):
+        """Returns the number of votes per option per party in a round.
+
+        :param group_names: a dict of party ids to names.
+        """
+        if round_id not in self._round_index:
+            return []
+        group_names = group_names or {}
+        party_counts = self.party_counts[self._round_index[round_id]]
+        party_codes, option_codes = np.nonzero(party_counts)
+        return [{
+            'option': self.options[o],
+            'value': int(party_counts[p, o]),
+            'group_id': self.parties[p],
+            'group': {
+                'name': group_names.get(self.parties[p])
+            }
+        } for p, o in zip(party_codes, option_codes)]
+
+    def get_cohesion(self, round_id):
+        """Returns the cohesion per party that voted in a round."""
+        cohesion = self.cohesion[self._round_index[round_id]]
+        return {self.parties[p]: float(cohesion[p])
+                for p in np.flatnonzero(~np.isnan(cohesion))}
+
+    def get_party_cohesion(self):
+        """Returns the mean cohesion of each party over the rounds it voted
+        in, together with the number of those rounds."""
+        cohesion = self.cohesion
+        voted = ~np.isnan(cohesion)
+        rounds = voted.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(voted, cohesion, 0).sum(axis=0) / rounds
+        return {party: (float(mean), int(n))
+                for party, mean, n in zip(self.parties, means, rounds)}
+
+    def get_person_tallies(self):
+        """Returns the number of votes per option of each person over all
+        rounds."""
+        return {person: dict(zip(self.options, (int(c) for c in counts)))
+                for person, counts in zip(self.persons, self.person_counts)}
+
+
+def recompute_voting_rounds(hits):
+    """Tallies the votes of voting round documents, as indexed for an
+    :class:`~ocd_backend.items.voting_round.IBabsVotingRoundItem` (which
+    stores the votes, counts and group results in ``doc``).
+
+    :param hits: the search hits of the voting rounds, with at least
+        ``doc.votes`` and ``doc.group_results`` in their ``_source``.
+    :returns: the tally, the names of the parties by id, and the bulk
+        actions that update the ``counts`` and ``group_results`` of each
+        voting round that has votes.
+    :rtype: tuple
+    """
+    hits = list(hits)
+    tally = VoteTally.from_vote_events(
+        (hit['_id'], hit['_source'].get('doc', {}).get('votes'))
+        for hit in hits)
+
+    group_names = {}
+    for hit in hits:
+        for group_result in hit['_source'].get('doc', {}).get(
+                'group_results') or []:
+            group_names[group_result.get('group_id')] = \
+                group_result.get('group', {}).get('name')
+
+    rounds = set(tally.rounds)
+    actions = [{
+        '_op_type': 'update',
+        '_index': hit['_index'],
+        '_type': hit['_type'],
+        '_id': hit['_id'],
+        'doc': {
+            'doc': {
+                'counts': [dict(count, group={'name': u'Gemeenteraad'})
+                           for count in tally.get_counts(hit['_id'])],
+                'group_results': tally.get_group_results(hit['_id'],
+                                                         group_names)
+            }
+        }
+    } for hit in hits if hit['_id'] in rounds]
+
+    return tally, group_names, actions
@@ -0,0 +1,202 @@
+import fcntl
+import os
+import zlib
+from collections import defaultdict
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+
+from ocd_backend import settings
+from ocd_backend.log import get_source_logger
+
+log = get_source_logger('text_cache')
+
+# The file in the root of the cache with the total size of the entries
+SIZE_NAME = '.size'
+# The file that is locked by the process that evicts entries after a write
+EVICT_LOCK_NAME = '.evict'
+
+
+def file_checksum(path, chunk_size=1024*1024):
+    """Returns the SHA-256 of the contents of the file at ``path``."""
+    checksum = sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            checksum.update(chunk)
+    return checksum.hexdigest()
+
+
+class TextCache(object):
+    """A persistent cache of the text extracted from documents, stored in
+    a directory sharded by the first two characters of the key.
+
+    Entries are keyed by the SHA-256 of the document, the version of the
+    extractor and the maximum number of pages that was extracted, so
+    changing the extractor or ``pdf_max_pages`` never returns stale text.
+    The text is stored zlib-compressed. Reading an entry updates its
+    modification time, which is used to evict the least recently used
+    entries when the cache grows beyond ``max_size`` bytes.
+
+    The total size of the entries is kept in a file in the root of the
+    cache, which each write adds the size of its entry to, so writes don't
+    have to scan the cache. Only a write that makes the cache larger than
+    ``max_size`` scans it, and evicts entries until it is smaller than
+    ``evict_to`` times ``max_size``.
+
+    :param root: the directory of the cache.
+    :type root: str
+    :param max_size: the maximum total size of the entries in bytes.
+    :type max_size: int
+    :param evict_to: the fraction of ``max_size`` to evict to.
+    :type evict_to: float
+    """
+
+    def __init__(self, root, max_size, evict_to=0.9):
+        self.root = root
+        self.max_size = max_size
+        self.evict_to = evict_to
+
+    @staticmethod
+    def key(content_hash, extractor_version, max_pages):
+        return '%s-v%s-p%s' % (content_hash, extractor_version, max_pages)
+
+    def path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """Returns the text cached for ``key``, or ``None``."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as f:
+                text = zlib.decompress(f.read()).decode('utf-8')
+            os.utime(path, None)
+        except (IOError, OSError, zlib.error):
+            return
+        return text
+
+    def set(self, key, text):
+        """Caches ``text`` for ``key``."""
+        path = self.path(key)
+        try:
+            if not os.path.exists(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+        except OSError:
+            # Created by another worker in the meantime
+            pass
+
+        data = zlib.compress(text.encode('utf-8'))
+        try:
+            with NamedTemporaryFile(prefix='.ocd_t_', suffix='.tmp',
+                                    dir=os.path.dirname(path),
+                                    delete=False) as tf:
+                tf.write(data)
+            try:
+                replaced_size = os.path.getsize(path)
+            except OSError:
+                replaced_size = 0
+            os.rename(tf.name, path)
+            total_size = self._update_size(len(data) - replaced_size)
+        except (IOError, OSError), e:
+            log.warning('Unable to write to text cache: %s' % e)
+            return
+
+        if total_size > self.max_size:
+            self._evict_once()
+
+    def _evict_once(self):
+        """Evicts entries to ``evict_to`` times ``max_size``, unless
+        another process is already evicting."""
+        with open(os.path.join(self.root, EVICT_LOCK_NAME), 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                return
+            self.evict(int(self.max_size * self.evict_to))
+
+    def _update_size(self, delta=0, total_size=None):
+        """Adds ``delta`` to the total size of the entries, or sets it to
+        ``total_size``, and returns the total size. The size is counted
+        from the entries when it isn't known yet."""
+        with open(os.path.join(self.root, SIZE_NAME), 'a+') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            if total_size is None:
+                try:
+                    total_size = int(f.read()) + delta
+                except ValueError:
+                    total_size = sum(size for _, size, _ in self._entries())
+            f.seek(0)
+            f.truncate()
+            f.write(str(total_size))
+        return total_size
+
+    def _entries(self):
+        """Yields the path, size and modification time of all entries."""
+        if not os.path.exists(self.root):
+            return
+
+        for shard in os.listdir(self.root):
+            shard_path = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_path):
+                continue
+            for name in os.listdir(shard_path):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(shard_path, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def evict(self, max_size=None):
+        """Removes the least recently used entries until the cache is
+        smaller than ``max_size`` (the size of the cache by default).
+
+        :returns: the number of removed entries and their total size.
+        """
+        if max_size is None:
+            max_size = self.max_size
+
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total_size = sum(size for _, size, _ in entries)
+
+        removed = removed_size = 0
+        for path, size, _ in entries:
+            if total_size - removed_size <= max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+            removed_size += size
+
+        try:
+            self._update_size(total_size=total_size - removed_size)
+        except (IOError, OSError), e:
+            log.warning('Unable to update the size of the text cache: %s' % e)
+
+        if removed:
+            log.info('Evicted %d entries (%d bytes) from the text cache'
+                     % (removed, removed_size))
+        return removed, removed_size
+
+    def stats(self):
+        """Returns the number of entries and their total size, in total
+        and per extractor version."""
+        stats = {
+            'entries': 0,
+            'size': 0,
+            'max_size': self.max_size,
+            'versions': defaultdict(lambda: {'entries': 0, 'size': 0})
+        }
+        for path, size, _ in self._entries():
+            version = os.path.basename(path).split('-')[1]
+            for s in (stats, stats['versions'][version]):
+                s['entries'] += 1
+                s['size'] += size
+        stats['versions'] = dict(stats['versions'])
+        return stats
+
+
+text_cache = TextCache(settings.TEXT_CACHE_PATH, settings.TEXT_CACHE_MAX_SIZE)
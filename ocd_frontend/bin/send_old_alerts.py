@@ -7,7 +7,6 @@ import datetime
 import os
 import sys
 
-from elasticsearch import Elasticsearch
 from elasticsearch.exceptions import NotFoundError
 from elasticsearch.helpers import scan
 
@@ -20,10 +19,12 @@ sys.path.insert(0, os.path.abspath(BASE_DIR))
 
 from ocd_frontend import settings
 from ocd_frontend.es import email_subscription
+from ocd_frontend.es_client import ElasticsearchPool
 from ocd_frontend.rest import create_app
 
 ELASTICSEARCH_HOST = os.getenv('ELASTICSEARCH_HOST', 'localhost')
 ELASTICSEARCH_PORT = os.getenv('ELASTICSEARCH_PORT', 9200)
+ELASTICSEARCH_HOSTS = '{}:{}'.format(ELASTICSEARCH_HOST, ELASTICSEARCH_PORT)
 
 def parse_date(date_str):
     try:
@@ -34,7 +35,7 @@ def parse_date(date_str):
 
 
 def get_elasticsearch_connection():
-    return Elasticsearch([{'host': ELASTICSEARCH_HOST, 'port': ELASTICSEARCH_PORT}])
+    return ElasticsearchPool(ELASTICSEARCH_HOSTS)
 
 
 def get_subscriptions(es):
@@ -84,7 +85,7 @@ def find_matching_docs(subscription, loaded_since, es):
 
 def main(args):
     es = get_elasticsearch_connection()
-    app = create_app({'ELASTICSEARCH_HOST': ELASTICSEARCH_HOST})
+    app = create_app({'ELASTICSEARCH_HOSTS': ELASTICSEARCH_HOSTS})
 
     for subscription in get_subscriptions(es):
         doc_count, doc_sample = find_matching_docs(
@@ -10,7 +10,7 @@ import requests
 import sys
 from datetime import datetime
 
-from elasticsearch import Elasticsearch, NotFoundError
+from elasticsearch import NotFoundError
 from elasticsearch.helpers import scan, bulk
 from pygtrie import CharTrie
 from pymongo import MongoClient
@@ -25,6 +25,7 @@ sys.path.insert(0, os.path.abspath(BASE_DIR))
 
 from ocd_frontend import settings
 from ocd_frontend.es import percolate_documents
+from ocd_frontend.es_client import ElasticsearchPool
 from ocd_frontend.rest import create_app
 from ocd_frontend.rest.snippets import add_doc_snippets
 
@@ -33,9 +34,10 @@ ELASTICSEARCH_HOST = os.getenv('ELASTICSEARCH_HOST', 'localhost')
 ELASTICSEARCH_PORT = os.getenv('ELASTICSEARCH_PORT', 9200)
 SOURCE_ELASTICSEARCH_HOST = os.getenv('SOURCE_ELASTICSEARCH_HOST', 'localhost')
 SOURCE_ELASTICSEARCH_PORT = os.getenv('SOURCE_ELASTICSEARCH_PORT', 9797)
+ELASTICSEARCH_HOSTS = '{}:{}'.format(ELASTICSEARCH_HOST, ELASTICSEARCH_PORT)
 
-es_source = Elasticsearch([{'host': SOURCE_ELASTICSEARCH_HOST, 'port': SOURCE_ELASTICSEARCH_PORT}], timeout=30)
-es_sink = Elasticsearch([{'host': ELASTICSEARCH_HOST, 'port': ELASTICSEARCH_PORT}])
+es_source = ElasticsearchPool('{}:{}'.format(SOURCE_ELASTICSEARCH_HOST, SOURCE_ELASTICSEARCH_PORT), timeout=30)
+es_sink = ElasticsearchPool(ELASTICSEARCH_HOSTS)
 
 mongo_client = MongoClient()
 llv_db = mongo_client.osm_globe
@@ -80,7 +82,7 @@ def arg_parser():
 def geocode_collection(source_index, municipality_code):
     print('\nGeocoding {} for municipality {}'.format(source_index, municipality_code))
     app = create_app({
-        'ELASTICSEARCH_HOST': ELASTICSEARCH_HOST,
+        'ELASTICSEARCH_HOSTS': ELASTICSEARCH_HOSTS,
         'CELERY_BROKER_URL': 'redis://'
                              + os.getenv('REDIS_HOST', 'redis')
                              + ':'
@@ -89,7 +91,7 @@ def geocode_collection(source_index, municipality_code):
                              + os.getenv('REDIS_DB', 1),
     })
     # FIXME: monkeypatching settings may interact with flask app config
-    settings.ELASTICSEARCH_HOST = ELASTICSEARCH_HOST
+    settings.ELASTICSEARCH_HOSTS = ELASTICSEARCH_HOSTS
 
     waaroverheid_index = 'wo_{}'.format(municipality_code.lower())
     source_count = es_source.count(index=source_index)['count']
@@ -1,15 +1,24 @@
 from collections import defaultdict
 
-from elasticsearch import Elasticsearch
 from flask import render_template
 
 from ocd_frontend import mail
 from ocd_frontend import settings
+from ocd_frontend.es_client import ElasticsearchPool
 
 
 class ElasticsearchService(object):
-    def __init__(self, host, port):
-        self._es = Elasticsearch([{'host': host, 'port': port}])
+    def __init__(self, hosts, **kwargs):
+        self._es = ElasticsearchPool(hosts, **kwargs)
+
+    @classmethod
+    def from_config(cls, config):
+        """Creates a service from the ``ELASTICSEARCH_HOSTS`` and ``ES_*``
+        settings in ``config``."""
+        return cls(config['ELASTICSEARCH_HOSTS'], sniff=config['ES_SNIFF'],
+                   maxsize=config['ES_MAXSIZE'],
+                   timeout=config['ES_TIMEOUT'],
+                   timeouts=config['ES_TIMEOUTS'])
 
     def search(self, *args, **kwargs):
         return self._es.search(*args, **kwargs)
@@ -57,9 +66,20 @@ def get_percolate_query(document):
     }
 
 
+_es_service = None
+
+
+def get_es_service():
+    """Returns the service of scripts and tasks that run outside of the
+    app, created from the ``settings`` on first use."""
+    global _es_service
+    if _es_service is None:
+        _es_service = ElasticsearchService.from_config(vars(settings))
+    return _es_service
+
+
 def percolate_documents(documents, latest_date, dry_run=False):
-    es = ElasticsearchService(
-        settings.ELASTICSEARCH_HOST, settings.ELASTICSEARCH_PORT)
+    es = get_es_service()
 
     print('running percolate over {} documents'.format(len(documents)))
 
@@ -0,0 +1,111 @@
+import os
+import threading
+
+from elasticsearch import Elasticsearch
+
+# The operation class of the client methods that get their own timeout
+OPERATION_CLASSES = {
+    'bulk': 'bulk',
+    'reindex': 'bulk',
+    'update_by_query': 'bulk',
+    'delete_by_query': 'bulk',
+    'search': 'search',
+    'msearch': 'search',
+    'scroll': 'search',
+    'count': 'search',
+    'get': 'search',
+    'mget': 'search',
+    'exists': 'search'
+}
+
+
+def parse_hosts(hosts):
+    """Returns the connection parameters of a comma separated list of
+    ``host[:port]`` nodes, such as ``'es1:9200,es2:9200'``.
+
+    :param hosts: the nodes as a string, or a list of strings or dicts.
+    :rtype: list
+    """
+    if isinstance(hosts, basestring):
+        hosts = hosts.split(',')
+
+    nodes = []
+    for host in hosts:
+        if isinstance(host, dict):
+            nodes.append(host)
+            continue
+
+        host = host.strip()
+        if not host:
+            continue
+        if ':' in host:
+            host, port = host.rsplit(':', 1)
+            nodes.append({'host': host, 'port': int(port)})
+        else:
+            nodes.append({'host': host, 'port': 9200})
+    return nodes
+
+
+class ElasticsearchPool(object):
+    """A fork-safe Elasticsearch client that is shared by all code of a
+    process.
+
+    The client is created on first use, and created again in a forked
+    process (such as a Celery prefork worker), so processes never share
+    the connections of the pool. Attributes are looked up on the client
+    of the current process, so the pool can be used as an
+    :class:`~elasticsearch.Elasticsearch` client.
+
+    :param hosts: the nodes of the cluster, see :func:`parse_hosts`.
+    :param sniff: whether to discover the other nodes of the cluster on
+        start, when a connection fails and every ``sniff_interval``
+        seconds.
+    :type sniff: bool
+    :param sniff_interval: the number of seconds between sniffs.
+    :param maxsize: the number of connections per node in the pool of a
+        process.
+    :type maxsize: int
+    :param timeout: the default timeout of requests in seconds.
+    :param timeouts: the timeout of requests by operation class (see
+        ``OPERATION_CLASSES``), used when a request doesn't specify a
+        ``request_timeout``.
+    :type timeouts: dict
+    :param kwargs: passed to :class:`~elasticsearch.Elasticsearch`.
+    """
+
+    def __init__(self, hosts, sniff=False, sniff_interval=60, maxsize=10,
+                 timeout=10, timeouts=None, **kwargs):
+        self.hosts = parse_hosts(hosts)
+        self.timeouts = timeouts or {}
+        self.client_kwargs = dict(kwargs, maxsize=maxsize, timeout=timeout)
+        if sniff:
+            self.client_kwargs.update(sniff_on_start=True,
+                                      sniff_on_connection_fail=True,
+                                      sniffer_timeout=sniff_interval)
+
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """The client of the current process."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._client = Elasticsearch(self.hosts,
+                                                 **self.client_kwargs)
+                    self._pid = os.getpid()
+        return self._client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+
+        timeout = self.timeouts.get(OPERATION_CLASSES.get(name))
+        if timeout is None or not callable(attr):
+            return attr
+
+        def with_timeout(*args, **kwargs):
+            kwargs.setdefault('request_timeout', timeout)
+            return attr(*args, **kwargs)
+        return with_timeout
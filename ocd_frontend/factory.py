@@ -21,8 +21,7 @@ def create_app_factory(package_name, package_path, settings_override=None):
     if settings_override:
         app.config.from_mapping(settings_override)
 
-    app.es = ElasticsearchService(app.config['ELASTICSEARCH_HOST'],
-                                  app.config['ELASTICSEARCH_PORT'])
+    app.es = ElasticsearchService.from_config(app.config)
 
     register_blueprints(app, package_name, package_path)
 
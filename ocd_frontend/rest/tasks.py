@@ -2,16 +2,11 @@ from datetime import datetime
 from uuid import uuid4
 
 from ocd_frontend import settings
-from ocd_frontend.es import ElasticsearchService, percolate_documents
+from ocd_frontend.es import get_es_service, percolate_documents
 from ocd_frontend.factory import create_celery_app
 
 celery = create_celery_app()
 
-es_service = ElasticsearchService(
-    settings.ELASTICSEARCH_HOST,
-    settings.ELASTICSEARCH_PORT
-)
-
 
 @celery.task(ignore_result=True)
 def email_subscribers(documents, latest_date, dry_run=False):
@@ -65,7 +60,7 @@ def log_event(user_agent, referer, user_ip, created_at, event_type,
         'event_properties': available_event_types[event_type](**kwargs)
     }
 
-    es_service.create(
+    get_es_service().create(
         index=event_index,
         doc_type=event_type,
         id=uuid4().hex,
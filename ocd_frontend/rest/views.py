@@ -1,5 +1,6 @@
 import copy
 import glob
+import json
 import os
 import uuid
 from collections import defaultdict
@@ -342,6 +343,34 @@ def get_hashed_client_ip(request):
     return pbkdf2_sha256.using(salt=b'waaroveromverheid').hash(client_ip)
 
 
+def get_stored_media(url):
+    """Returns the path and content type of the file that the media store
+    of the backend keeps for ``url``, or ``None`` if it isn't stored.
+
+    Files are stored once per SHA-256 of their content; the metadata per
+    URL refers to the content. Files stored in the previous layout (one
+    file per URL hash) are returned without content type.
+    """
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    url_hash = sha1(url).hexdigest()
+
+    try:
+        with open(os.path.join(settings.MEDIA_STORE_PATH, 'urls',
+                               '%s.json' % url_hash), 'rb') as f:
+            metadata = json.load(f)
+        path = os.path.join(settings.MEDIA_STORE_PATH, 'objects',
+                            metadata['sha256'][:2], metadata['sha256'])
+        if os.path.exists(path):
+            return path, metadata.get('content_type')
+    except (IOError, ValueError, KeyError):
+        pass
+
+    path = os.path.join(settings.MEDIA_STORE_PATH, url_hash)
+    if os.path.exists(path):
+        return path, None
+
+
 # Retrieve the indices/sources and the total number of documents per
 # type (counting only documents which are not hidden!)
 @bp.route('/sources', methods=['GET'])
@@ -909,9 +938,9 @@ def resolve(url_id):
             index=current_app.config['RESOLVER_URL_INDEX'],
             doc_type='url', id=url_id)
 
-        file_hash = sha1(resp['_source']['original_url']).hexdigest()
-        path = os.path.join(settings.DATA_DIR_PATH, 'static', file_hash)
-        if os.path.exists(path):
+        stored_media = get_stored_media(resp['_source']['original_url'])
+        if stored_media:
+            path, content_type = stored_media
             # Log a 'resolve_filepath' event if usage logging is enabled
             if current_app.config['USAGE_LOGGING_ENABLED']:
                 tasks.log_event.delay(
@@ -922,8 +951,8 @@ def resolve(url_id):
                     event_type='resolve_filepath',
                     url_id=url_id,
                 )
-            return send_file(path,
-                             mimetype=resp['_source'].get('content_type'))
+            return send_file(path, mimetype=content_type or
+                             resp['_source'].get('content_type'))
 
         # Log a 'resolve' event if usage logging is enabled
         if current_app.config['USAGE_LOGGING_ENABLED']:
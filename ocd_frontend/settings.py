@@ -21,6 +21,18 @@ CELERY_ACCEPT_CONTENT = ['pickle', 'json']
 ELASTICSEARCH_HOST = os.getenv('ELASTICSEARCH_HOST', 'elasticsearch')
 ELASTICSEARCH_PORT = os.getenv('ELASTICSEARCH_PORT', 9200)
 
+# Comma separated host:port list of the nodes of the cluster, see
+# ocd_frontend.es_client.ElasticsearchPool
+ELASTICSEARCH_HOSTS = os.getenv('ELASTICSEARCH_HOSTS', '{}:{}'.format(
+    ELASTICSEARCH_HOST, ELASTICSEARCH_PORT))
+ES_SNIFF = os.getenv('ES_SNIFF', '').lower() in ('1', 'true', 'yes')
+ES_MAXSIZE = int(os.getenv('ES_MAXSIZE', 10))
+ES_TIMEOUT = float(os.getenv('ES_TIMEOUT', 10))
+ES_TIMEOUTS = {
+    'bulk': float(os.getenv('ES_BULK_TIMEOUT', 120)),
+    'search': float(os.getenv('ES_SEARCH_TIMEOUT', 30))
+}
+
 # The default number of hits to return for a search request via the REST API
 DEFAULT_SEARCH_SIZE = os.getenv('DEFAULT_SEARCH_SIZE', 10)
 
@@ -378,6 +390,10 @@ DUMPS_DIR = os.path.join(os.path.dirname(ROOT_PATH), 'dumps')
 LOCAL_DUMPS_DIR = os.path.join(os.path.dirname(ROOT_PATH), 'local_dumps')
 DATA_DIR_PATH = os.path.dirname(ROOT_PATH)
 
+# The content-addressed store of media files written by the backend, from
+# which resolved URLs are served when available
+MEDIA_STORE_PATH = os.path.join(DATA_DIR_PATH, 'static')
+
 # URL where of the API instance that should be used for management commands
 # Should include API version and a trailing slash.
 # Can be overridden in the CLI when required, for instance when the user wants
@@ -415,7 +431,7 @@ LOGGING = {
 THUMBNAILS_TEMP_DIR = '/tmp'
 
 THUMBNAILS_MEDIA_TYPES = {'image/jpeg', 'image/png', 'image/tiff'}
-THUMBNAILS_DIR = os.path.join(ROOT_PATH, '.thumbnail-cache')
+THUMBNAILS_DIR = os.getenv('THUMBNAILS_DIR', os.path.join(ROOT_PATH, '.thumbnail-cache'))
 
 THUMBNAIL_SMALL = 250
 THUMBNAIL_MEDIUM = 500
@@ -37,8 +37,15 @@ def create_thumbnail(source, identifier, size='large'):
     if not _size:
         log.exception('Invalid thumbnail size provided')
         raise InvalidThumbnailSize
+
+    # The backend pre-generates the thumbnails of enriched images
+    if os.path.exists(get_thumbnail_path(identifier, size)):
+        return
+
     try:
         im = Image.open(source)
+        if im.format == 'JPEG':
+            im.draft('RGB', _size.get('size'))
         if _size.get('type') == 'crop':
             log.debug('Cropping {}'.format(source))
             imc = ImageOps.fit(im, _size.get('size'), Image.ANTIALIAS)
@@ -16,7 +16,7 @@ from elasticsearch.exceptions import RequestError
 
 import ocd_backend
 from ocd_backend.es import elasticsearch as es
-from ocd_backend.utils.misc import reindex
+from ocd_backend.utils.reindex import parallel_reindex
 
 
 def transform_to_same(h):
@@ -29,10 +29,7 @@ def transform_to_old(h):
         h['_source']['classification'] = u'Meeting Item'
     return h
 
-def transform_to_new(h):
-    if h['_type'] != u'events':
-        return h
-
+def reclassify(h, sd):
     # This needs to be translated
     if h['_source']['classification'] == u'Meeting Item':
         h['_source']['classification'] = u'Agendapunt'
@@ -41,17 +38,6 @@ def transform_to_new(h):
     if h['_source']['classification'] == u'Meeting':
         h['_source']['classification'] = u'Agenda'
 
-    if h['_source'].has_key('source_data'):
-        sd = h['_source']['source_data']
-    else:
-        try:
-            doc = es.get(index=u'ori_%s' % (h['_source']['meta']['collection'],),
-                doc_type=h['_type'], id=h['_id'], _source_include=['*'])
-            sd = doc['_source']['source_data']
-            h['_source']['source_data'] = sd
-        except Exception as e:
-            sd = {}
-
     if h['_source']['classification'] != u'Report':
         return h
 
@@ -69,6 +55,33 @@ def transform_to_new(h):
 
     return h
 
+def transform_to_new(hits):
+    events = [h for h in hits if h['_type'] == u'events']
+
+    # Fetch the missing source_data of a chunk of events with one request
+    missing = [h for h in events if not h['_source'].has_key('source_data')
+               and h['_source'].get('meta', {}).get('collection')]
+    if missing:
+        try:
+            docs = es.mget(body={'docs': [{
+                '_index': u'ori_%s' % (h['_source']['meta']['collection'],),
+                '_type': h['_type'],
+                '_id': h['_id'],
+                '_source': ['source_data']
+            } for h in missing]})['docs']
+        except Exception as e:
+            docs = []
+        for h, doc in zip(missing, docs):
+            if doc.get('found') and 'source_data' in doc.get('_source', {}):
+                h['_source']['source_data'] = doc['_source']['source_data']
+
+    for h in events:
+        reclassify(h, h['_source'].get('source_data') or {})
+    return hits
+
+# Transformations that are called with chunks of hits
+BATCH_TRANSFORMATIONS = ('new',)
+
 def run(argv):
     parser = OptionParser()
     parser.add_option("-a", "--action", dest="action", default="same",
@@ -77,6 +90,11 @@ def run(argv):
                       help="read from INDEX", metavar="INDEX")
     parser.add_option("-o", "--output", dest="output", default='ori_heerde_goed',
                       help="read from FILE", metavar="FILE")
+    parser.add_option("-s", "--slices", dest="slices", type="int", default=4,
+                      help="reindex in N parallel slices", metavar="N")
+    parser.add_option("-r", "--resume", dest="state_path", default=None,
+                      help="keep the progress in FILE, and resume from it",
+                      metavar="FILE")
     parser.add_option("-q", "--quiet",
                       action="store_false", dest="verbose", default=True,
                       help="don't print status messages to stdout")
@@ -96,7 +114,15 @@ def run(argv):
     if not callable(func):
         return 2
 
-    reindex(es, options.index, options.output, transformation_callable=func)
+    if options.action in BATCH_TRANSFORMATIONS:
+        transformation = {'batch_transformation_callable': func}
+    else:
+        transformation = {'transformation_callable': func}
+
+    indexed, errors = parallel_reindex(
+        es, options.index, options.output, slices=options.slices,
+        state_path=options.state_path, **transformation)
+    print "Reindexed %d documents (%d errors)" % (indexed, errors)
     return 0
 
 if __name__ == '__main__':
@@ -2,4 +2,25 @@ from .extractors import *
 from .items import *
 from .transformers import *
 from .loaders import *
+from .bulk import *
+from .directory_cache import *
+from .document_text import *
+from .downloads import *
+from .extraction import *
+from .http_sessions import *
+from .media_store import *
+from .images import *
+from .index_settings import *
+from .media_enricher import *
 from .misc import *
+from .parsing import *
+from .pdf_extraction import *
+from .popit import *
+from .reindex import *
+from .resolver import *
+from .routing import *
+from .schema import *
+from .segments import *
+from .spool import *
+from .tally import *
+from .text_cache import *
@@ -0,0 +1,139 @@
+import json
+import time
+from unittest import TestCase
+
+from elasticsearch.exceptions import ConnectionError
+from mock import MagicMock
+
+from ocd_backend.es import JSONSerializerPython2
+from ocd_backend.utils.bulk import BulkBuffer
+
+
+def fake_es(error_ids=()):
+    """Returns an Elasticsearch client whose ``bulk`` fails for the
+    documents in ``error_ids``."""
+    es = MagicMock()
+    es.transport.serializer = JSONSerializerPython2()
+
+    def bulk(body):
+        lines = [json.loads(line) for line in body.strip().split('\n')]
+        items = []
+        for line in lines:
+            if 'index' not in line:
+                continue
+            result = {'_id': line['index']['_id'], 'status': 201}
+            if line['index']['_id'] in error_ids:
+                result = {'_id': line['index']['_id'], 'status': 400,
+                          'error': {'type': 'mapper_parsing_exception'}}
+            items.append({'index': result})
+        return {'errors': bool(error_ids), 'items': items}
+
+    es.bulk.side_effect = bulk
+    return es
+
+
+def index_action(doc_id):
+    return {'index': {'_index': 'ori_test', '_type': 'item', '_id': doc_id}}
+
+
+class BulkBufferTestCase(TestCase):
+    def test_flush_on_max_actions(self):
+        es = fake_es()
+        buf = BulkBuffer(es, max_actions=4, max_bytes=1024 ** 2,
+                         max_interval=60)
+        callback = MagicMock()
+
+        buf.add([(index_action('1'), {'a': 1}), (index_action('2'), {})],
+                callback)
+        self.assertEqual(len(buf), 2)
+        self.assertFalse(es.bulk.called)
+
+        buf.add([(index_action('3'), {}), (index_action('4'), {})], callback)
+        self.assertEqual(es.bulk.call_count, 1)
+        self.assertEqual(len(buf), 0)
+        self.assertEqual(callback.call_args_list, [(([],),), (([],),)])
+
+    def test_flush_on_max_bytes(self):
+        es = fake_es()
+        buf = BulkBuffer(es, max_actions=100, max_bytes=100, max_interval=60)
+        buf.add([(index_action('1'), {'text': 'x' * 100})])
+        self.assertEqual(es.bulk.call_count, 1)
+
+    def test_flush_on_interval(self):
+        es = fake_es()
+        buf = BulkBuffer(es, max_actions=100, max_bytes=1024 ** 2,
+                         max_interval=0.05)
+        callback = MagicMock()
+        buf.add([(index_action('1'), {})], callback)
+
+        for _ in range(100):
+            if callback.called:
+                break
+            time.sleep(0.01)
+        callback.assert_called_once_with([])
+
+    def test_item_errors(self):
+        buf = BulkBuffer(fake_es(error_ids=('2',)), max_actions=100,
+                         max_bytes=1024 ** 2, max_interval=60)
+        first, second = MagicMock(), MagicMock()
+        buf.add([(index_action('1'), {})], first)
+        buf.add([(index_action('2'), {}), (index_action('3'), {})], second)
+
+        self.assertEqual(buf.flush(), 2)
+        first.assert_called_once_with([])
+        second.assert_called_once_with([{'type': 'mapper_parsing_exception'}])
+
+    def test_failed_request(self):
+        es = fake_es()
+        es.bulk.side_effect = IOError('Connection refused')
+        buf = BulkBuffer(es, max_actions=100, max_bytes=1024 ** 2,
+                         max_interval=60)
+        callback = MagicMock()
+        buf.add([(index_action('1'), {})], callback)
+        buf.flush()
+
+        errors = callback.call_args[0][0]
+        self.assertEqual(len(errors), 1)
+        self.assertIn('Connection refused', errors[0])
+
+    def test_flush_empty(self):
+        es = fake_es()
+        buf = BulkBuffer(es, max_actions=100, max_bytes=1024 ** 2,
+                         max_interval=60)
+        self.assertEqual(buf.flush(), 0)
+        self.assertFalse(es.bulk.called)
+
+    def test_spool_when_unavailable(self):
+        es = fake_es()
+        es.bulk.side_effect = ConnectionError('N/A', 'Connection refused',
+                                              None)
+        spool = MagicMock()
+        buf = BulkBuffer(es, max_actions=100, max_bytes=1024 ** 2,
+                         max_interval=60, spool=spool)
+        callback = MagicMock()
+        buf.add([(index_action('1'), {})], callback)
+        buf.flush()
+
+        self.assertEqual(spool.append.call_count, 1)
+        self.assertEqual(len(spool.append.call_args[0][0]), 2)
+        callback.assert_called_once_with([], spooled=True)
+
+    def test_spool_rejected_items(self):
+        es = fake_es()
+        es.bulk.side_effect = None
+        es.bulk.return_value = {'errors': True, 'items': [
+            {'index': {'_id': '1', 'status': 201}},
+            {'index': {'_id': '2', 'status': 429,
+                       'error': {'type': 'es_rejected_execution_exception'}}}
+        ]}
+        spool = MagicMock()
+        buf = BulkBuffer(es, max_actions=100, max_bytes=1024 ** 2,
+                         max_interval=60, spool=spool)
+        first, second = MagicMock(), MagicMock()
+        buf.add([(index_action('1'), {})], first)
+        buf.add([(index_action('2'), {})], second)
+        buf.flush()
+
+        first.assert_called_once_with([])
+        second.assert_called_once_with([], spooled=True)
+        self.assertEqual(spool.append.call_count, 1)
@@ -0,0 +1,164 @@
+import json
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from ocd_backend.result_backends import OCDRedisBackend
+from ocd_backend.tasks import CleanupElasticsearch
+from ocd_backend.utils.api import DirectoryCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class FakeBackend(object):
+    """The result backend methods used by the directory cache, with keys
+    that expire on the time of ``clock``."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.values = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        value, expires = self.values.get(key, (None, None))
+        if expires is not None and expires <= self.clock.now:
+            return
+        return value
+
+    def set_with_ttl(self, key, value, ttl):
+        self.values[key] = (value, self.clock.now + ttl)
+
+    def incr(self, key):
+        value = int(self.values.get(key, (0, None))[0]) + 1
+        self.values[key] = (str(value), None)
+        return value
+
+
+class DirectoryCacheTestCase(TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.backend = FakeBackend(self.clock)
+
+        for target, value in (('ocd_backend.utils.api.celery_app.backend',
+                               self.backend),
+                              ('ocd_backend.utils.api.time', self.clock)):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.cache = DirectoryCache(ttl=60, local_ttl=5)
+        self.key = DirectoryCache.request_key(
+            u'http://api/ori_test/organizations/search', {'size': 10})
+        self.result = [{'id': 'org-1', 'name': u'Gemeenteraad'}]
+
+    def test_request_key(self):
+        self.assertEqual(self.key, DirectoryCache.request_key(
+            u'http://api/ori_test/organizations/search', {'size': 10}))
+        self.assertNotEqual(self.key, DirectoryCache.request_key(
+            u'http://api/ori_test/persons/search', {'size': 10}))
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get('ori_test', self.key))
+
+    def test_hit(self):
+        self.cache.set('ori_test', self.key, self.result)
+        self.assertEqual(self.cache.get('ori_test', self.key), self.result)
+
+        # Shared with the other workers through the result backend
+        self.assertEqual(DirectoryCache().get('ori_test', self.key),
+                         self.result)
+
+    def test_local_layer(self):
+        self.cache.set('ori_test', self.key, self.result)
+        gets = self.backend.gets
+        self.cache.get('ori_test', self.key)
+        self.assertEqual(self.backend.gets, gets)
+
+        # After the local TTL the result is read from the backend again
+        self.clock.now += 10
+        self.assertEqual(self.cache.get('ori_test', self.key), self.result)
+        self.assertGreater(self.backend.gets, gets)
+
+    def test_expiry(self):
+        self.cache.set('ori_test', self.key, self.result)
+        self.clock.now += 61
+        self.assertIsNone(self.cache.get('ori_test', self.key))
+
+    def test_invalidate(self):
+        self.cache.set('ori_test', self.key, self.result)
+        self.cache.set('ori_other', self.key, self.result)
+        self.cache.invalidate('ori_test')
+
+        self.assertIsNone(self.cache.get('ori_test', self.key))
+        self.assertEqual(self.cache.get('ori_other', self.key), self.result)
+
+    def test_prune_local_entries(self):
+        self.cache.max_local_entries = 2
+        self.cache.set('ori_test', 'a', 1)
+        self.cache.set('ori_test', 'b', 2)
+        self.clock.now += 10
+        self.cache.set('ori_test', 'c', 3)
+        self.assertEqual(self.cache._local.keys(), [('ori_test', 'c')])
+
+    def test_backend_down(self):
+        backend = MagicMock()
+        backend.get.side_effect = Exception('Connection refused')
+        backend.set_with_ttl.side_effect = Exception('Connection refused')
+
+        with patch('ocd_backend.utils.api.celery_app.backend', backend):
+            self.assertIsNone(self.cache.get('ori_test', self.key))
+            self.cache.set('ori_test', self.key, self.result)
+
+            # Still served by the local layer
+            self.assertEqual(self.cache.get('ori_test', self.key),
+                             self.result)
+
+    def test_invalidate_backend_down(self):
+        self.cache.set('ori_test', self.key, self.result)
+        backend = MagicMock()
+        backend.incr.side_effect = Exception('Connection refused')
+
+        with patch('ocd_backend.utils.api.celery_app.backend', backend):
+            self.cache.invalidate('ori_test')
+
+        # The results of this process are still dropped
+        self.assertEqual(self.cache._local, {})
+
+    def test_cleanup_invalidates(self):
+        self.cache.set('ori_test', self.key, self.result)
+
+        task = CleanupElasticsearch()
+        task.backend = MagicMock()
+        task.backend.get_set_cardinality.return_value = 0
+        with patch('ocd_backend.tasks.es'), \
+                patch('ocd_backend.tasks.finish_build_index'), \
+                patch('ocd_backend.tasks.directory_cache', self.cache):
+            task.run_finished(
+                'run', current_index_name='ori_test_1',
+                new_index_name='ori_test_2', index_alias='ori_test',
+                source_definition={'index_name': 'ori_test',
+                                   'doc_type': 'organizations'})
+
+        self.assertIsNone(self.cache.get('ori_test', self.key))
+
+
+class OCDRedisBackendTestCase(TestCase):
+    def setUp(self):
+        self.backend = OCDRedisBackend.__new__(OCDRedisBackend)
+        self.backend.__dict__['client'] = MagicMock()
+
+    def test_set_with_ttl(self):
+        self.backend.set_with_ttl('key', json.dumps([]), 60)
+        self.backend.client.set.assert_called_once_with('key', '[]', ex=60)
+
+    def test_incr(self):
+        self.backend.client.incr.return_value = 2
+        self.assertEqual(self.backend.incr('key'), 2)
+        self.backend.client.incr.assert_called_once_with('key')
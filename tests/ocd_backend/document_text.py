@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+import json
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from ocd_backend.enrichers.document_text import DocumentTextEnricher
+from ocd_backend.exceptions import SkipEnrichment
+from ocd_backend.utils import json_encoder
+from ocd_backend.utils.file_parsing import FileToTextMixin
+
+
+class FakeBackend(object):
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set_with_ttl(self, key, value, ttl):
+        self.values[key] = value
+
+
+class FakeDownload(object):
+    def __init__(self, url):
+        self.name = '/tmp/%s' % url.rsplit('/', 1)[-1]
+        # Both mirrors serve the same file
+        self.sha256 = 'sha-%s' % url.rsplit('/', 1)[-1]
+        self.mime_type = 'application/pdf'
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class DocumentTextEnricherTestCase(TestCase):
+    def setUp(self):
+        self.backend = FakeBackend()
+        patcher = patch('ocd_backend.enrichers.document_text.celery_app')
+        celery_app = patcher.start()
+        celery_app.backend = self.backend
+        self.addCleanup(patcher.stop)
+
+        self.downloads = []
+        self.file_download = MagicMock(side_effect=self.download)
+        self.file_extract_text = MagicMock(
+            side_effect=lambda name, *args: (u'Tekst van %s €' % name, True))
+        self.enricher = self._get_enricher()
+
+    def _get_enricher(self, **enricher_settings):
+        enricher = DocumentTextEnricher()
+        enricher.source_definition = {'pdf_max_pages': 10}
+        enricher.enricher_settings = enricher_settings
+        enricher.file_download = self.file_download
+        enricher.file_extract_text = self.file_extract_text
+        return enricher
+
+    def download(self, url):
+        self.downloads.append(FakeDownload(url))
+        return self.downloads[-1]
+
+    def _get_docs(self, *urls):
+        sources = [{'url': url, 'note': u'Bijlage'} for url in urls]
+        combined_index_doc = {'meta': {}, 'sources': sources, 'all_text': u''}
+        doc = {
+            'meta': {},
+            'sources': sources,
+            'combined_index_data': json_encoder.encode(
+                {'meta': {}, 'sources': sources, 'all_text': u''})
+        }
+        return combined_index_doc, doc
+
+    def _enrich(self, enricher, combined_index_doc, doc):
+        return enricher.enrich_item({}, 'id', combined_index_doc, doc,
+                                    'events')
+
+    def test_enrich_item(self):
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf',
+                                                 'http://a/2.pdf')
+        self._enrich(self.enricher, combined_index_doc, doc)
+
+        self.assertEqual([s['description'] for s in doc['sources']],
+                         [u'Tekst van /tmp/1.pdf €', u'Tekst van /tmp/2.pdf €'])
+        self.assertEqual(combined_index_doc['all_text'],
+                         u'Tekst van /tmp/1.pdf € Tekst van /tmp/2.pdf €')
+        self.assertEqual(self.file_extract_text.call_args[0][1:],
+                         (10, 'sha-2.pdf', 'application/pdf'))
+
+    def test_combined_index_data_is_updated(self):
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf')
+        self._enrich(self._get_enricher(text_field='text'),
+                     combined_index_doc, doc)
+
+        data = json.loads(doc['combined_index_data'])
+        self.assertEqual(data['sources'][0]['description'],
+                         u'Tekst van /tmp/1.pdf €')
+        self.assertEqual(data['text'], u'Tekst van /tmp/1.pdf €')
+        self.assertEqual(data['all_text'], combined_index_doc['all_text'])
+
+    def test_text_field(self):
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf')
+        self._enrich(self._get_enricher(text_field='text'),
+                     combined_index_doc, doc)
+        self.assertEqual(combined_index_doc['text'], u'Tekst van /tmp/1.pdf €')
+        self.assertEqual(doc['text'], u'Tekst van /tmp/1.pdf €')
+
+    def test_urls_are_converted_once(self):
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf',
+                                                 'http://a/1.pdf')
+        # Separate sources lists with the same document
+        combined_index_doc['sources'] = [dict(s) for s in doc['sources']]
+        self._enrich(self.enricher, combined_index_doc, doc)
+
+        self.assertEqual(self.file_download.call_count, 1)
+        self.assertEqual(combined_index_doc['sources'][0]['description'],
+                         u'Tekst van /tmp/1.pdf €')
+
+    def test_cached_by_url(self):
+        self._enrich(self.enricher, *self._get_docs('http://a/1.pdf'))
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf')
+        self._enrich(self._get_enricher(), combined_index_doc, doc)
+
+        self.assertEqual(self.file_download.call_count, 1)
+        self.assertEqual(doc['sources'][0]['description'],
+                         u'Tekst van /tmp/1.pdf €')
+
+    def test_incomplete_text_is_not_cached(self):
+        self.file_extract_text.side_effect = None
+        self.file_extract_text.return_value = (u'Deel', False)
+        self._enrich(self.enricher, *self._get_docs('http://a/1.pdf'))
+        self._enrich(self._get_enricher(), *self._get_docs('http://a/1.pdf'))
+
+        self.assertEqual(self.file_download.call_count, 2)
+        self.assertEqual(self.backend.values, {})
+
+    def test_failed_extraction_is_not_cached(self):
+        self.file_extract_text.side_effect = None
+        self.file_extract_text.return_value = (None, False)
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf')
+        self._enrich(self.enricher, combined_index_doc, doc)
+
+        self.assertEqual(doc['sources'][0]['description'], u'')
+        self.assertEqual(self.backend.values, {})
+
+    def test_file_is_closed_when_extraction_fails(self):
+        self.file_extract_text.side_effect = ValueError('Broken PDF')
+        self._enrich(self.enricher, *self._get_docs('http://a/1.pdf'))
+
+        self.assertTrue(self.downloads[0].closed)
+
+    def test_cache_unavailable(self):
+        backend = MagicMock()
+        backend.get.side_effect = Exception('Connection refused')
+        backend.set_with_ttl.side_effect = Exception('Connection refused')
+
+        with patch('ocd_backend.enrichers.document_text.celery_app.backend',
+                   backend):
+            combined_index_doc, doc = self._get_docs('http://a/1.pdf')
+            self._enrich(self.enricher, combined_index_doc, doc)
+
+        self.assertEqual(doc['sources'][0]['description'],
+                         u'Tekst van /tmp/1.pdf €')
+
+    def test_failed_download(self):
+        self.file_download.side_effect = None
+        self.file_download.return_value = None
+        combined_index_doc, doc = self._get_docs('http://a/1.pdf')
+        self._enrich(self.enricher, combined_index_doc, doc)
+
+        self.assertEqual(doc['sources'][0]['description'], u'')
+        self.assertEqual(combined_index_doc['all_text'], u'')
+
+    def test_skip_without_pending_sources(self):
+        combined_index_doc, doc = self._get_docs()
+        with self.assertRaises(SkipEnrichment):
+            self._enrich(self.enricher, combined_index_doc, doc)
+
+
+class FileTextDeferredTestCase(TestCase):
+    class Item(FileToTextMixin):
+        def __init__(self, enrichers):
+            self.source_definition = {'enrichers': enrichers}
+
+    def test_deferred(self):
+        item = self.Item([
+            ['ocd_backend.enrichers.media_enricher.static.StaticMediaEnricher',
+             {}],
+            ['ocd_backend.enrichers.document_text.DocumentTextEnricher', {}]
+        ])
+        self.assertTrue(item.file_text_deferred())
+
+        with patch.object(self.Item, 'file_get_contents') as get_contents:
+            source = item.file_source('http://a/1.pdf', u'Bijlage')
+        self.assertEqual(source, {'url': 'http://a/1.pdf', 'note': u'Bijlage'})
+        self.assertFalse(get_contents.called)
+
+    def test_not_deferred(self):
+        item = self.Item([])
+        self.assertFalse(item.file_text_deferred())
+
+        with patch.object(self.Item, 'file_get_contents',
+                          return_value=u'Tekst') as get_contents:
+            source = item.file_source('http://a/1.pdf', u'Bijlage')
+        self.assertEqual(source['description'], u'Tekst')
+        get_contents.assert_called_once_with('http://a/1.pdf', 20)
@@ -0,0 +1,173 @@
+import os
+import shutil
+import tempfile
+from hashlib import sha256
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.exceptions import DownloadTooLarge
+from ocd_backend.utils.downloads import partial_download, stream_download
+
+
+class FakeResponse(object):
+    def __init__(self, content, headers=None, status_code=200):
+        self.content = content
+        self.headers = headers or {}
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.closed = False
+        self.chunks_read = 0
+
+    def iter_content(self, chunk_size):
+        for i in xrange(0, len(self.content), chunk_size):
+            self.chunks_read += 1
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise Exception(self.status_code)
+
+
+class FakeSession(object):
+    """Serves a file, optionally honouring ``Range`` headers."""
+
+    def __init__(self, content, ranges=True, total_size=True):
+        self.content = content
+        self.ranges = ranges
+        self.total_size = total_size
+        self.requests = []
+
+    def get(self, url, headers=None, stream=False, **kwargs):
+        self.requests.append(('GET', headers))
+        range_header = (headers or {}).get('Range')
+        if not (self.ranges and range_header):
+            return FakeResponse(self.content, {
+                'content-length': str(len(self.content))})
+
+        if not self.content:
+            return FakeResponse('', status_code=416)
+
+        last = min(int(range_header.split('-')[1]), len(self.content) - 1)
+        return FakeResponse(self.content[:last + 1], {
+            'content-length': str(last + 1),
+            'content-range': 'bytes 0-%d/%s' % (
+                last, len(self.content) if self.total_size else '*')
+        }, status_code=206)
+
+    def head(self, url, **kwargs):
+        self.requests.append(('HEAD', None))
+        return FakeResponse('', {'content-length': str(len(self.content))})
+
+
+class StreamDownloadTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.url = 'https://example.com/document.pdf'
+        self.content = '%PDF-1.4\n' + 'x' * 9991
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def download(self, response, **kwargs):
+        return stream_download(self.url, response, chunk_size=1000,
+                               spool_dir=self.root, **kwargs)
+
+    def test_download(self):
+        response = FakeResponse(self.content, {
+            'content-type': 'application/octet-stream',
+            'content-length': str(len(self.content))
+        })
+        download = self.download(response)
+
+        self.assertEqual(download.read(), self.content)
+        self.assertEqual(download.sha256, sha256(self.content).hexdigest())
+        self.assertEqual(download.size, len(self.content))
+        self.assertEqual(download.mime_type, 'application/pdf')
+        self.assertEqual(download.content_type, 'application/octet-stream')
+        self.assertEqual(download.content_length, len(self.content))
+        self.assertTrue(download.complete)
+        self.assertTrue(response.closed)
+
+        # The content is spooled to disk and removed when it's closed
+        self.assertTrue(os.path.exists(download.name))
+        download.close()
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_partial_download(self):
+        response = FakeResponse(self.content)
+        download = self.download(response, partial_size=2500)
+
+        self.assertEqual(download.read(), self.content[:2500])
+        self.assertEqual(download.sha256,
+                         sha256(self.content[:2500]).hexdigest())
+        self.assertFalse(download.complete)
+        self.assertEqual(response.chunks_read, 3)
+
+    def test_content_length_too_large(self):
+        response = FakeResponse(self.content, {'content-length': '10000'})
+        with self.assertRaises(DownloadTooLarge):
+            self.download(response, max_size=5000)
+        self.assertEqual(response.chunks_read, 0)
+        self.assertTrue(response.closed)
+
+    def test_content_too_large(self):
+        response = FakeResponse(self.content)
+        with self.assertRaises(DownloadTooLarge):
+            self.download(response, max_size=5000)
+        self.assertEqual(response.chunks_read, 6)
+        self.assertEqual(os.listdir(self.root), [])
+
+
+class PartialDownloadTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.url = 'https://example.com/video.mp4'
+        self.content = 'x' * 10000
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def download(self, session, size=2500):
+        with patch('ocd_backend.utils.downloads.settings.TEMP_DIR_PATH',
+                   self.root):
+            return partial_download(session, self.url, size, timeout=10)
+
+    def test_range_request(self):
+        session = FakeSession(self.content)
+        download = self.download(session)
+
+        self.assertEqual(session.requests, [('GET', {'Range': 'bytes=0-2499'})])
+        self.assertEqual(download.read(), self.content[:2500])
+        self.assertEqual(download.content_length, 10000)
+        self.assertFalse(download.complete)
+
+    def test_small_file(self):
+        download = self.download(FakeSession(self.content), size=20000)
+        self.assertEqual(download.read(), self.content)
+        self.assertEqual(download.content_length, 10000)
+        self.assertTrue(download.complete)
+
+    def test_unknown_total_size_uses_head(self):
+        session = FakeSession(self.content, total_size=False)
+        download = self.download(session)
+
+        self.assertEqual(session.requests[-1], ('HEAD', None))
+        self.assertEqual(download.content_length, 10000)
+
+    def test_range_ignored(self):
+        download = self.download(FakeSession(self.content, ranges=False))
+        self.assertEqual(download.read(), self.content[:2500])
+        self.assertEqual(download.content_length, 10000)
+        self.assertFalse(download.complete)
+
+    def test_empty_file(self):
+        session = FakeSession('')
+        download = self.download(session)
+
+        self.assertEqual(len(session.requests), 2)
+        self.assertEqual(download.read(), '')
+        self.assertEqual(download.size, 0)
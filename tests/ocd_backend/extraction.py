@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.utils.extraction import ExtractionRouter
+
+
+class ExtractionRouterTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.router = ExtractionRouter()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def write_zip(self, name, parts):
+        path = os.path.join(self.root, name)
+        with zipfile.ZipFile(path, 'w') as archive:
+            for part_name, content in parts:
+                archive.writestr(part_name, content)
+        return path
+
+    def test_plain(self):
+        path = self.write_file('agenda.txt', u'Agenda raadsvergadering €'
+                               .encode('cp1252'))
+        text, complete = self.router.extract(path, mime_type='text/plain')
+        self.assertEqual(text.decode('utf-8'), u'Agenda raadsvergadering €')
+        self.assertTrue(complete)
+
+    def test_html(self):
+        path = self.write_file('agenda.html', (
+            '<html><head><style>p { color: red; }</style>'
+            '<script>alert(1);</script></head>'
+            '<body><h1>Agenda</h1>\n\n\n<p>Opening</p></body></html>'))
+        text, _ = self.router.extract(path, mime_type='text/html')
+        self.assertEqual(text, 'Agenda\n\nOpening')
+
+    def test_docx(self):
+        w = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+        path = self.write_zip('motie.docx', [
+            ('[Content_Types].xml', '<Types/>'),
+            ('word/document.xml', (
+                '<w:document xmlns:w="%s"><w:body>'
+                '<w:p><w:r><w:t>Motie </w:t></w:r><w:r><w:t>vreemd</w:t></w:r>'
+                '</w:p><w:p><w:r><w:t>Verzoekt het college</w:t></w:r></w:p>'
+                '</w:body></w:document>' % w)),
+        ])
+        # Older versions of libmagic report Office files as zip archives
+        self.assertEqual(self.router.get_backend(path, 'application/zip'),
+                         'ooxml')
+        text, _ = self.router.extract(path, mime_type='application/zip')
+        self.assertEqual(text, 'Motie vreemd\nVerzoekt het college')
+
+    def test_pptx_pages(self):
+        a = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+        slides = [('ppt/slides/slide%d.xml' % i,
+                   '<p:sld xmlns:p="p" xmlns:a="%s"><a:p><a:r><a:t>Dia %d'
+                   '</a:t></a:r></a:p></p:sld>' % (a, i))
+                  for i in (10, 2, 1)]
+        path = self.write_zip('presentatie.pptx',
+                              [('[Content_Types].xml', '<Types/>')] + slides)
+        text, _ = self.router.extract(path, pages=2,
+                                      mime_type='application/zip')
+        self.assertEqual(text, 'Dia 1\nDia 2')
+
+    def test_odt(self):
+        path = self.write_zip('besluit.odt', [
+            ('mimetype', 'application/vnd.oasis.opendocument.text'),
+            ('content.xml', (
+                '<office:document-content xmlns:office="o" xmlns:text='
+                '"urn:oasis:names:tc:opendocument:xmlns:text:1.0">'
+                '<text:h>Besluit</text:h><text:p>De raad '
+                '<text:span>besluit</text:span></text:p>'
+                '</office:document-content>')),
+        ])
+        text, _ = self.router.extract(
+            path, mime_type='application/vnd.oasis.opendocument.text')
+        self.assertEqual(text, 'Besluit\nDe raad besluit')
+
+    def test_unknown_type_uses_tika(self):
+        path = self.write_file('scan.tiff', 'II*\x00')
+        with patch('ocd_backend.utils.extraction.parser.from_file',
+                   return_value={'content': u'OCR tekst'}) as from_file:
+            text, complete = self.router.extract(path, mime_type='image/tiff')
+        from_file.assert_called_once_with(path)
+        self.assertEqual(text, 'OCR tekst')
+        self.assertTrue(complete)
+        self.assertEqual(self.router.timings['tika']['documents'], 1)
+
+    def test_failure_falls_back_to_tika(self):
+        path = self.write_file('kapot.docx', 'not a zip file')
+        mime_type = ('application/vnd.openxmlformats-officedocument.'
+                     'wordprocessingml.document')
+        with patch('ocd_backend.utils.extraction.parser.from_file',
+                   return_value={'content': u'tekst'}):
+            text, _ = self.router.extract(path, mime_type=mime_type)
+        self.assertEqual(text, 'tekst')
+        self.assertEqual(self.router.timings['ooxml']['failures'], 1)
+        self.assertEqual(self.router.timings['tika']['documents'], 1)
+
+    def test_timings(self):
+        path = self.write_file('agenda.txt', 'Agenda')
+        for _ in range(2):
+            self.router.extract(path, mime_type='text/plain')
+        self.assertEqual(self.router.timings['plain']['documents'], 2)
+        self.assertEqual(self.router.timings['plain']['failures'], 0)
+        self.assertGreaterEqual(self.router.timings['plain']['seconds'], 0)
+
+    def test_timings_are_logged(self):
+        path = self.write_file('agenda.txt', 'Agenda')
+        self.router.log_interval = 60
+        with patch('ocd_backend.utils.extraction.log') as log:
+            self.router.extract(path, mime_type='text/plain')
+            self.assertFalse(log.info.called)
+
+            self.router._logged_at -= 61
+            self.router.extract(path, mime_type='text/plain')
+        self.assertIn('plain: 2 documents (0 failed)',
+                      log.info.call_args[0][0])
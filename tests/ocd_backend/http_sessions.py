@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+import mock
+
+from ocd_backend.utils.http_sessions import HttpSessionPool
+
+
+class HttpSessionPoolTestCase(TestCase):
+    def setUp(self):
+        self.pool = HttpSessionPool(max_sessions=2, pool_maxsize=4,
+                                    idle_timeout=300)
+
+    def test_session_is_reused_per_host(self):
+        session = self.pool.get('https://example.com/a.pdf')
+        self.assertIs(self.pool.get('https://example.com/b.pdf'), session)
+        self.assertIsNot(self.pool.get('https://example.org/a.pdf'), session)
+        self.assertIsNot(self.pool.get('http://example.com/a.pdf'), session)
+
+    def test_session_is_keyed_by_auth(self):
+        session = self.pool.get('https://example.com/a.pdf')
+        auth_session = self.pool.get('https://example.com/a.pdf',
+                                     ('user', 'secret'))
+        self.assertIsNot(auth_session, session)
+        self.assertNotIn('Authorization', session.headers)
+        self.assertEqual(auth_session.headers['Authorization'],
+                         'Basic dXNlcjpzZWNyZXQ=')
+
+    def test_least_recently_used_session_is_evicted(self):
+        first = self.pool.get('https://a.example.com/')
+        second = self.pool.get('https://b.example.com/')
+        self.pool.get('https://a.example.com/')
+
+        with mock.patch.object(second, 'close') as close:
+            self.pool.get('https://c.example.com/')
+            close.assert_called_once_with()
+
+        self.assertEqual(len(self.pool), 2)
+        self.assertIs(self.pool.get('https://a.example.com/'), first)
+
+    def test_idle_sessions_are_closed(self):
+        with mock.patch('time.time', return_value=1000):
+            session = self.pool.get('https://a.example.com/')
+
+        with mock.patch('time.time', return_value=1400), \
+                mock.patch.object(session, 'close') as close:
+            new_session = self.pool.get('https://a.example.com/')
+            close.assert_called_once_with()
+
+        self.assertIsNot(new_session, session)
+
+    def test_adapters_use_pool_maxsize(self):
+        session = self.pool.get('https://example.com/')
+        self.assertEqual(session.get_adapter('https://example.com/')
+                         ._pool_maxsize, 4)
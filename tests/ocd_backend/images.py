@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+from unittest import TestCase
+
+from mock import patch
+from PIL import Image
+
+from ocd_backend.utils.images import (generate_thumbnails, get_thumbnail_path,
+                                      probe_image)
+
+THUMBNAIL_SIZES = {
+    'large': {'size': (400, 400), 'type': 'aspect'},
+    'small': {'size': (100, 100), 'type': 'aspect'},
+    'small_sq': {'size': (100, 100), 'type': 'crop'},
+}
+
+
+def image_file(size, image_format='JPEG', mode='RGB'):
+    f = StringIO()
+    Image.new(mode, size, 'red').save(f, image_format)
+    f.seek(0)
+    return f
+
+
+class ImagesTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_probe_image(self):
+        self.assertEqual(probe_image(image_file((1600, 1200))), {
+            'format': 'JPEG',
+            'mode': 'RGB',
+            'width': 1600,
+            'height': 1200
+        })
+
+    def test_probe_image_does_not_decode(self):
+        f = image_file((1600, 1200), 'PNG')
+        with patch('PIL.ImageFile.ImageFile.load') as load:
+            self.assertEqual(probe_image(f)['width'], 1600)
+        self.assertFalse(load.called)
+
+    def test_generate_thumbnails(self):
+        created = generate_thumbnails(image_file((1600, 1200)), 'abcdef',
+                                      THUMBNAIL_SIZES, self.root)
+        self.assertEqual(created, ['large', 'small', 'small_sq'])
+
+        sizes = {}
+        for name in created:
+            path = get_thumbnail_path(self.root, 'abcdef', name)
+            self.assertTrue(path.startswith(os.path.join(self.root, 'ab')))
+            sizes[name] = Image.open(path).size
+        self.assertEqual(sizes, {
+            'large': (400, 300),
+            'small': (100, 75),
+            'small_sq': (100, 100)
+        })
+
+    def test_generate_thumbnails_uses_draft_mode(self):
+        f = image_file((1600, 1200))
+        with patch('PIL.JpegImagePlugin.JpegImageFile.draft') as draft:
+            generate_thumbnails(f, 'abcdef', THUMBNAIL_SIZES, self.root)
+        draft.assert_called_once_with('RGB', (400, 400))
+
+    def test_generate_thumbnails_of_png(self):
+        created = generate_thumbnails(
+            image_file((200, 200), 'PNG', 'RGBA'), 'abcdef',
+            THUMBNAIL_SIZES, self.root)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(
+            Image.open(get_thumbnail_path(self.root, 'abcdef', 'large')).mode,
+            'RGB')
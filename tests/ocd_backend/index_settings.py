@@ -0,0 +1,46 @@
+from unittest import TestCase
+
+from mock import MagicMock, call, patch
+
+from ocd_backend import settings
+from ocd_backend.utils.index_settings import (create_build_index,
+                                              finish_build_index)
+
+
+class IndexSettingsTestCase(TestCase):
+    def setUp(self):
+        self.es = MagicMock()
+
+    def test_create_build_index(self):
+        create_build_index(self.es, 'ori_test_20180101000000')
+        self.es.indices.create.assert_called_once_with(
+            index='ori_test_20180101000000',
+            body={'settings': {'index': {'refresh_interval': '-1',
+                                         'number_of_replicas': 0,
+                                         'translog.durability': 'async'}}})
+
+    def test_finish_build_index(self):
+        finish_build_index(self.es, 'ori_test_20180101000000')
+
+        self.assertEqual(self.es.indices.mock_calls, [
+            call.put_settings(index='ori_test_20180101000000', body={
+                'index': settings.ES_SERVING_INDEX_SETTINGS}),
+            call.forcemerge(
+                index='ori_test_20180101000000',
+                max_num_segments=settings.ES_FORCEMERGE_MAX_SEGMENTS,
+                request_timeout=settings.ES_FORCEMERGE_TIMEOUT),
+            call.refresh(index='ori_test_20180101000000')
+        ])
+        self.assertFalse(self.es.cluster.health.called)
+
+    def test_finish_build_index_with_replicas(self):
+        serving = dict(settings.ES_SERVING_INDEX_SETTINGS,
+                       number_of_replicas=1)
+        with patch.object(settings, 'ES_SERVING_INDEX_SETTINGS', serving), \
+                patch.object(settings, 'ES_FORCEMERGE_MAX_SEGMENTS', 0):
+            finish_build_index(self.es, 'ori_test_20180101000000')
+
+        self.assertFalse(self.es.indices.forcemerge.called)
+        self.es.cluster.health.assert_called_once_with(
+            index='ori_test_20180101000000', wait_for_status='green',
+            request_timeout=settings.ES_FORCEMERGE_TIMEOUT)
@@ -24,6 +24,7 @@ class ItemTestCase(TestCase):
 # Import test modules here so the noserunner can pick them up, and the
 # ExtractorTestCase is parsed. Add additional testcases when required
 from .localdump import LocalDumpItemTestCase
+from .documents import ItemDocumentsTestCase
 from .go_meeting import MeetingItemTestCase
 from .go_resolution import ResolutionItemTestCase
 from .go_report import ReportItemTestCase
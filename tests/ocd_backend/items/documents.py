@@ -0,0 +1,121 @@
+import json
+import os
+import timeit
+
+from mock import patch
+
+from ocd_backend.items import BaseItem, ItemDocuments, LocalDumpItem
+from ocd_backend.utils import json_encoder
+
+from . import ItemTestCase
+
+
+def build_documents_legacy(item):
+    """The document building as done before ``BaseItem.build_documents``
+    existed: every getter recomputes its input from scratch."""
+    combined_index_doc = {}
+    combined_index_doc['meta'] = dict(item.meta)
+    combined_index_doc['enrichments'] = {}
+    combined_index_doc.update(dict(item.combined_index_data))
+    combined_index_doc['all_text'] = item.get_all_text()
+
+    index_doc = {}
+    index_doc['meta'] = dict(item.meta)
+    index_doc['enrichments'] = {}
+    index_doc['source_data'] = {
+        'content_type': item.data_content_type,
+        'data': item.data
+    }
+    index_doc.update(dict(item.combined_index_data))
+
+    second_combined_index_doc = {}
+    second_combined_index_doc['meta'] = dict(item.meta)
+    second_combined_index_doc['enrichments'] = {}
+    second_combined_index_doc.update(dict(item.combined_index_data))
+    second_combined_index_doc['all_text'] = item.get_all_text()
+    index_doc['combined_index_data'] = json_encoder.encode(
+        second_combined_index_doc)
+    index_doc.update(item.index_data)
+
+    return (item.get_object_id(), item.get_object_id(), combined_index_doc,
+            index_doc)
+
+
+class ItemDocumentsTestCase(ItemTestCase):
+    def setUp(self):
+        super(ItemDocumentsTestCase, self).setUp()
+        self.PWD = os.path.dirname(__file__)
+
+        with open(os.path.abspath(os.path.join(self.PWD, '../test_dumps/item.json')), 'r') as f:
+            self.raw_item = f.read()
+        self.item = json.loads(self.raw_item)
+
+    def _get_item(self):
+        return LocalDumpItem(self.source_definition, 'application/json',
+                             self.raw_item, self.item, None)
+
+    def test_build_documents(self):
+        documents = self._get_item().build_documents()
+        self.assertIsInstance(documents, ItemDocuments)
+        self.assertEqual(documents.combined_object_id, documents.object_id)
+        self.assertDictEqual(json.loads(documents.combined_index_blob),
+                             json.loads(json_encoder.encode(
+                                 documents.combined_index_doc)))
+
+    def test_build_documents_equals_legacy(self):
+        item = self._get_item()
+        documents = item.build_documents()
+        combined_object_id, object_id, combined_index_doc, index_doc = \
+            build_documents_legacy(item)
+
+        self.assertEqual(documents.combined_object_id, combined_object_id)
+        self.assertEqual(documents.object_id, object_id)
+        self.assertDictEqual(documents.combined_index_doc, combined_index_doc)
+        self.assertDictEqual(documents.index_doc, index_doc)
+
+    def test_build_documents_is_memoised(self):
+        item = self._get_item()
+        with patch.object(LocalDumpItem, 'get_all_text',
+                          return_value=u'text') as get_all_text, \
+                patch.object(LocalDumpItem, 'get_object_id',
+                             return_value='id') as get_object_id:
+            item.get_combined_index_doc()
+            item.get_index_doc()
+            item.build_documents()
+
+        self.assertEqual(get_all_text.call_count, 1)
+        self.assertEqual(get_object_id.call_count, 1)
+        self.assertIs(item.get_combined_index_doc(),
+                      item.build_documents().combined_index_doc)
+
+    def test_overridden_combined_object_id(self):
+        class CombinedIdItem(LocalDumpItem):
+            def get_combined_object_id(self):
+                return 'combined'
+
+        item = CombinedIdItem(self.source_definition, 'application/json',
+                              self.raw_item, self.item, None)
+        self.assertEqual(item.build_documents().combined_object_id,
+                         'combined')
+
+    def test_benchmark_build_documents(self):
+        """Micro-benchmark of building the documents of the item fixture,
+        compared to the legacy approach of rebuilding on every call. Only
+        prints the timings, which vary too much between machines to assert
+        on."""
+        items = [self._get_item() for _ in xrange(200)]
+
+        def single_pass():
+            for item in items:
+                item._documents = None
+                item.build_documents()
+
+        def legacy():
+            for item in items:
+                build_documents_legacy(item)
+
+        single_pass_time = min(timeit.repeat(single_pass, number=1, repeat=5))
+        legacy_time = min(timeit.repeat(legacy, number=1, repeat=5))
+
+        print 'build_documents: %.4fs, legacy: %.4fs (%d items)' % (
+            single_pass_time, legacy_time, len(items))
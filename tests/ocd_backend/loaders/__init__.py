@@ -20,3 +20,5 @@ class LoaderTestCase(TestCase):
 # Import test modules here so the noserunner can pick them up, and the
 # ExtractorTestCase is parsed. Add additional testcases when required
 from .es_loader import ESLoaderTestCase
+from .es_bulk_loader import ESBulkLoaderTestCase
+from .popit_loader import PopitLoaderTestCase
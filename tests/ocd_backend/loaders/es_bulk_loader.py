@@ -0,0 +1,111 @@
+import json
+import os.path
+
+from mock import MagicMock, patch
+
+from . import LoaderTestCase
+from ocd_backend.es import JSONSerializerPython2
+from ocd_backend.loaders import ElasticsearchBulkLoader
+from ocd_backend.utils.bulk import BulkBuffer
+
+
+class ESBulkLoaderTestCase(LoaderTestCase):
+    def setUp(self):
+        super(ESBulkLoaderTestCase, self).setUp()
+        with open(os.path.join(self.PWD, '../test_dumps/combined_index_doc.json'), 'r') as f:
+            self.combined_index_doc = json.load(f)
+
+        with open(os.path.join(self.PWD, '../test_dumps/index_doc.json'), 'r') as f:
+            self.index_doc = json.load(f)
+
+        self.index_doc['media_urls'] = [{
+            'url': 'http://localhost:5000/v0/resolve/abcdef',
+            'original_url': 'https://example.com/document.pdf'
+        }]
+        self.index_doc['enrichments'] = {'media_urls': [{
+            'original_url': 'https://example.com/document.pdf',
+            'content_type': 'application/pdf'
+        }]}
+
+        self.source_definition['cleanup'] = 'ocd_backend.tasks.DummyCleanup'
+        self.kwargs = {
+            'source_definition': self.source_definition,
+            'new_index_name': 'ori_openbeelden_test',
+            'run_identifier': 'pipeline_test',
+            'chain_id': 'abc'
+        }
+        self.item = (u'combined_id', u'object_id', self.combined_index_doc,
+                     self.index_doc, u'item')
+
+        self.es = MagicMock()
+        self.es.transport.serializer = JSONSerializerPython2()
+        self.es.bulk.return_value = {'items': [
+            {'index': {'status': 201}}] * 10}
+        self.buffer = BulkBuffer(self.es, max_actions=100,
+                                 max_bytes=1024 ** 2, max_interval=60)
+
+        self.loader = ElasticsearchBulkLoader()
+
+        patcher = patch('ocd_backend.loaders.resolver_doc_cache')
+        self.resolver_doc_cache = patcher.start()
+        self.resolver_doc_cache.filter_changed.side_effect = lambda docs: docs
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        # Stop the timer of items that are still buffered
+        with patch('ocd_backend.tasks.DummyCleanup.delay'):
+            self.buffer.flush()
+
+    def load(self):
+        with patch('ocd_backend.loaders.bulk_buffer', self.buffer):
+            self.loader.run(self.item, **self.kwargs)
+            self.loader.after_return('SUCCESS', None, 'task_id',
+                                     (self.item,), self.kwargs, None)
+
+    def test_buffers_actions(self):
+        with patch('ocd_backend.loaders.elasticsearch') as es:
+            self.load()
+        self.assertFalse(es.index.called)
+
+        # The combined index and the index of the source, plus the resolver
+        # document of the media url
+        self.assertEqual(len(self.buffer), 3)
+        self.assertFalse(self.es.bulk.called)
+
+    def test_cleanup_after_flush(self):
+        with patch('ocd_backend.tasks.DummyCleanup.delay') as delay:
+            self.load()
+            self.assertFalse(delay.called)
+
+            self.buffer.flush()
+            delay.assert_called_once_with(**self.kwargs)
+
+    def test_known_resolver_docs_are_skipped(self):
+        self.resolver_doc_cache.filter_changed.side_effect = None
+        self.resolver_doc_cache.filter_changed.return_value = {}
+        self.load()
+        self.assertEqual(len(self.buffer), 2)
+
+    def test_resolver_docs_are_marked_after_flush(self):
+        with patch('ocd_backend.tasks.DummyCleanup.delay'):
+            self.load()
+            self.assertFalse(self.resolver_doc_cache.mark_written.called)
+
+            self.buffer.flush()
+        self.resolver_doc_cache.mark_written.assert_called_once_with({
+            'abcdef': {'original_url': 'https://example.com/document.pdf',
+                       'content_type': 'application/pdf'}})
+
+    def test_failed_items_are_recorded(self):
+        self.es.bulk.return_value = {'items': [
+            {'index': {'status': 400, 'error': {'type': 'error'}}}] * 10}
+
+        with patch('ocd_backend.tasks.DummyCleanup.delay') as delay, \
+                patch('ocd_backend.loaders.celery_app') as celery_app:
+            self.load()
+            self.buffer.flush()
+
+        celery_app.backend.add_value_to_set.assert_called_once_with(
+            'pipeline_test_failed', u'object_id')
+        self.assertTrue(delay.called)
+        self.assertFalse(self.resolver_doc_cache.mark_written.called)
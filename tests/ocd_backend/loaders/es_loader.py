@@ -1,7 +1,11 @@
 import json
 import os.path
 
+from elasticsearch.exceptions import ConnectionError, TransportError
+from mock import patch
+
 from . import LoaderTestCase
+from ocd_backend.es import JSONSerializerPython2
 from ocd_backend.exceptions import ConfigurationError
 from ocd_backend.loaders import ElasticsearchLoader
 
@@ -34,3 +38,30 @@ class ESLoaderTestCase(LoaderTestCase):
         # self.loader.run(source_definition=self.source_definition)
         self.assertRaises(ConfigurationError, self.loader.run,
                           source_definition=self.source_definition)
+
+    def load(self, side_effect):
+        self.index_doc['enrichments'] = {}
+        self.index_doc.pop('media_urls', None)
+        item = (u'combined_id', self.object_id, self.combined_index_doc,
+                self.index_doc, u'item')
+        with patch('ocd_backend.loaders.elasticsearch') as es, \
+                patch('ocd_backend.loaders.bulk_spool') as spool, \
+                patch('ocd_backend.loaders._record_item') as self.record_item:
+            es.transport.serializer = JSONSerializerPython2()
+            es.index.side_effect = side_effect
+            self.loader.run(item, source_definition=self.source_definition,
+                            new_index_name='ori_test_new',
+                            run_identifier='run')
+        return spool
+
+    def test_spools_when_unavailable(self):
+        spool = self.load(ConnectionError('N/A', 'Connection refused', None))
+        lines = spool.append.call_args[0][0]
+        self.assertEqual(len(lines), 4)
+        self.assertIn(self.object_id, lines[2])
+        self.record_item.assert_called_once_with(self.object_id,
+                                                 'run_spooled')
+
+    def test_raises_invalid_requests(self):
+        self.assertRaises(TransportError, self.load,
+                          TransportError(400, 'mapper_parsing_exception'))
@@ -0,0 +1,145 @@
+import json
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from ocd_backend.loaders import PopitLoader
+from ocd_backend.settings import SOURCES_CONFIG_FILE
+from ocd_backend.tasks import CleanupPopit
+from ocd_backend.utils.misc import load_sources_config
+
+
+class FakeRedis(object):
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def expire(self, key, ttl):
+        pass
+
+
+class FakeBackend(object):
+    """The result backend methods used by the PopitLoader and the cleanup
+    tasks."""
+
+    def __init__(self):
+        self.client = FakeRedis()
+        self.values = {}
+        self.sets = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def remove(self, key):
+        self.values.pop(key, None)
+        self.sets.pop(key, None)
+        self.client.hashes.pop(key, None)
+
+    def remove_value_from_set(self, set_name, value):
+        self.sets.get(set_name, set()).discard(value)
+
+    def get_set_cardinality(self, set_name):
+        return len(self.sets.get(set_name, ()))
+
+    def update_ttl(self, key, ttl=300):
+        pass
+
+
+class FakeResponse(object):
+    def __init__(self, data=None, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+def find_source(config, source_id):
+    if isinstance(config, dict):
+        if config.get('id') == source_id:
+            return config
+        config = config.values()
+    if isinstance(config, list):
+        for value in config:
+            source = find_source(value, source_id)
+            if source:
+                return source
+
+
+class PopitLoaderTestCase(TestCase):
+    def setUp(self):
+        self.source_definition = find_source(
+            load_sources_config(SOURCES_CONFIG_FILE),
+            'utrecht_ibabs_most_recent_popit_persons')
+
+        self.backend = FakeBackend()
+        self.kwargs = {
+            'source_definition': self.source_definition,
+            'run_identifier': 'pipeline_test',
+            'chain_id': 'chain'
+        }
+        self.backend.values['pipeline_test'] = 'done'
+        self.backend.sets['pipeline_test_chains'] = set(['chain'])
+
+        self.session = MagicMock()
+        self.session.get.return_value = FakeResponse(
+            {'result': [{'id': u'1', 'name': u'Jan'}]})
+        self.session.post.return_value = FakeResponse(status_code=201)
+
+        for target, value in (
+                ('ocd_backend.loaders.celery_app.backend', self.backend),
+                ('ocd_backend.tasks.CleanupPopit.backend', self.backend),
+                ('ocd_backend.utils.popit.http_session_pool.get',
+                 MagicMock(return_value=self.session))):
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Run the cleanup task right away instead of queueing it
+        patcher = patch.object(CleanupPopit, 'delay',
+                               lambda task, **kwargs: task.run(**kwargs))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def load(self, items):
+        loader = PopitLoader()
+        loader.run(items, **self.kwargs)
+        loader.after_return('SUCCESS', None, 'task', (items,), self.kwargs,
+                            None)
+
+    def test_source_uses_popit_cleanup(self):
+        self.assertEqual(self.source_definition['loader'],
+                         'ocd_backend.loaders.PopitLoader')
+        self.assertEqual(self.source_definition['cleanup'],
+                         'ocd_backend.tasks.CleanupPopit')
+
+    def test_items_are_synced_when_run_is_finished(self):
+        items = [
+            (u'%d' % i, u'%d' % i, {'meta': {}, 'id': u'%d' % i,
+                                    'name': name}, {'meta': {}}, 'persons')
+            for i, name in ((1, u'Jan'), (2, u'Piet'))
+        ]
+        self.load(items)
+
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertTrue(self.session.get.call_args[0][0].startswith(
+            '%s/persons' % self.source_definition['popit_base_url']))
+        self.assertEqual(self.session.post.call_count, 1)
+        self.assertEqual(json.loads(self.session.post.call_args[1]['data'])
+                         ['name'], u'Piet')
+        self.assertEqual(self.backend.client.hashes, {})
+
+    def test_nothing_is_synced_without_items(self):
+        self.load([])
+        self.assertFalse(self.session.get.called)
+        self.assertFalse(self.session.post.called)
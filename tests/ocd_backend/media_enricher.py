@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import defaultdict
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.enrichers.media_enricher import MediaEnricher
+
+
+class FakeMediaFile(object):
+    def __init__(self, url):
+        self.url = url
+        self.closed = False
+
+    def seek(self, offset):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class MediaEnricherTestCase(TestCase):
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.active = defaultdict(int)
+        self.max_active = defaultdict(int)
+        self.files = []
+
+        self.enricher = MediaEnricher()
+        self.enricher.source_definition = {'id': 'test'}
+        self.enricher.enricher_settings = {
+            'tasks': [],
+            'concurrency': 4,
+            'per_host_concurrency': 1
+        }
+        self.enricher.fetch_media = self.fetch_media
+
+    def fetch_media(self, object_id, url, partial_fetch=False):
+        host = url.split('/')[2]
+        with self.lock:
+            self.active[host] += 1
+            self.max_active[host] = max(self.max_active[host],
+                                        self.active[host])
+
+        # Later media items are fetched sooner
+        time.sleep(0.02 / int(url.rsplit('/', 1)[-1]))
+        if url.endswith('/fail/2'):
+            raise IOError('Connection reset')
+
+        with self.lock:
+            self.active[host] -= 1
+            media_file = FakeMediaFile(url)
+            self.files.append(media_file)
+        return 'image/jpeg', 10, media_file
+
+    def _get_doc(self, *urls):
+        return {'media_urls': [{'url': 'http://ori/resolve/%d' % i,
+                                'original_url': url}
+                               for i, url in enumerate(urls)]}
+
+    def test_order_and_per_host_limit(self):
+        urls = ['http://a/%d' % i for i in range(1, 5)] + \
+            ['http://b/%d' % i for i in range(1, 5)]
+        enrichments = self.enricher.enrich_item({}, 'id', {},
+                                                self._get_doc(*urls), 'events')
+
+        self.assertEqual([e['original_url'] for e in
+                          enrichments['media_urls']], urls)
+        self.assertEqual(dict(self.max_active), {'a': 1, 'b': 1})
+        self.assertTrue(all(f.closed for f in self.files))
+
+    def test_fetched_files_are_closed_on_error(self):
+        self.enricher.enricher_settings['per_host_concurrency'] = 4
+        doc = self._get_doc('http://a/1', 'http://fail/2', 'http://c/3',
+                            'http://d/4', 'http://e/5')
+
+        with self.assertRaises(IOError):
+            self.enricher.enrich_item({}, 'id', {}, doc, 'events')
+
+        self.assertTrue(self.files)
+        self.assertTrue(all(f.closed for f in self.files))
+
+    def test_files_are_closed_when_a_task_fails(self):
+        self.enricher.enricher_settings['tasks'] = ['broken']
+        doc = self._get_doc('http://a/1', 'http://b/2', 'http://c/3')
+
+        with patch.dict(MediaEnricher.available_tasks,
+                        {'broken': self.fail_task}):
+            with self.assertRaises(ValueError):
+                self.enricher.enrich_item({}, 'id', {}, doc, 'events')
+
+        self.assertTrue(all(f.closed for f in self.files))
+
+    @staticmethod
+    def fail_task(*args):
+        raise ValueError('Broken task')
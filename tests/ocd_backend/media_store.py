@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+from hashlib import sha256
+from unittest import TestCase
+
+from ocd_backend.utils.media_store import MediaStore
+
+
+class FakeResponse(object):
+    def __init__(self, content, headers=None):
+        self.content = content
+        self.headers = headers or {}
+
+    def iter_content(self, chunk_size):
+        for i in xrange(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class MediaStoreTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = MediaStore(self.root)
+        self.url = 'https://example.com/document.pdf'
+        self.content = '%PDF-1.4' * 1000
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_store_and_open(self):
+        metadata = self.store.store(self.url, FakeResponse(self.content, {
+            'etag': '"abc"',
+            'last-modified': 'Mon, 29 Jun 2015 17:00:00 GMT',
+            'content-type': 'application/pdf'
+        }), chunk_size=1000)
+
+        self.assertEqual(metadata['sha256'], sha256(self.content).hexdigest())
+        self.assertEqual(metadata['size'], len(self.content))
+        self.assertEqual(metadata['content_type'], 'application/pdf')
+        self.assertEqual(metadata['mime_type'], 'application/pdf')
+        self.assertEqual(self.store.get_metadata(self.url), metadata)
+        self.assertEqual(self.store.open(metadata).read(), self.content)
+
+        # The file is also available in the flat layout
+        with open(self.store.link_path(self.url), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_conditional_headers(self):
+        metadata = self.store.store(self.url, FakeResponse(self.content, {
+            'etag': '"abc"',
+            'last-modified': 'Mon, 29 Jun 2015 17:00:00 GMT'
+        }))
+        self.assertEqual(self.store.get_conditional_headers(metadata), {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Mon, 29 Jun 2015 17:00:00 GMT'
+        })
+
+        metadata = self.store.store(self.url, FakeResponse(self.content))
+        self.assertEqual(self.store.get_conditional_headers(metadata), {})
+
+    def test_identical_content_is_stored_once(self):
+        first = self.store.store(self.url, FakeResponse(self.content))
+        second = self.store.store('https://example.org/copy.pdf',
+                                  FakeResponse(self.content))
+
+        self.assertEqual(first['sha256'], second['sha256'])
+        self.assertEqual(
+            os.stat(self.store.link_path(self.url)).st_ino,
+            os.stat(self.store.link_path('https://example.org/copy.pdf'))
+            .st_ino)
+        self.assertEqual(os.listdir(os.path.join(self.root, 'tmp')), [])
+
+    def test_unknown_url(self):
+        self.assertIsNone(self.store.get_metadata(self.url))
+
+    def test_missing_content(self):
+        metadata = self.store.store(self.url, FakeResponse(self.content))
+        os.remove(self.store.object_path(metadata['sha256']))
+        self.assertIsNone(self.store.get_metadata(self.url))
@@ -1,7 +1,7 @@
 from unittest import TestCase
 import datetime
 
-from ocd_backend.utils.misc import normalize_motion_id
+from ocd_backend.utils.misc import normalize_motion_id, transform_hits
 
 class MotionIdNormalizerTestCase(TestCase):
     def test_normalize_motion_id(self):
@@ -16,3 +16,22 @@ class MotionIdNormalizerTestCase(TestCase):
         self.assertEqual(normalized_motion_id, '2016M124')
         normalized_motion_id = normalize_motion_id('M2016-67')
         self.assertEqual(normalized_motion_id, '2016M67')
+
+
+class TransformHitsTestCase(TestCase):
+    def test_transformation(self):
+        hits = transform_hits(iter([1, 2, 3]), lambda h: h * 2)
+        self.assertEqual(list(hits), [2, 4, 6])
+
+    def test_batch_transformation(self):
+        chunks = []
+
+        def double(chunk):
+            chunks.append(list(chunk))
+            return [h * 2 for h in chunk]
+
+        hits = transform_hits(iter(range(5)),
+                              batch_transformation_callable=double,
+                              chunk_size=2)
+        self.assertEqual(list(hits), [0, 2, 4, 6, 8])
+        self.assertEqual(chunks, [[0, 1], [2, 3], [4]])
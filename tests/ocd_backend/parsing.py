@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+import re
+import timeit
+from datetime import datetime
+from unittest import TestCase
+
+from ocd_backend.utils.parsing import (memoize, normalize_motion_id,
+                                       parse_date, parse_date_span,
+                                       parse_dutch_date, slugify)
+
+
+def normalize_motion_id_legacy(motion_id, date_as_str):
+    regexes = [
+        r'^M(?P<year>\d{4})\s*\-\s*(?P<id>\d+)',
+        r'^(?P<year>\d{4})\s*M\s*(?P<id>\d+)',
+        r'^(?P<year>\d{4})\s*\-\s*(?P<id>\d+)',
+        r'^M\s+(?P<id>\d+)'
+    ]
+    for regex in regexes:
+        res = re.match(regex, motion_id.upper())
+        if res is not None:
+            year = res.groupdict().get('year') or date_as_str[0:4]
+            return u'%sM%s' % (year, res.group('id'),)
+
+
+def convert_date_legacy(date_str):
+    month_names2int = {
+        u'januari': u'01', u'februari': u'02', u'maart': u'03',
+        u'april': u'04', u'mei': u'05', u'juni': u'06', u'juli': u'07',
+        u'augustus': u'08', u'september': u'09', u'oktober': u'10',
+        u'november': u'11', u'december': u'12',
+    }
+    output = date_str
+    for k, v in month_names2int.iteritems():
+        output = output.replace(k, v)
+    parts = output.split(u' ')
+    return u'%s-%s-%s' % (parts[2], parts[1], parts[0],)
+
+
+_punct_re = re.compile(r'[\t\r\n !"#$%&\'()*\-/<=>?@\[\\\]^_`{|},.]+')
+
+
+def slugify_legacy(text, delim=u'-'):
+    result = []
+    for word in _punct_re.split(text.lower()):
+        word = word.encode('translit/long')
+        if word:
+            result.append(word)
+    return unicode(delim.join(result))
+
+
+DATE_REGEXEN = [
+    (r'^(\d{4})-(\d{2})-(\d{2})$',
+     (8, lambda g: datetime(int(g[0]), int(g[1]), int(g[2])))),
+    (r'^(\d{4})$', (5, lambda g: datetime(int(g[0]), 1, 1))),
+]
+
+MOTION_IDS = [u'2016 M 159', u'2016 m 62', u'M 124', u'M2016-67',
+              u'2015-12', u'Amendement A']
+
+DUTCH_DATES = [u'%d %s 2015' % (day, month) for day in (1, 15, 31)
+               for month in (u'januari', u'mei', u'augustus', u'december')]
+
+NAMES = [u'Commissie Bestuur en Middelen', u'GroenLinks', u'D66',
+         u'Partij van de Arbeid (PvdA)', u'Raad / Raadsvergadering']
+
+
+class ParsingTestCase(TestCase):
+    def setUp(self):
+        slugify.cache_clear()
+        parse_dutch_date.cache_clear()
+
+    def test_normalize_motion_id(self):
+        for motion_id in MOTION_IDS:
+            self.assertEqual(
+                normalize_motion_id(motion_id, '2016-05-26T00:00:00'),
+                normalize_motion_id_legacy(motion_id, '2016-05-26T00:00:00'))
+
+    def test_normalize_motion_id_uses_date(self):
+        self.assertEqual(normalize_motion_id('M 124', '2016-05-26'),
+                         u'2016M124')
+        self.assertEqual(normalize_motion_id('M 124', '2017-05-26'),
+                         u'2017M124')
+
+    def test_parse_dutch_date(self):
+        self.assertEqual(parse_dutch_date(u'31 augustus 2015'),
+                         u'2015-08-31')
+        for date_str in DUTCH_DATES:
+            self.assertEqual(parse_dutch_date(date_str),
+                             convert_date_legacy(date_str))
+
+    def test_slugify(self):
+        self.assertEqual(slugify(u'Partij van de Arbeid (PvdA)'),
+                         u'partij-van-de-arbeid-pvda')
+        self.assertEqual(slugify(u'Caf\xe9 Overleg'), u'cafe-overleg')
+        self.assertEqual(slugify(u'Raad', u'_'), u'raad')
+        self.assertEqual(slugify(u'Gemeente Raad', delim=u'_'),
+                         u'gemeente_raad')
+        self.assertEqual(slugify(u'Gemeente Raad'), u'gemeente-raad')
+        for name in NAMES:
+            self.assertEqual(slugify(name), slugify_legacy(name))
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date(DATE_REGEXEN, u'2015-08-31'),
+                         (8, datetime(2015, 8, 31)))
+        self.assertEqual(parse_date(DATE_REGEXEN, u'2015-13-31'), (0, None))
+        self.assertEqual(parse_date(DATE_REGEXEN, u'gisteren'), (0, None))
+        self.assertEqual(parse_date(DATE_REGEXEN, None), (0, None))
+
+    def test_parse_date_span(self):
+        self.assertEqual(
+            parse_date_span(DATE_REGEXEN, u'2015-08-31', u'2015-08-31'),
+            (8, datetime(2015, 8, 31)))
+        self.assertEqual(
+            parse_date_span(DATE_REGEXEN, u'2010', u'2012'),
+            (4, datetime(2010, 1, 1)))
+        self.assertEqual(
+            parse_date_span(DATE_REGEXEN, u'1900', u'2012'),
+            (2, datetime(1900, 1, 1)))
+
+    def test_memoize_is_bounded(self):
+        calls = []
+
+        @memoize(maxsize=2)
+        def double(value):
+            calls.append(value)
+            return value * 2
+
+        self.assertEqual([double(1), double(2), double(1)], [2, 4, 2])
+        self.assertEqual(calls, [1, 2])
+
+        double(3)
+        self.assertEqual(len(double.cache), 2)
+        double(2)
+        self.assertEqual(calls, [1, 2, 3, 2])
+
+    def test_memoize_keyword_arguments(self):
+        calls = []
+
+        @memoize()
+        def join(a, b=u'-'):
+            calls.append((a, b))
+            return b.join(a)
+
+        self.assertEqual(join(u'ab', b=u'_'), u'a_b')
+        self.assertEqual(join(u'ab', b=u'_'), u'a_b')
+        self.assertEqual(join(u'ab'), u'a-b')
+        self.assertEqual(calls, [(u'ab', u'_'), (u'ab', u'-')])
+
+    def test_benchmark_parsing(self):
+        """Micro-benchmark of parsing the ids, dates and names of a batch
+        of motions and meetings, compared to the legacy implementations.
+        Only prints the timings, which vary too much between machines to
+        assert on."""
+        motion_ids = MOTION_IDS * 50
+        dates = DUTCH_DATES * 25
+        names = NAMES * 60
+
+        def compiled():
+            for motion_id in motion_ids:
+                normalize_motion_id(motion_id, '2016-05-26')
+            for date_str in dates:
+                parse_dutch_date(date_str)
+            for name in names:
+                slugify(name)
+
+        def legacy():
+            for motion_id in motion_ids:
+                normalize_motion_id_legacy(motion_id, '2016-05-26')
+            for date_str in dates:
+                convert_date_legacy(date_str)
+            for name in names:
+                slugify_legacy(name)
+
+        compiled_time = min(timeit.repeat(compiled, number=1, repeat=5))
+        legacy_time = min(timeit.repeat(legacy, number=1, repeat=5))
+
+        print 'parsing: %.4fs, legacy: %.4fs' % (compiled_time, legacy_time)
@@ -0,0 +1,105 @@
+import subprocess
+import tempfile
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.utils.pdf_extraction import PDFExtractionService, main
+
+
+def count_pages(fname):
+    return 10
+
+
+def extract_pages(fname, first, last):
+    return '\n'.join('page %d' % i for i in xrange(first, last + 1))
+
+
+def start_shell(commands, count_command='printf 10 > %(output)s'):
+    """Returns a replacement of PDFExtractionService._start that runs a
+    shell command per range, and to count the pages, instead of a Python
+    process."""
+    def start(function, fname, *pages):
+        output = tempfile.NamedTemporaryFile()
+        command = commands(*pages) if pages else count_command
+        process = subprocess.Popen(
+            ['sh', '-c', command % {'output': output.name}])
+        return process, output
+    return start
+
+
+class PDFExtractionServiceTestCase(TestCase):
+    def setUp(self):
+        self.service = PDFExtractionService(processes=2, pages_per_task=4,
+                                            timeout=2, memory_limit=0)
+
+    def test_page_ranges(self):
+        self.assertEqual(self.service.page_ranges(10),
+                         [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(self.service.page_ranges(10, 5), [(1, 4), (5, 5)])
+        self.assertEqual(self.service.page_ranges(0), [])
+
+    def test_extract_in_process(self):
+        self.service.processes = 0
+        self.assertEqual(
+            self.service.extract('doc.pdf', extract_pages, count_pages, 6),
+            ('page 1\npage 2\npage 3\npage 4\npage 5\npage 6', True))
+
+    def test_extract(self):
+        commands = lambda first, last: (
+            'sleep 0.%d; printf "pages %d-%d" > %%(output)s'
+            % (3 - first / 4, first, last))
+        with patch.object(self.service, '_start', start_shell(commands)):
+            self.assertEqual(
+                self.service.extract('doc.pdf', extract_pages, count_pages),
+                ('pages 1-4\npages 5-8\npages 9-10', True))
+
+    def test_partial_text_on_timeout(self):
+        commands = lambda first, last: (
+            'printf "pages %d-%d" > %%(output)s' % (first, last)
+            if first < 5 else 'sleep 10')
+        start = time.time()
+        with patch.object(self.service, '_start', start_shell(commands)):
+            self.assertEqual(
+                self.service.extract('doc.pdf', extract_pages, count_pages),
+                ('pages 1-4', False))
+        self.assertLess(time.time() - start, 5)
+
+    def test_failed_range(self):
+        commands = lambda first, last: (
+            'printf "pages %d-%d" > %%(output)s' % (first, last)
+            if first != 5 else 'exit 1')
+        with patch.object(self.service, '_start', start_shell(commands)):
+            self.assertEqual(
+                self.service.extract('doc.pdf', extract_pages, count_pages),
+                ('pages 1-4\npages 9-10', False))
+
+    def test_failed_page_count(self):
+        commands = lambda first, last: 'printf "pages" > %(output)s'
+        with patch.object(self.service, '_start',
+                          start_shell(commands, 'exit 1')):
+            self.assertEqual(
+                self.service.extract('doc.pdf', extract_pages, count_pages),
+                ('', False))
+
+    def test_page_count_timeout(self):
+        commands = lambda first, last: 'printf "pages" > %(output)s'
+        start = time.time()
+        with patch.object(self.service, '_start',
+                          start_shell(commands, 'sleep 10')):
+            self.assertEqual(
+                self.service.extract('doc.pdf', extract_pages, count_pages),
+                ('', False))
+        self.assertLess(time.time() - start, 5)
+
+    def test_main(self):
+        with tempfile.NamedTemporaryFile() as output:
+            main('%s.extract_pages' % __name__, 'doc.pdf', '3', '4',
+                 output.name)
+            self.assertEqual(output.read(), 'page 3\npage 4')
+
+    def test_main_count_pages(self):
+        with tempfile.NamedTemporaryFile() as output:
+            main('%s.count_pages' % __name__, 'doc.pdf', output.name)
+            self.assertEqual(output.read(), '10')
@@ -0,0 +1,84 @@
+import json
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from ocd_backend.utils.popit import PopitClient, PopitSync
+
+
+class FakeResponse(object):
+    def __init__(self, data=None, status_code=200):
+        self.data = data
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        pass
+
+
+class PopitClientTestCase(TestCase):
+    def test_fetch_all(self):
+        session = MagicMock()
+        session.get.side_effect = [
+            FakeResponse({'result': [{'id': '1'}, {'id': '2'}],
+                          'next_url': 'http://popit/api/persons?page=2'}),
+            FakeResponse({'result': [{'id': '3'}]})
+        ]
+        client = PopitClient('http://popit/api/', 'key', 'persons')
+
+        with patch('ocd_backend.utils.popit.http_session_pool') as pool:
+            pool.get.return_value = session
+            items = client.fetch_all()
+
+        self.assertEqual(sorted(items), ['1', '2', '3'])
+        self.assertEqual(session.get.call_args_list[0][0][0],
+                         'http://popit/api/persons?per_page=100')
+        self.assertEqual(session.get.call_args[1]['headers']['Apikey'], 'key')
+
+
+class PopitSyncTestCase(TestCase):
+    def setUp(self):
+        self.remote = {
+            u'1': {'id': u'1', 'name': u'Jan', 'url': u'http://popit/1'},
+            u'2': {'id': u'2', 'name': u'Piet', 'url': u'http://popit/2'},
+            u'3': {'id': u'3', 'name': u'Klaas', 'url': u'http://popit/3'}
+        }
+        self.desired = {
+            u'1': {'id': u'1', 'name': u'Jan'},
+            u'2': {'id': u'2', 'name': u'Pieter'},
+            u'4': {'id': u'4', 'name': u'Kees'}
+        }
+        self.client = MagicMock()
+        self.client.fetch_all.return_value = self.remote
+        for name in ('create', 'update', 'delete'):
+            getattr(self.client, name).return_value = FakeResponse()
+
+    def test_plan_creates_only(self):
+        sync = PopitSync(self.client)
+        self.assertEqual(sync.plan(self.desired, self.remote), [
+            ('create', u'4', self.desired[u'4'])])
+
+    def test_plan_updates_and_deletes(self):
+        sync = PopitSync(self.client, update=True, delete=True)
+        self.assertEqual(sync.plan(self.desired, self.remote), [
+            ('update', u'2', self.desired[u'2']),
+            ('create', u'4', self.desired[u'4']),
+            ('delete', u'3', None)])
+
+    def test_sync(self):
+        self.client.update.return_value = FakeResponse(status_code=500)
+        sync = PopitSync(self.client, update=True, delete=True,
+                         concurrency=2)
+        stats = sync.sync(self.desired)
+
+        self.assertEqual(self.client.fetch_all.call_count, 1)
+        self.client.create.assert_called_once_with(
+            u'4', json.dumps(self.desired[u'4']))
+        self.client.delete.assert_called_once_with(u'3', None)
+        self.assertEqual(stats, {'create': {'ok': 1, 'failed': 0},
+                                 'update': {'ok': 0, 'failed': 1},
+                                 'delete': {'ok': 1, 'failed': 0}})
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from ocd_backend.utils.reindex import parallel_reindex
+
+
+def fake_scan(client, index, query, **kwargs):
+    slice_id = query.get('slice', {}).get('id', 0)
+    for i in range(3):
+        yield {'_index': index, '_type': 'events',
+               '_id': '%d-%d' % (slice_id, i),
+               '_source': {'classification': u'Meeting'}}
+
+
+def fake_parallel_bulk(client, actions, **kwargs):
+    for action in actions:
+        client.indexed.append(action)
+        yield action['_id'] != '1-2', {}
+
+
+def to_agenda_batch(hits):
+    for hit in hits:
+        hit['_source']['classification'] = u'Agenda'
+    return hits
+
+
+def to_agenda(hit):
+    hit['_source']['classification'] = u'Agenda'
+    return hit
+
+
+@patch('ocd_backend.utils.reindex.parallel_bulk', fake_parallel_bulk)
+@patch('ocd_backend.utils.reindex.scan', fake_scan)
+class ParallelReindexTestCase(TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.client.indexed = []
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, 'state.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_reindex(self):
+        result = parallel_reindex(
+            self.client, 'ori_test', 'ori_test_new', slices=2,
+            transformation_callable=to_agenda, transform_in_workers=False,
+            state_path=self.state_path)
+
+        self.assertEqual(result, (5, 1))
+        self.assertEqual(len(self.client.indexed), 6)
+        self.assertTrue(all(
+            hit['_index'] == 'ori_test_new' and
+            hit['_source']['classification'] == u'Agenda'
+            for hit in self.client.indexed))
+
+        with open(self.state_path) as f:
+            self.assertEqual(sorted(json.load(f)['completed']), ['0', '1'])
+
+    def test_batch_transformation(self):
+        result = parallel_reindex(
+            self.client, 'ori_test', 'ori_test_new', slices=2, chunk_size=2,
+            batch_transformation_callable=to_agenda_batch,
+            transform_in_workers=False)
+
+        self.assertEqual(result, (5, 1))
+        self.assertTrue(all(hit['_source']['classification'] == u'Agenda'
+                            for hit in self.client.indexed))
+
+    def test_resume(self):
+        with open(self.state_path, 'w') as f:
+            json.dump({'source_index': 'ori_test',
+                       'target_index': 'ori_test_new', 'slices': 2,
+                       'completed': {'0': {'indexed': 3, 'errors': 0}}}, f)
+
+        result = parallel_reindex(
+            self.client, 'ori_test', 'ori_test_new', slices=2,
+            transform_in_workers=False, state_path=self.state_path)
+        self.assertEqual(result, (5, 1))
+        self.assertEqual([hit['_id'] for hit in self.client.indexed],
+                         ['1-0', '1-1', '1-2'])
+
+    def test_state_of_other_reindex(self):
+        with open(self.state_path, 'w') as f:
+            json.dump({'source_index': 'ori_other',
+                       'target_index': 'ori_test_new', 'slices': 2,
+                       'completed': {}}, f)
+        self.assertRaises(ValueError, parallel_reindex, self.client,
+                          'ori_test', 'ori_test_new', slices=2,
+                          state_path=self.state_path)
+
+    def test_worker_processes(self):
+        result = parallel_reindex(self.client, 'ori_test', 'ori_test_new',
+                                  slices=2, transformation_callable=to_agenda)
+        self.assertEqual(result, (5, 1))
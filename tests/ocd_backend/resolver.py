@@ -0,0 +1,137 @@
+from unittest import TestCase
+
+from elasticsearch.exceptions import NotFoundError
+from mock import MagicMock, patch
+
+from ocd_backend.utils.resolver import ResolverDocCache
+
+
+class FakeRedis(object):
+    def __init__(self):
+        self.hashes = {}
+        self.values = {}
+        self.hmget_calls = 0
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value):
+        self.values[key] = value.encode('utf-8')
+
+    def hmget(self, key, fields):
+        self.hmget_calls += 1
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def hmset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(
+            (field, value.encode('utf-8')) for field, value in mapping.items())
+
+    def delete(self, key):
+        self.hashes.pop(key, None)
+
+
+class ResolverDocCacheTestCase(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('ocd_backend.utils.resolver.celery_app')
+        self.celery_app = patcher.start()
+        self.celery_app.backend.client = self.redis
+        self.addCleanup(patcher.stop)
+
+        patcher = patch('ocd_backend.utils.resolver.es')
+        self.es = patcher.start()
+        self.set_index_uuid('uuid-1')
+        self.addCleanup(patcher.stop)
+        self.redis.set(ResolverDocCache.index_key, u'uuid-1')
+
+        self.cache = ResolverDocCache()
+        self.url_docs = {
+            'a': {'original_url': 'http://example.com/a.pdf',
+                  'content_type': 'application/pdf'},
+            'b': {'original_url': 'http://example.com/b'}
+        }
+
+    def set_index_uuid(self, index_uuid):
+        self.es.indices.get_settings.return_value = {
+            'ori_resolver': {'settings': {'index': {'uuid': index_uuid}}}}
+
+    def test_unknown_docs_are_written(self):
+        self.assertEqual(self.cache.filter_changed(self.url_docs),
+                         self.url_docs)
+
+    def test_known_docs_are_skipped(self):
+        self.cache.mark_written(self.url_docs)
+        self.assertEqual(self.cache.filter_changed(self.url_docs), {})
+
+        # Known by another worker
+        self.assertEqual(ResolverDocCache().filter_changed(self.url_docs), {})
+
+    def test_local_lookups(self):
+        self.cache.mark_written(self.url_docs)
+        self.cache.filter_changed(self.url_docs)
+        self.assertEqual(self.redis.hmget_calls, 0)
+
+    def test_changed_content_type(self):
+        self.cache.mark_written(self.url_docs)
+        changed = dict(self.url_docs)
+        changed['b'] = dict(changed['b'], content_type='text/html')
+        self.assertEqual(self.cache.filter_changed(changed),
+                         {'b': changed['b']})
+
+    def test_redis_errors(self):
+        self.celery_app.backend.client = MagicMock()
+        self.celery_app.backend.client.hmget.side_effect = IOError
+        self.celery_app.backend.client.hmset.side_effect = IOError
+
+        self.cache.mark_written(self.url_docs)
+        self.cache._local.clear()
+        self.assertEqual(self.cache.filter_changed(self.url_docs),
+                         self.url_docs)
+
+    def test_seed(self):
+        hits = [{'_id': 'a', '_source': {'content_type': 'application/pdf'}},
+                {'_id': 'b', '_source': {}},
+                {'_id': 'c', '_source': {'content_type': 'text/html'}}]
+        self.redis.hmset(self.cache.key, {'stale': ''})
+
+        with patch('ocd_backend.utils.resolver.helpers.scan',
+                   return_value=iter(hits)):
+            self.assertEqual(self.cache.seed(MagicMock(), chunk_size=2), 3)
+
+        self.assertEqual(self.redis.hashes[self.cache.key], {
+            'a': 'application/pdf', 'b': '', 'c': 'text/html'})
+        self.assertEqual(self.cache.filter_changed(self.url_docs), {})
+
+    def test_recreated_index(self):
+        self.cache.mark_written(self.url_docs)
+        self.cache.filter_changed(self.url_docs)
+
+        self.set_index_uuid('uuid-2')
+        self.assertEqual(self.cache.filter_changed(self.url_docs), {})
+
+        # The index is checked every check_interval seconds
+        self.cache._checked_at = 0
+        self.assertEqual(self.cache.filter_changed(self.url_docs),
+                         self.url_docs)
+        self.assertNotIn(self.cache.key, self.redis.hashes)
+        self.assertEqual(self.redis.get(self.cache.index_key), 'uuid-2')
+
+    def test_recreated_by_another_process(self):
+        self.cache.mark_written(self.url_docs)
+        self.cache.filter_changed(self.url_docs)
+
+        self.set_index_uuid('uuid-2')
+        ResolverDocCache().clear(u'uuid-2')
+
+        self.cache._checked_at = 0
+        self.assertEqual(self.cache.filter_changed(self.url_docs),
+                         self.url_docs)
+
+    def test_deleted_index(self):
+        self.cache.mark_written(self.url_docs)
+        self.es.indices.get_settings.side_effect = NotFoundError(404, '')
+
+        self.assertEqual(ResolverDocCache().filter_changed(self.url_docs),
+                         self.url_docs)
+        self.assertEqual(self.redis.get(self.cache.index_key), '')
@@ -0,0 +1,58 @@
+from unittest import TestCase
+
+from kombu import Queue
+from mock import patch
+
+from ocd_backend.enrichers.document_text import DocumentTextEnricher
+from ocd_backend.exceptions import ConfigurationError
+from ocd_backend.settings import CELERY_CONFIG
+from ocd_backend.utils.routing import get_queue
+
+
+class GetQueueTestCase(TestCase):
+    def test_stages(self):
+        self.assertEqual(get_queue('transformer', {}), 'transform')
+        self.assertEqual(get_queue('enricher', {}), 'enrich_io')
+        self.assertEqual(get_queue('loader', {}), 'load')
+
+    def test_enricher_uses_most_expensive_task(self):
+        self.assertEqual(get_queue('enricher', {}, task_settings={
+            'tasks': ['media_type', 'image_metadata']}), 'enrich_io')
+        self.assertEqual(get_queue('enricher', {}, task_settings={
+            'tasks': ['media_type', 'file_to_text']}), 'enrich_cpu')
+
+    def test_enricher_queue_attribute(self):
+        self.assertEqual(
+            get_queue('enricher', {}, DocumentTextEnricher(), {}),
+            'enrich_cpu')
+
+    def extra_queues(self, *names):
+        return patch.dict(CELERY_CONFIG, {'CELERY_QUEUES': CELERY_CONFIG[
+            'CELERY_QUEUES'] + [Queue(name) for name in names]})
+
+    def test_source_definition_overrides(self):
+        source_definition = {'queues': {'loader': 'bulk_load',
+                                        'file_to_text': 'pdf'}}
+        with self.extra_queues('bulk_load', 'pdf'):
+            self.assertEqual(get_queue('loader', source_definition),
+                             'bulk_load')
+            self.assertEqual(
+                get_queue('enricher', source_definition,
+                          task_settings={'tasks': ['file_to_text']}),
+                'pdf')
+
+    def test_enricher_settings_queue(self):
+        with self.extra_queues('slow'):
+            self.assertEqual(get_queue('enricher', {}, task_settings={
+                'tasks': ['file_to_text'], 'queue': 'slow'}), 'slow')
+
+    def test_undeclared_queues_are_rejected(self):
+        self.assertRaises(ConfigurationError, get_queue, 'loader',
+                          {'queues': {'loader': 'bulk_load'}})
+        self.assertRaises(ConfigurationError, get_queue, 'enricher', {},
+                          task_settings={'queue': 'slow'})
+
+    def test_all_queues_are_declared(self):
+        queues = set(queue.name for queue in CELERY_CONFIG['CELERY_QUEUES'])
+        self.assertEqual(queues, {'celery', 'transform', 'enrich_io',
+                                  'enrich_cpu', 'load'})
@@ -0,0 +1,58 @@
+from datetime import datetime
+from unittest import TestCase
+
+from ocd_backend.utils.schema import SchemaRecord, compile_schema
+
+
+class CompiledSchemaTestCase(TestCase):
+    def setUp(self):
+        self.fields = {
+            'hidden': bool,
+            'title': unicode,
+            'date': datetime,
+            'media_urls': list
+        }
+        self.record_type = compile_schema(self.fields, 'TestRecord')
+
+    def test_compile_is_cached(self):
+        self.assertIs(compile_schema(dict(self.fields), 'TestRecord'),
+                      self.record_type)
+
+    def test_record_has_slots(self):
+        record = self.record_type()
+        self.assertIsInstance(record, SchemaRecord)
+        self.assertFalse(hasattr(record, '__dict__'))
+
+    def test_from_dict(self):
+        data = {'hidden': False, 'title': u'Title', 'media_urls': []}
+        record = self.record_type.from_dict(data)
+        self.assertEqual(record.to_dict(), data)
+        self.assertEqual(dict(record), data)
+        self.assertEqual(record['title'], u'Title')
+        self.assertIn('hidden', record)
+        self.assertNotIn('date', record)
+
+    def test_from_dict_skip_empty(self):
+        record = self.record_type.from_dict(
+            {'hidden': False, 'title': u'', 'media_urls': [],
+             'unknown': None}, skip_empty=True)
+        self.assertEqual(record.to_dict(), {'hidden': False})
+
+    def test_from_dict_invalid_type(self):
+        with self.assertRaises(TypeError):
+            self.record_type.from_dict({'title': 'not unicode'})
+
+    def test_from_dict_unknown_key(self):
+        with self.assertRaises(KeyError):
+            self.record_type.from_dict({'title': u'Title', 'unknown': 1})
+
+    def test_setitem(self):
+        record = self.record_type()
+        record['title'] = u'Title'
+        self.assertEqual(record.to_dict(), {'title': u'Title'})
+        with self.assertRaises(TypeError):
+            record['hidden'] = 1
+        with self.assertRaises(KeyError):
+            record['unknown'] = u'value'
+        with self.assertRaises(KeyError):
+            record['get']
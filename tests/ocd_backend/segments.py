@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.utils.segments import (SegmentStore, SEGMENT_SUFFIX,
+                                        INDEX_SUFFIX, LOOKUP_NAME)
+
+
+class SegmentStoreTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.store = SegmentStore(self.root, max_bytes=1024 ** 2)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.root)
+
+    def write(self, count, doc_type='event', run_identifier='pipeline_1',
+              version=0):
+        for i in range(count):
+            self.store.write('ori_test', run_identifier, doc_type,
+                             u'doc%d' % i, json.dumps({
+                                 'id': i, 'version': version,
+                                 'text': 'x' * 100}))
+
+    def test_segments_are_jsonl(self):
+        self.write(3)
+        segments = self.store.segments('ori_test')
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(segments[0].startswith(
+            os.path.join(self.root, 'ori_test', 'pipeline_1', 'events')))
+
+        with gzip.open(segments[0] + SEGMENT_SUFFIX) as f:
+            docs = [json.loads(line) for line in f]
+        self.assertEqual([doc['id'] for doc in docs], [0, 1, 2])
+
+        with open(segments[0] + INDEX_SUFFIX) as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+    def test_get(self):
+        self.write(3)
+        self.assertEqual(json.loads(self.store.get('ori_test', 'event',
+                                                   u'doc1'))['id'], 1)
+        self.assertIsNone(self.store.get('ori_test', 'event', 'doc5'))
+        self.assertIsNone(self.store.get('ori_test', 'person', 'doc1'))
+
+    def test_rotation(self):
+        self.store.max_bytes = 50
+        self.write(5)
+        segments = self.store.segments('ori_test', doc_type='event')
+        self.assertTrue(len(segments) > 1)
+        self.assertEqual(json.loads(self.store.get('ori_test', 'event',
+                                                   'doc4'))['id'], 4)
+
+    def test_new_segments_after_fork(self):
+        self.write(1)
+        with patch('ocd_backend.utils.segments.os.getpid', return_value=1):
+            self.write(1)
+        self.assertEqual(len(self.store.segments('ori_test')), 2)
+
+    def test_manifest(self):
+        self.write(3)
+        self.write(2, doc_type='person')
+        self.store.close()
+
+        manifest = self.store.write_manifest('ori_test', 'pipeline_1',
+                                             source='test')
+        self.assertEqual(manifest['documents'], 5)
+        self.assertEqual(manifest['run_identifier'], 'pipeline_1')
+        self.assertEqual(manifest['source'], 'test')
+        self.assertEqual(manifest['doc_types'], {'event': 3, 'person': 2})
+        self.assertEqual(sorted((s['doc_type'], s['documents'])
+                                for s in manifest['segments']),
+                         [('event', 3), ('person', 2)])
+
+        with open(os.path.join(self.root, 'ori_test', 'manifest.json')) as f:
+            self.assertEqual(json.load(f)['documents'], 5)
+
+    def test_manifest_of_run(self):
+        self.write(3, run_identifier='pipeline_1')
+        self.write(2, run_identifier='pipeline_2', version=1)
+        # Written twice in the same run
+        self.write(1, run_identifier='pipeline_2', version=2)
+        self.store.close()
+
+        manifest = self.store.write_manifest('ori_test', 'pipeline_2')
+        self.assertEqual(manifest['documents'], 2)
+        self.assertEqual(sum(s['documents'] for s in manifest['segments']), 3)
+        self.assertTrue(all(s['segment'].startswith('pipeline_2/')
+                            for s in manifest['segments']))
+
+        with open(os.path.join(self.root, 'ori_test', 'pipeline_2', 'events',
+                               LOOKUP_NAME)) as f:
+            self.assertEqual([line.split('\t')[0] for line in f],
+                             ['doc0', 'doc1'])
+
+    def test_get_from_lookup(self):
+        self.write(3, run_identifier='pipeline_1')
+        self.write(2, run_identifier='pipeline_2', version=1)
+        self.write(1, run_identifier='pipeline_2', version=2)
+        self.store.write_manifest('ori_test', 'pipeline_2')
+
+        with patch.object(self.store, 'segments') as segments:
+            doc = json.loads(self.store.get('ori_test', 'event', u'doc0'))
+            self.assertIsNone(self.store.get('ori_test', 'event', u'doc2'))
+            self.assertIsNone(self.store.get('ori_test', 'person', u'doc0'))
+        self.assertEqual(doc['version'], 2)
+        self.assertFalse(segments.called)
+
+    def test_writers_of_earlier_runs_are_closed(self):
+        self.write(1, run_identifier='pipeline_1')
+        self.write(1, run_identifier='pipeline_2')
+        self.assertEqual([key[1] for key in self.store._writers],
+                         ['pipeline_2'])
+
+    def test_remove_old_runs(self):
+        for i, run_identifier in enumerate(['pipeline_a', 'pipeline_b',
+                                            'pipeline_c']):
+            self.write(1, run_identifier=run_identifier)
+            run_dir = os.path.join(self.root, 'ori_test', run_identifier)
+            os.utime(run_dir, (i, i))
+        self.store.close()
+
+        self.store.write_manifest('ori_test', 'pipeline_b')
+        self.assertEqual(
+            sorted(name for name in os.listdir(os.path.join(self.root,
+                                                            'ori_test'))
+                   if name.startswith('pipeline')),
+            ['pipeline_b', 'pipeline_c'])
@@ -0,0 +1,217 @@
+import fcntl
+import json
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from elasticsearch.exceptions import (ConnectionError, ConnectionTimeout,
+                                      TransportError)
+from mock import MagicMock, patch
+
+from ocd_backend.tasks import (HELD_RUNS_KEY, CleanupElasticsearch,
+                               finish_held_run)
+from ocd_backend.utils.spool import BulkSpool, _split_actions, is_unavailable
+
+
+def item_lines(doc_id):
+    return [json.dumps({'index': {'_index': 'ori_test', '_type': 'item',
+                                  '_id': doc_id}}),
+            json.dumps({'id': doc_id})]
+
+
+def bulk_result(*statuses):
+    items = []
+    for status in statuses:
+        item = {'status': status}
+        if status >= 400:
+            item['error'] = {'type': 'error_%d' % status}
+        items.append({'index': item})
+    return {'errors': any(status >= 400 for status in statuses),
+            'items': items}
+
+
+class BulkSpoolTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.spool = BulkSpool(self.root, max_bytes=1024 ** 2,
+                               fsync_records=2, fsync_interval=60)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_is_unavailable(self):
+        self.assertTrue(is_unavailable(ConnectionError('N/A', 'refused',
+                                                       None)))
+        self.assertTrue(is_unavailable(ConnectionTimeout('TIMEOUT', '', None)))
+        self.assertTrue(is_unavailable(TransportError(429, 'rejected')))
+        self.assertFalse(is_unavailable(TransportError(400, 'mapping')))
+        self.assertFalse(is_unavailable(ValueError()))
+
+    def test_fsync_batching(self):
+        with patch('ocd_backend.utils.spool.os.fsync') as fsync:
+            self.spool.append(item_lines('1'))
+            self.assertFalse(fsync.called)
+            self.spool.append(item_lines('2'))
+            self.assertEqual(fsync.call_count, 1)
+
+    def test_only_sealed_segments_are_replayed(self):
+        self.spool.append(item_lines('1'))
+        self.assertEqual(self.spool.segments(), [])
+
+        self.spool.close()
+        segments = self.spool.segments()
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(segments[0].endswith('.spool'))
+
+    def test_flushed_on_append(self):
+        self.spool.append(item_lines('1'))
+        with open(self.spool._path, 'rb') as f:
+            self.assertEqual(json.loads(f.read()), item_lines('1'))
+
+    def test_timed_fsync(self):
+        self.spool.fsync_interval = 0.05
+        with patch('ocd_backend.utils.spool.os.fsync') as fsync:
+            self.spool.append(item_lines('1'))
+            self.assertFalse(fsync.called)
+            time.sleep(0.2)
+            self.assertEqual(fsync.call_count, 1)
+
+    def test_open_segments_are_locked(self):
+        self.spool.append(item_lines('1'))
+        self.assertEqual(self.spool.segments(), [])
+
+        es = MagicMock()
+        self.assertEqual(self.spool.replay(es), (0, 0, 0))
+        self.assertFalse(es.bulk.called)
+
+    def test_abandoned_segments_are_replayed(self):
+        self.spool.append(item_lines('1'))
+        path = self.spool._path
+
+        # The lock is released when the process dies
+        fcntl.flock(self.spool._file, fcntl.LOCK_UN)
+        self.assertEqual(self.spool.segments(), [path])
+
+    def test_split_actions(self):
+        delete = json.dumps({'delete': {'_index': 'ori_test', '_id': '2'}})
+        lines = item_lines('1') + [delete] + item_lines('3')
+        self.assertEqual(_split_actions(lines),
+                         [lines[0:2], [delete], lines[3:5]])
+
+    def test_rotation(self):
+        self.spool.max_bytes = 100
+        self.spool.append(item_lines('1'))
+        self.spool.append(item_lines('2'))
+        self.assertEqual(len(self.spool.segments()), 2)
+
+    def test_replay(self):
+        self.spool.max_bytes = 100
+        for doc_id in ('1', '2', '3'):
+            self.spool.append(item_lines(doc_id))
+        self.spool.close()
+
+        es = MagicMock()
+        es.bulk.return_value = bulk_result(201)
+        self.assertEqual(self.spool.replay(es, max_bytes=100), (3, 0, 0))
+
+        body = ''.join(call[1]['body'] for call in es.bulk.call_args_list)
+        self.assertEqual(body.count('"_id": "'), 3)
+        self.assertEqual(self.spool.segments(), [])
+
+    def test_replay_stops_when_unavailable(self):
+        self.spool.append(item_lines('1'))
+        self.spool.close()
+
+        es = MagicMock()
+        es.bulk.side_effect = ConnectionError('N/A', 'refused', None)
+        self.assertEqual(self.spool.replay(es), (0, 0, 1))
+        self.assertEqual(len(self.spool.segments()), 1)
+
+    def test_replay_keeps_rejected_actions(self):
+        for doc_id in ('1', '2', '3'):
+            self.spool.append(item_lines(doc_id))
+        # Abandoned by its process
+        fcntl.flock(self.spool._file, fcntl.LOCK_UN)
+
+        es = MagicMock()
+        es.bulk.return_value = bulk_result(201, 429, 400)
+        self.assertEqual(self.spool.replay(es), (1, 1, 1))
+
+        # Only the rejected action is kept, in a sealed segment
+        segments = self.spool.segments()
+        self.assertEqual(len(segments), 1)
+        self.assertTrue(segments[0].endswith('.spool'))
+        with open(segments[0], 'rb') as f:
+            self.assertEqual([json.loads(line) for line in f],
+                             [item_lines('2')])
+
+        es.bulk.return_value = bulk_result(201)
+        self.assertEqual(self.spool.replay(es), (1, 0, 0))
+        self.assertEqual(self.spool.segments(), [])
+
+    def test_replay_skips_incomplete_lines(self):
+        self.spool.append(item_lines('1'))
+        self.spool._file.write('["{\\"index\\"')
+        self.spool.close()
+
+        es = MagicMock()
+        es.bulk.return_value = bulk_result(201)
+        self.assertEqual(self.spool.replay(es), (1, 0, 0))
+
+
+class HeldRunTestCase(TestCase):
+    def setUp(self):
+        self.task = CleanupElasticsearch()
+        self.task.backend = MagicMock()
+        self.kwargs = {
+            'current_index_name': 'ori_test_1',
+            'new_index_name': 'ori_test_2',
+            'index_alias': 'ori_test',
+            'source_definition': {'index_name': 'ori_test'}
+        }
+
+    def run_finished(self, spooled):
+        self.task.backend.get_set_cardinality.side_effect = \
+            lambda key: spooled if key == 'run_spooled' else 0
+        with patch('ocd_backend.tasks.finish_run') as finish_run:
+            self.task.run_finished('run', **self.kwargs)
+        return finish_run
+
+    def test_alias_is_moved(self):
+        finish_run = self.run_finished(0)
+        finish_run.assert_called_once_with(**self.kwargs)
+        self.assertFalse(self.task.backend.client.hset.called)
+
+    def test_alias_is_held_while_items_are_spooled(self):
+        finish_run = self.run_finished(2)
+        self.assertFalse(finish_run.called)
+
+        key, run_identifier, held_run = \
+            self.task.backend.client.hset.call_args[0]
+        self.assertEqual((key, run_identifier), (HELD_RUNS_KEY, 'run'))
+        self.assertEqual(json.loads(held_run),
+                         dict(self.kwargs, spooled=2))
+        self.task.backend.remove.assert_called_with('run_spooled')
+
+    def finish_held_run(self, alias_index):
+        with patch('ocd_backend.tasks.es') as es, \
+                patch('ocd_backend.tasks.finish_run') as finish_run:
+            es.indices.get_alias.return_value = {alias_index: {}}
+            finished = finish_held_run(spooled=2, **self.kwargs)
+        return finished, es, finish_run
+
+    def test_held_run_is_finished(self):
+        finished, es, finish_run = self.finish_held_run('ori_test_1')
+        self.assertTrue(finished)
+        finish_run.assert_called_once_with(
+            'ori_test_1', 'ori_test_2', 'ori_test', spooled=2,
+            source_definition={'index_name': 'ori_test'})
+
+    def test_superseded_held_run_is_removed(self):
+        # A later run moved the alias to its own index
+        finished, es, finish_run = self.finish_held_run('ori_test_3')
+        self.assertFalse(finished)
+        self.assertFalse(finish_run.called)
+        es.indices.delete.assert_called_once_with(index='ori_test_2',
+                                                  ignore=404)
@@ -0,0 +1,138 @@
+import json
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.items.voting_round import IBabsVotingRoundItem
+from ocd_backend.utils import json_encoder
+from ocd_backend.utils.tally import VoteTally, recompute_voting_rounds
+
+
+class VoteTallyTestCase(TestCase):
+    def setUp(self):
+        self.rounds = [
+            (u'm1', [
+                {'UserId': 1, 'GroupId': 10, 'Vote': True},
+                {'UserId': 2, 'GroupId': 10, 'Vote': True},
+                {'UserId': 3, 'GroupId': 20, 'Vote': False},
+                {'UserId': 4, 'GroupId': 20, 'Vote': True},
+            ]),
+            (u'm2', [
+                {'UserId': 1, 'GroupId': 10, 'Vote': False},
+                {'UserId': 3, 'GroupId': 20, 'Vote': False},
+            ]),
+        ]
+        self.tally = VoteTally.from_ibabs_votes(self.rounds)
+
+    def test_counts(self):
+        self.assertEqual(self.tally.get_counts(u'm1'), [
+            {'option': 'yes', 'value': 3},
+            {'option': 'no', 'value': 1}
+        ])
+        self.assertEqual(self.tally.get_counts(u'm2'), [
+            {'option': 'yes', 'value': 0},
+            {'option': 'no', 'value': 2}
+        ])
+
+    def test_group_results(self):
+        results = self.tally.get_group_results(u'm1', {10: u'A', 20: u'B'})
+        self.assertEqual(
+            sorted((r['group_id'], r['group']['name'], r['option'], r['value'])
+                   for r in results),
+            [(10, u'A', 'yes', 2), (20, u'B', 'no', 1), (20, u'B', 'yes', 1)])
+
+    def test_cohesion(self):
+        self.assertEqual(self.tally.get_cohesion(u'm1'), {10: 1.0, 20: 0.5})
+        self.assertEqual(self.tally.get_party_cohesion(),
+                         {10: (1.0, 2), 20: (0.75, 2)})
+
+    def test_person_tallies(self):
+        tallies = self.tally.get_person_tallies()
+        self.assertEqual(tallies[1], {'yes': 1, 'no': 1})
+        self.assertEqual(tallies[4], {'yes': 1, 'no': 0})
+
+    def test_from_vote_events(self):
+        tally = VoteTally.from_vote_events([
+            (u'm1', [{'voter_id': 1, 'group_id': 10, 'option': 'no'}])])
+        self.assertEqual(tally.get_counts(u'm1'),
+                         [{'option': 'yes', 'value': 0},
+                          {'option': 'no', 'value': 1}])
+
+    def test_empty(self):
+        tally = VoteTally([])
+        self.assertEqual(tally.get_person_tallies(), {})
+        self.assertEqual(tally.get_party_cohesion(), {})
+        self.assertEqual(tally.get_counts(u'm1'), [])
+        self.assertEqual(tally.get_group_results(u'm1'), [])
+
+
+class RecomputeVotingRoundsTestCase(TestCase):
+    def setUp(self):
+        self.source_definition = {
+            'id': 'utrecht_ibabs_votes',
+            'index_name': 'utrecht',
+            'hidden': False
+        }
+
+    def _get_hit(self, motion_id, votes, in_favour=0, against=0):
+        original_item = {
+            'motion_id': motion_id,
+            'entry': {
+                'ListCanVote': True,
+                'VoteResult': True,
+                'VotesInFavour': in_favour,
+                'VotesAgainst': against
+            },
+            'votes': votes
+        }
+        with patch.object(IBabsVotingRoundItem, 'api_request',
+                          return_value=[{'id': 1, 'name': u'Jan'}]):
+            item = IBabsVotingRoundItem(self.source_definition,
+                                        'application/json', '{}',
+                                        original_item, 'vote_events')
+
+        return {
+            '_index': 'ori_utrecht',
+            '_type': 'vote_events',
+            '_id': item.get_object_id(),
+            '_source': json.loads(json_encoder.encode(item.get_index_doc()))
+        }
+
+    def test_recompute_voting_rounds(self):
+        hits = [
+            self._get_hit(u'm1', [
+                {'UserId': 1, 'GroupId': 10, 'GroupName': u'A', 'Vote': True},
+                {'UserId': 2, 'GroupId': 20, 'GroupName': u'B',
+                 'Vote': False}]),
+            self._get_hit(u'm2', [])
+        ]
+        tally, group_names, actions = recompute_voting_rounds(hits)
+
+        self.assertEqual(group_names, {10: u'A', 20: u'B'})
+        self.assertEqual(len(actions), 1)
+        self.assertEqual(actions[0]['_id'], u'm1')
+        self.assertEqual(actions[0]['_op_type'], 'update')
+
+        # The counts in the item only come from the iBabs totals
+        update = actions[0]['doc']['doc']
+        self.assertEqual(update['counts'], [
+            {'option': 'yes', 'value': 1, 'group': {'name': u'Gemeenteraad'}},
+            {'option': 'no', 'value': 1, 'group': {'name': u'Gemeenteraad'}}
+        ])
+        self.assertEqual(
+            sorted((r['group_id'], r['group']['name'], r['option'])
+                   for r in update['group_results']),
+            [(10, u'A', 'yes'), (20, u'B', 'no')])
+        self.assertEqual(tally.get_party_cohesion(),
+                         {10: (1.0, 1), 20: (1.0, 1)})
+
+    def test_counts_match_the_item(self):
+        hit = self._get_hit(u'm1', [
+            {'UserId': 1, 'GroupId': 10, 'GroupName': u'A', 'Vote': True},
+            {'UserId': 2, 'GroupId': 20, 'GroupName': u'B', 'Vote': True}],
+            in_favour=2)
+        _, _, actions = recompute_voting_rounds([hit])
+
+        # Options without votes are kept, as in the item
+        self.assertEqual(actions[0]['doc']['doc']['counts'],
+                         hit['_source']['doc']['counts'])
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_backend.utils.file_parsing import FileToTextMixin
+from ocd_backend.utils.text_cache import TextCache, file_checksum
+
+
+class TextCacheTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.cache = TextCache(self.root, max_size=1024 * 1024)
+        self.key = TextCache.key('a' * 64, 1, 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_get_and_set(self):
+        self.assertIsNone(self.cache.get(self.key))
+        self.cache.set(self.key, u'Besluitenlijst raadsvergadering €')
+        self.assertEqual(self.cache.get(self.key),
+                         u'Besluitenlijst raadsvergadering €')
+
+    def test_key_includes_version_and_pages(self):
+        self.cache.set(self.key, u'text')
+        self.assertIsNone(self.cache.get(TextCache.key('a' * 64, 2, 20)))
+        self.assertIsNone(self.cache.get(TextCache.key('a' * 64, 1, 10)))
+
+    def test_evict_least_recently_used(self):
+        keys = [TextCache.key('%064d' % i, 1, 20) for i in range(3)]
+        for i, key in enumerate(keys):
+            self.cache.set(key, u'%d' % i * 1000)
+            os.utime(self.cache.path(key), (i, i))
+
+        # Reading the oldest entry makes it the most recently used
+        self.cache.get(keys[0])
+
+        size = os.path.getsize(self.cache.path(keys[0]))
+        removed, _ = self.cache.evict(max_size=2 * size)
+        self.assertEqual(removed, 1)
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+    def test_size_is_tracked(self):
+        self.cache.set(self.key, u'text')
+        size = os.path.getsize(self.cache.path(self.key))
+        self.assertEqual(self.cache._update_size(), size)
+
+        # Replacing an entry only counts the difference
+        self.cache.set(self.key, u'tekst' * 100)
+        self.assertEqual(self.cache._update_size(),
+                         os.path.getsize(self.cache.path(self.key)))
+
+    def test_writes_do_not_scan_the_cache(self):
+        self.cache.set(self.key, u'text')
+        with patch.object(TextCache, '_entries') as entries:
+            self.cache.set(TextCache.key('b' * 64, 1, 20), u'text')
+        self.assertFalse(entries.called)
+
+    def test_evict_when_full(self):
+        keys = [TextCache.key('%064d' % i, 1, 20) for i in range(4)]
+        self.cache.set(keys[0], u'0' * 1000)
+        size = os.path.getsize(self.cache.path(keys[0]))
+        self.cache.max_size = 3 * size
+        self.cache.evict_to = 0.5
+
+        for i, key in enumerate(keys[1:], 1):
+            os.utime(self.cache.path(keys[i - 1]), (i, i))
+            self.cache.set(key, u'%d' % i * 1000)
+
+        # The fourth entry made the cache too large, the oldest entries
+        # are evicted to half of its size
+        self.assertEqual([self.cache.get(key) is not None for key in keys],
+                         [False, False, False, True])
+        self.assertEqual(self.cache._update_size(), size)
+
+    def test_stats(self):
+        self.cache.set(self.key, u'text')
+        self.cache.set(TextCache.key('b' * 64, 2, 20), u'text')
+        stats = self.cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['versions']['v1']['entries'], 1)
+        self.assertEqual(stats['versions']['v2']['entries'], 1)
+
+    def test_file_to_text_parses_once(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('%PDF-1.4')
+            f.flush()
+
+            with patch('ocd_backend.utils.file_parsing.text_cache',
+                       self.cache), \
+                    patch('ocd_backend.utils.file_parsing.parse_file',
+                          return_value=('Motie', True)) as file_parser:
+                mixin = FileToTextMixin()
+                self.assertEqual(mixin.file_to_text(f.name), u'Motie')
+                self.assertEqual(mixin.file_to_text(f.name), u'Motie')
+                self.assertEqual(file_parser.call_count, 1)
+
+                self.assertEqual(mixin.file_to_text(f.name, 5), u'Motie')
+                self.assertEqual(file_parser.call_count, 2)
+
+            self.assertEqual(len(file_checksum(f.name)), 64)
+
+    def test_partial_text_is_not_cached(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('%PDF-1.4')
+            f.flush()
+
+            with patch('ocd_backend.utils.file_parsing.text_cache',
+                       self.cache), \
+                    patch('ocd_backend.utils.file_parsing.parse_file',
+                          return_value=('Mot', False)) as file_parser:
+                mixin = FileToTextMixin()
+                self.assertEqual(mixin.file_to_text(f.name), u'Mot')
+                self.assertEqual(mixin.file_to_text(f.name), u'Mot')
+                self.assertEqual(file_parser.call_count, 2)
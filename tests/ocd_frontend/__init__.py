@@ -10,6 +10,7 @@ from flask.ext.testing import TestCase
 
 from ocd_frontend.rest import tasks
 from .mixins import OcdRestTestCaseMixin
+from .es_client import *
 
 
 class RestApiSearchTestCase(OcdRestTestCaseMixin, TestCase):
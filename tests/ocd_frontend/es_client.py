@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from mock import patch
+
+from ocd_frontend.es_client import ElasticsearchPool, parse_hosts
+
+
+class ParseHostsTestCase(TestCase):
+    def test_parse_hosts(self):
+        self.assertEqual(parse_hosts('es1:9201, es2,'), [
+            {'host': 'es1', 'port': 9201}, {'host': 'es2', 'port': 9200}])
+
+    def test_parse_host_dicts(self):
+        hosts = [{'host': 'es1', 'port': 9201}]
+        self.assertEqual(parse_hosts(hosts), hosts)
+
+
+@patch('ocd_frontend.es_client.Elasticsearch')
+class ElasticsearchPoolTestCase(TestCase):
+    def test_client_is_created_on_first_use(self, es_class):
+        pool = ElasticsearchPool('es1:9200,es2:9200', maxsize=25, timeout=5)
+        self.assertFalse(es_class.called)
+
+        pool.indices.create(index='test')
+        pool.indices.refresh(index='test')
+        es_class.assert_called_once_with(
+            [{'host': 'es1', 'port': 9200}, {'host': 'es2', 'port': 9200}],
+            maxsize=25, timeout=5)
+
+    def test_sniffing(self, es_class):
+        pool = ElasticsearchPool('es1', sniff=True, sniff_interval=30)
+        pool.client
+        kwargs = es_class.call_args[1]
+        self.assertTrue(kwargs['sniff_on_start'])
+        self.assertTrue(kwargs['sniff_on_connection_fail'])
+        self.assertEqual(kwargs['sniffer_timeout'], 30)
+
+    def test_new_client_after_fork(self, es_class):
+        es_class.side_effect = lambda *args, **kwargs: object()
+        pool = ElasticsearchPool('es1')
+        client = pool.client
+        self.assertIs(pool.client, client)
+
+        with patch('ocd_frontend.es_client.os.getpid', return_value=-1):
+            self.assertIsNot(pool.client, client)
+        self.assertEqual(es_class.call_count, 2)
+
+    def test_operation_timeouts(self, es_class):
+        pool = ElasticsearchPool('es1', timeouts={'bulk': 120, 'search': 30})
+        client = es_class.return_value
+
+        pool.bulk(body='')
+        client.bulk.assert_called_once_with(body='', request_timeout=120)
+
+        pool.search(index='test', request_timeout=1)
+        client.search.assert_called_once_with(index='test', request_timeout=1)
+
+        pool.index(index='test', body={})
+        client.index.assert_called_once_with(index='test', body={})